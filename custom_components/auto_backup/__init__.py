@@ -12,14 +12,33 @@ from homeassistant.components.hassio import (
     ATTR_PASSWORD,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import ATTR_NAME, Platform
-from homeassistant.core import HomeAssistant, ServiceCall
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.const import ATTR_NAME, EVENT_HOMEASSISTANT_CLOSE, Platform
+from homeassistant.core import Event, HomeAssistant, ServiceCall, SupportsResponse
 from homeassistant.helpers.hassio import is_hassio
+from homeassistant.helpers.typing import ConfigType
 
 from .const import (
     ATTR_KEEP_DAYS,
     ATTR_DOWNLOAD_PATH,
+    ATTR_DEDUPLICATE,
+    ATTR_RECOMPRESS,
+    ATTR_DOWNLOAD_KEEP_DAYS,
+    ATTR_DIRECTORY,
+    ATTR_FORCE,
+    ATTR_LIMIT,
+    ATTR_OUTCOME,
+    ATTR_JOB,
+    ATTR_DRY_RUN,
+    ATTR_SLUG,
+    JOB_ALL,
+    JOB_CREATE,
+    JOB_DOWNLOAD,
+    ATTR_SKIP_UNCHANGED,
+    ATTR_BACKUPS,
+    SKIP_BACKUP,
+    SKIP_EXCLUDE,
+    ATTR_INDEX,
+    ATTR_DESTINATION,
     ATTR_COMPRESSED,
     ATTR_LOCATION,
     ATTR_EXCLUDE,
@@ -31,18 +50,83 @@ from .const import (
     SERVICE_BACKUP,
     SERVICE_BACKUP_FULL,
     SERVICE_BACKUP_PARTIAL,
+    SERVICE_BACKUP_BATCH,
     SERVICE_PURGE,
+    SERVICE_REASSEMBLE,
+    SERVICE_LIST_DOWNLOADS,
+    SERVICE_PROFILE,
+    SERVICE_VERIFY_DOWNLOADS,
+    SERVICE_HISTORY,
+    SERVICE_CANCEL,
+    SERVICE_LIST_BACKUPS,
     CONF_AUTO_PURGE,
     CONF_BACKUP_TIMEOUT,
+    CONF_DOWNLOAD_RATE_LIMIT,
+    CONF_ADAPTIVE_THROTTLE,
+    CONF_LOOP_WATCHDOG,
+    CONF_VERIFY_DOWNLOADS,
+    CONF_PAUSE_DOWNLOADS,
+    CONF_TRACING,
+    CONF_UNCACHED_DOWNLOADS,
+    CONF_SYNC_INTERVAL,
+    DEFAULT_SYNC_INTERVAL,
+    CONF_COMPRESSION_LEVEL,
+    CONF_COMPRESSION_WORKERS,
+    DEFAULT_COMPRESSION_LEVEL,
+    DEFAULT_COMPRESSION_WORKERS,
+    CONF_S3_ENDPOINT,
+    CONF_S3_REGION,
+    CONF_S3_ACCESS_KEY,
+    CONF_S3_SECRET_KEY,
+    DEFAULT_S3_REGION,
+    CONF_HIGH_WATERMARK,
+    CONF_LOW_WATERMARK,
+    CONF_WATERMARK_ORDER,
+    CONF_KEEP_HOURLY,
+    CONF_KEEP_DAILY,
+    CONF_KEEP_WEEKLY,
+    CONF_KEEP_MONTHLY,
+    DEFAULT_HIGH_WATERMARK,
+    DEFAULT_LOW_WATERMARK,
+    ORDER_OLDEST,
+    CONF_SCHEDULE,
+    CONF_SCHEDULE_BACKUP,
+    CONF_SCHEDULE_JITTER,
+    CONF_SCHEDULE_WINDOW,
+    CONF_SCHEDULE_CATCH_UP,
+    CONF_MAX_LOAD,
+    CONF_MAX_MEMORY,
+    CONF_MAX_IO_PRESSURE,
+    CONF_BLOCKING_ENTITIES,
+    CONF_BLOCKING_THRESHOLDS,
     DEFAULT_BACKUP_TIMEOUT,
+    DEFAULT_DOWNLOAD_RATE_LIMIT,
+    DEFAULT_SCHEDULE_JITTER,
+    DEFAULT_SCHEDULE_WINDOW,
+    DEFAULT_MAX_LOAD,
+    DEFAULT_MAX_MEMORY,
+    DEFAULT_MAX_IO_PRESSURE,
     DATA_AUTO_BACKUP,
     DOMAIN,
     ATTR_ENCRYPTED,
     ATTR_EXCLUDE_DATABASE,
 )
 from .handlers import SupervisorHandler, BackupHandler
-from .helpers import is_backup
+from .history import (
+    HISTORY_SIZE,
+    OUTCOME_OK,
+    OUTCOME_FAILED,
+    OUTCOME_SKIPPED,
+    OUTCOME_CANCELLED,
+)
+from .helpers import is_backup, normalize_backup_data
 from .manager import AutoBackup
+from .metrics import AutoBackupMetricsView
+from .websocket import (
+    LIST_BACKUPS_FIELDS,
+    async_register_commands,
+    list_backups_args,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -54,7 +138,15 @@ SCHEMA_BACKUP_BASE = vol.Schema(
         vol.Optional(ATTR_NAME): vol.Any(None, cv.string),
         vol.Optional(ATTR_PASSWORD): vol.Any(None, cv.string),
         vol.Optional(ATTR_KEEP_DAYS): vol.Any(None, vol.Coerce(float)),
-        vol.Optional(ATTR_DOWNLOAD_PATH): vol.All(cv.ensure_list, [cv.isdir]),
+        vol.Optional(ATTR_DOWNLOAD_PATH): vol.All(
+            cv.ensure_list, [vol.Any(vol.Match(r"^s3://[^/]+"), cv.isdir)]
+        ),
+        vol.Optional(ATTR_DEDUPLICATE, default=False): cv.boolean,
+        vol.Optional(ATTR_RECOMPRESS, default=False): cv.boolean,
+        vol.Optional(ATTR_DOWNLOAD_KEEP_DAYS): vol.Any(None, vol.Coerce(float)),
+        vol.Optional(ATTR_SKIP_UNCHANGED): vol.Any(
+            None, vol.In([SKIP_EXCLUDE, SKIP_BACKUP])
+        ),
         vol.Optional(ATTR_ENCRYPTED, default=False): cv.boolean,
         vol.Optional(ATTR_EXCLUDE_DATABASE, default=False): cv.boolean,
         vol.Optional(ATTR_COMPRESSED, default=True): cv.boolean,
@@ -94,14 +186,84 @@ SCHEMA_BACKUP = vol.Any(
     ),
 )
 
+# the value of each entity above which a scheduled backup is deferred
+SCHEMA_BLOCKING_THRESHOLDS = vol.Schema({cv.entity_id: vol.Coerce(float)})
+
+SCHEMA_BACKUP_BATCH = vol.Schema(
+    {vol.Required(ATTR_BACKUPS): vol.All(cv.ensure_list, [SCHEMA_BACKUP])}
+)
+
+SCHEMA_REASSEMBLE = vol.Schema(
+    {
+        vol.Required(ATTR_INDEX): cv.isfile,
+        vol.Optional(ATTR_DESTINATION): cv.string,
+    }
+)
+
+SCHEMA_LIST_DOWNLOADS = vol.Schema({vol.Required(ATTR_DIRECTORY): cv.isdir})
+
+SCHEMA_VERIFY_DOWNLOADS = SCHEMA_LIST_DOWNLOADS.extend(
+    {vol.Optional(ATTR_FORCE, default=False): cv.boolean}
+)
+
+SCHEMA_HISTORY = vol.Schema(
+    {
+        vol.Optional(ATTR_LIMIT): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=HISTORY_SIZE)
+        ),
+        vol.Optional(ATTR_OUTCOME): vol.In(
+            [OUTCOME_OK, OUTCOME_FAILED, OUTCOME_SKIPPED, OUTCOME_CANCELLED]
+        ),
+    }
+)
+
+SCHEMA_CANCEL = vol.Schema(
+    {
+        vol.Optional(ATTR_SLUG): cv.string,
+        vol.Optional(ATTR_JOB, default=JOB_ALL): vol.In(
+            [JOB_ALL, JOB_CREATE, JOB_DOWNLOAD]
+        ),
+    }
+)
+
+SCHEMA_LIST_BACKUPS = vol.Schema(LIST_BACKUPS_FIELDS)
+
+SCHEMA_PURGE = vol.Schema({vol.Optional(ATTR_DRY_RUN, default=False): cv.boolean})
+
 MAP_SERVICES = {
     SERVICE_BACKUP: SCHEMA_BACKUP,
     SERVICE_BACKUP_FULL: SCHEMA_BACKUP_FULL,
     SERVICE_BACKUP_PARTIAL: SCHEMA_BACKUP_PARTIAL,
-    SERVICE_PURGE: None,
+    SERVICE_BACKUP_BATCH: SCHEMA_BACKUP_BATCH,
+    SERVICE_PURGE: SCHEMA_PURGE,
+    SERVICE_REASSEMBLE: SCHEMA_REASSEMBLE,
+    SERVICE_LIST_DOWNLOADS: SCHEMA_LIST_DOWNLOADS,
+    SERVICE_PROFILE: None,
+    SERVICE_VERIFY_DOWNLOADS: SCHEMA_VERIFY_DOWNLOADS,
+    SERVICE_HISTORY: SCHEMA_HISTORY,
+    SERVICE_CANCEL: SCHEMA_CANCEL,
+    SERVICE_LIST_BACKUPS: SCHEMA_LIST_BACKUPS,
+}
+
+RESPONSE_SERVICES = {
+    SERVICE_PURGE: SupportsResponse.OPTIONAL,
+    SERVICE_BACKUP_BATCH: SupportsResponse.OPTIONAL,
+    SERVICE_REASSEMBLE: SupportsResponse.OPTIONAL,
+    SERVICE_LIST_DOWNLOADS: SupportsResponse.ONLY,
+    SERVICE_VERIFY_DOWNLOADS: SupportsResponse.OPTIONAL,
+    SERVICE_HISTORY: SupportsResponse.ONLY,
+    SERVICE_CANCEL: SupportsResponse.OPTIONAL,
+    SERVICE_LIST_BACKUPS: SupportsResponse.ONLY,
 }
 
 
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the Auto Backup component."""
+    hass.http.register_view(AutoBackupMetricsView())
+    async_register_commands(hass)
+    return True
+
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Set up Auto Backup from a config entry."""
     _LOGGER.info("Setting up Auto Backup config entry %s", entry.entry_id)
@@ -118,10 +280,59 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
         CONF_BACKUP_TIMEOUT: entry.options.get(
             CONF_BACKUP_TIMEOUT, DEFAULT_BACKUP_TIMEOUT
         ),
+        CONF_DOWNLOAD_RATE_LIMIT: entry.options.get(
+            CONF_DOWNLOAD_RATE_LIMIT, DEFAULT_DOWNLOAD_RATE_LIMIT
+        ),
+        CONF_ADAPTIVE_THROTTLE: entry.options.get(CONF_ADAPTIVE_THROTTLE, False),
+        CONF_LOOP_WATCHDOG: entry.options.get(CONF_LOOP_WATCHDOG, False),
+        CONF_VERIFY_DOWNLOADS: entry.options.get(CONF_VERIFY_DOWNLOADS, False),
+        CONF_PAUSE_DOWNLOADS: entry.options.get(CONF_PAUSE_DOWNLOADS, False),
+        CONF_TRACING: entry.options.get(CONF_TRACING, False),
+        CONF_UNCACHED_DOWNLOADS: entry.options.get(CONF_UNCACHED_DOWNLOADS, False),
+        CONF_SYNC_INTERVAL: entry.options.get(
+            CONF_SYNC_INTERVAL, DEFAULT_SYNC_INTERVAL
+        ),
+        CONF_COMPRESSION_LEVEL: entry.options.get(
+            CONF_COMPRESSION_LEVEL, DEFAULT_COMPRESSION_LEVEL
+        ),
+        CONF_COMPRESSION_WORKERS: entry.options.get(
+            CONF_COMPRESSION_WORKERS, DEFAULT_COMPRESSION_WORKERS
+        ),
+        CONF_S3_ENDPOINT: entry.options.get(CONF_S3_ENDPOINT, ""),
+        CONF_S3_REGION: entry.options.get(CONF_S3_REGION, DEFAULT_S3_REGION),
+        CONF_S3_ACCESS_KEY: entry.options.get(CONF_S3_ACCESS_KEY, ""),
+        CONF_S3_SECRET_KEY: entry.options.get(CONF_S3_SECRET_KEY, ""),
+        CONF_HIGH_WATERMARK: entry.options.get(
+            CONF_HIGH_WATERMARK, DEFAULT_HIGH_WATERMARK
+        ),
+        CONF_LOW_WATERMARK: entry.options.get(
+            CONF_LOW_WATERMARK, DEFAULT_LOW_WATERMARK
+        ),
+        CONF_WATERMARK_ORDER: entry.options.get(CONF_WATERMARK_ORDER, ORDER_OLDEST),
+        CONF_KEEP_HOURLY: entry.options.get(CONF_KEEP_HOURLY, 0),
+        CONF_KEEP_DAILY: entry.options.get(CONF_KEEP_DAILY, 0),
+        CONF_KEEP_WEEKLY: entry.options.get(CONF_KEEP_WEEKLY, 0),
+        CONF_KEEP_MONTHLY: entry.options.get(CONF_KEEP_MONTHLY, 0),
+        CONF_SCHEDULE: entry.options.get(CONF_SCHEDULE, ""),
+        CONF_SCHEDULE_BACKUP: entry.options.get(CONF_SCHEDULE_BACKUP, {}),
+        CONF_SCHEDULE_JITTER: entry.options.get(
+            CONF_SCHEDULE_JITTER, DEFAULT_SCHEDULE_JITTER
+        ),
+        CONF_SCHEDULE_WINDOW: entry.options.get(
+            CONF_SCHEDULE_WINDOW, DEFAULT_SCHEDULE_WINDOW
+        ),
+        CONF_SCHEDULE_CATCH_UP: entry.options.get(CONF_SCHEDULE_CATCH_UP, True),
+        CONF_MAX_LOAD: entry.options.get(CONF_MAX_LOAD, DEFAULT_MAX_LOAD),
+        CONF_MAX_MEMORY: entry.options.get(CONF_MAX_MEMORY, DEFAULT_MAX_MEMORY),
+        CONF_MAX_IO_PRESSURE: entry.options.get(
+            CONF_MAX_IO_PRESSURE, DEFAULT_MAX_IO_PRESSURE
+        ),
+        CONF_BLOCKING_ENTITIES: entry.options.get(CONF_BLOCKING_ENTITIES, []),
+        CONF_BLOCKING_THRESHOLDS: entry.options.get(CONF_BLOCKING_THRESHOLDS, {}),
     }
 
     if is_hassio(hass):
-        handler = SupervisorHandler(getenv("SUPERVISOR"), async_get_clientsession(hass))
+        handler = SupervisorHandler(getenv("SUPERVISOR"))
     else:
         handler = BackupHandler(hass, hass.data[DATA_MANAGER])
 
@@ -129,44 +340,99 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     hass.data[DATA_AUTO_BACKUP] = auto_backup
     entry.async_on_unload(entry.add_update_listener(auto_backup.update_listener))
 
+    async def _async_close_handler(_: Event):
+        await handler.async_close()
+
+    # config entries are not unloaded when Home Assistant stops
+    entry.async_on_unload(
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _async_close_handler)
+    )
+
     await auto_backup.load_snapshots_expiry()
+    await auto_backup.load_fingerprints()
+    await auto_backup.load_history()
 
     ### REGISTER SERVICES ###
     async def async_service_handler(call: ServiceCall):
         """Handle Auto Backup service calls."""
+        with auto_backup.tracer.span(
+            f"{DOMAIN}.{call.service}", **{"auto_backup.context": call.context.id}
+        ):
+            return await _async_handle_service(call)
+
+    async def _async_handle_service(call: ServiceCall):
         if call.service == SERVICE_PURGE:
-            await auto_backup.purge_backups()
+            if call.data[ATTR_DRY_RUN]:
+                return auto_backup.purge_plan()
+            return {ATTR_BACKUPS: await auto_backup.purge_backups()}
+        elif call.service == SERVICE_PROFILE:
+            auto_backup.profile_next_run()
+        elif call.service == SERVICE_REASSEMBLE:
+            return await auto_backup.async_reassemble(
+                call.data[ATTR_INDEX], call.data.get(ATTR_DESTINATION)
+            )
+        elif call.service == SERVICE_LIST_DOWNLOADS:
+            downloads = await auto_backup.async_list_downloads(
+                call.data[ATTR_DIRECTORY]
+            )
+            return {"downloads": downloads}
+        elif call.service == SERVICE_VERIFY_DOWNLOADS:
+            results = await auto_backup.async_verify_downloads(
+                call.data[ATTR_DIRECTORY], call.data[ATTR_FORCE]
+            )
+            return {"downloads": results}
+        elif call.service == SERVICE_HISTORY:
+            history = auto_backup.history
+            return {
+                "runs": history.records(
+                    call.data.get(ATTR_LIMIT), call.data.get(ATTR_OUTCOME)
+                ),
+                "averages": {
+                    "full": history.averages("full"),
+                    "partial": history.averages("partial"),
+                },
+            }
+        elif call.service == SERVICE_LIST_BACKUPS:
+            return await auto_backup.async_list_backups(**list_backups_args(call.data))
+        elif call.service == SERVICE_CANCEL:
+            return await auto_backup.async_cancel(
+                call.data.get(ATTR_SLUG), call.data[ATTR_JOB]
+            )
+        elif call.service == SERVICE_BACKUP_BATCH:
+            results = await auto_backup.async_create_backups(
+                [
+                    normalize_backup_data(SERVICE_BACKUP, data)
+                    for data in call.data[ATTR_BACKUPS]
+                ]
+            )
+            return {ATTR_BACKUPS: results}
         else:
-            data = call.data.copy()
-            if call.service == SERVICE_BACKUP_PARTIAL:
-                data[ATTR_INCLUDE] = {
-                    ATTR_FOLDERS: data.pop(ATTR_FOLDERS, []),
-                    ATTR_ADDONS: data.pop(ATTR_ADDONS, []),
-                }
-            elif call.service == SERVICE_BACKUP:
-                if ATTR_INCLUDE_ADDONS in data or ATTR_INCLUDE_FOLDERS in data:
-                    data[ATTR_INCLUDE] = {
-                        ATTR_FOLDERS: data.pop(ATTR_INCLUDE_FOLDERS, []),
-                        ATTR_ADDONS: data.pop(ATTR_INCLUDE_ADDONS, []),
-                    }
-                if ATTR_EXCLUDE_ADDONS in data or ATTR_EXCLUDE_FOLDERS in data:
-                    data[ATTR_EXCLUDE] = {
-                        ATTR_FOLDERS: data.pop(ATTR_EXCLUDE_FOLDERS, []),
-                        ATTR_ADDONS: data.pop(ATTR_EXCLUDE_ADDONS, []),
-                    }
-
+            data = normalize_backup_data(call.service, call.data)
             await auto_backup.async_create_backup(data)
 
     for service, schema in MAP_SERVICES.items():
-        hass.services.async_register(DOMAIN, service, async_service_handler, schema)
+        hass.services.async_register(
+            DOMAIN,
+            service,
+            async_service_handler,
+            schema,
+            RESPONSE_SERVICES.get(service, SupportsResponse.NONE),
+        )
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    await auto_backup.scheduler.async_start()
     return True
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Unload a config entry."""
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    if not unload_ok:
+        # the entry stays loaded, so do its services and resources
+        return False
+
     for service in MAP_SERVICES.keys():
         hass.services.async_remove(DOMAIN, service)
 
-    return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    await hass.data[DATA_AUTO_BACKUP].async_unload()
+    return True
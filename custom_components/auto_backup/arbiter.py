@@ -0,0 +1,220 @@
+"""Scheduling of disk intensive operations that share the same storage."""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+_LOGGER = logging.getLogger(__name__)
+
+IO_CREATE = "create"
+IO_PURGE = "purge"
+IO_DOWNLOAD = "download"
+IO_VERIFY = "verify"
+
+# operations running at the same time, of any class
+DEFAULT_CAPACITY = 3
+
+
+@dataclass(frozen=True)
+class IOClass:
+    """How operations of a class are scheduled."""
+
+    # waiting operations with a lower number start first
+    priority: int
+    # operations of this class running at the same time
+    limit: int
+    # classes that keep this class from running while exclusive
+    yields_to: Tuple[str, ...] = ()
+    # classes that always keep this class from running, while announced or running
+    waits_for: Tuple[str, ...] = ()
+    # slots of the capacity kept free for this class when it is not running
+    reserved: int = 0
+
+
+IO_CLASSES: Dict[str, IOClass] = {
+    # the Supervisor creates one backup at a time, never behind other operations
+    IO_CREATE: IOClass(priority=0, limit=1, reserved=1),
+    # removing backups while they are downloaded competes for the same disk
+    IO_PURGE: IOClass(
+        priority=1, limit=1, yields_to=(IO_CREATE,), waits_for=(IO_DOWNLOAD,)
+    ),
+    IO_DOWNLOAD: IOClass(priority=2, limit=2, yields_to=(IO_CREATE,)),
+    # each verification keeps an executor thread busy decompressing
+    IO_VERIFY: IOClass(priority=3, limit=2, yields_to=(IO_CREATE,)),
+}
+
+
+class IOArbiter:
+    """Grant slots to create, purge, download and verify operations.
+
+    Waiting operations are started in order of priority, as long as their class
+    is below its limit and there is capacity left, not counting the slots
+    reserved for other classes. Classes always wait for the operations they
+    wait for, including announced ones that have not asked for a slot yet. In
+    exclusive mode, classes also wait for the classes they yield to, and
+    running downloads pause at their next chunk until those are done.
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_CAPACITY,
+        classes: Optional[Dict[str, IOClass]] = None,
+    ):
+        self.capacity = capacity
+        self._classes = classes or IO_CLASSES
+        self._exclusive = False
+        self._active: Dict[str, int] = {name: 0 for name in self._classes}
+        self._announced: Dict[str, int] = {name: 0 for name in self._classes}
+        # (priority, sequence, class, future), cancelled waiters are skipped
+        self._waiters: List[Tuple[int, int, str, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._resumed: Dict[str, asyncio.Event] = {}
+
+    @property
+    def exclusive(self) -> bool:
+        return self._exclusive
+
+    @exclusive.setter
+    def exclusive(self, exclusive: bool):
+        self._exclusive = exclusive
+        self._update()
+
+    def _is_yielding(self, name: str) -> bool:
+        return self._exclusive and any(
+            self._active[other] for other in self._classes[name].yields_to
+        )
+
+    def _is_waiting(self, name: str) -> bool:
+        return any(
+            self._active[other] or self._announced[other]
+            for other in self._classes[name].waits_for
+        )
+
+    def _free(self, name: str) -> int:
+        """Return the capacity left for a class, after the reserved slots."""
+        reserved = sum(
+            max(io_class.reserved - self._active[other], 0)
+            for other, io_class in self._classes.items()
+            if other != name
+        )
+        # a reservation never takes all of the capacity
+        reserved = min(reserved, self.capacity - 1)
+        return self.capacity - sum(self._active.values()) - reserved
+
+    def _can_start(self, name: str) -> bool:
+        return (
+            self._active[name] < self._classes[name].limit
+            and self._free(name) > 0
+            and not self._is_waiting(name)
+            and not self._is_yielding(name)
+        )
+
+    def _update(self):
+        """Start waiting operations that can run and resume paused ones."""
+        blocked = []
+        while self._waiters and sum(self._active.values()) < self.capacity:
+            waiter = heapq.heappop(self._waiters)
+            _, _, name, future = waiter
+            if future.done():
+                continue
+            if self._can_start(name):
+                self._active[name] += 1
+                future.set_result(None)
+            else:
+                blocked.append(waiter)
+        for waiter in blocked:
+            heapq.heappush(self._waiters, waiter)
+
+        for name, resumed in self._resumed.items():
+            if not self._is_yielding(name):
+                resumed.set()
+
+    def announce(self, name: str) -> Callable[[], None]:
+        """Count an operation that will ask for a slot later, returns its release.
+
+        Lets classes that wait for it hold off until it is done, even before
+        it is waiting for a slot.
+        """
+        self._announced[name] += 1
+
+        def release():
+            self._announced[name] -= 1
+            self._update()
+
+        return release
+
+    @asynccontextmanager
+    async def slot(self, name: str, timeout: Optional[float] = None):
+        """Wait until an operation of the class may run, for its duration.
+
+        Raises TimeoutError if no slot is granted within `timeout` seconds.
+        """
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._waiters,
+            (self._classes[name].priority, next(self._sequence), name, future),
+        )
+        self._update()
+        try:
+            async with asyncio.timeout(timeout):
+                await future
+        except (asyncio.CancelledError, TimeoutError):
+            if future.done() and not future.cancelled():
+                # cancelled after the slot was granted
+                self._release(name)
+            raise
+        try:
+            yield
+        finally:
+            self._release(name)
+
+    def _release(self, name: str):
+        self._active[name] -= 1
+        self._update()
+
+    def pause_point(self, name: str) -> Optional[Awaitable[None]]:
+        """Return an awaitable to wait on while the class must yield, else None.
+
+        Called for every chunk, so not pausing does not create a coroutine.
+        """
+        if not self._is_yielding(name):
+            return None
+        return self._async_resumed(name)
+
+    async def _async_resumed(self, name: str):
+        resumed = self._resumed.setdefault(name, asyncio.Event())
+        start = time.monotonic()
+        while self._is_yielding(name):
+            resumed.clear()
+            await resumed.wait()
+        _LOGGER.debug("Resumed %s after %.1fs", name, time.monotonic() - start)
+
+    @property
+    def waiting(self) -> int:
+        return sum(not future.done() for *_, future in self._waiters)
+
+    def state(self) -> Dict:
+        """Return the running and waiting operations of each class."""
+        waiting = {name: 0 for name in self._classes}
+        for *_, name, future in self._waiters:
+            if not future.done():
+                waiting[name] += 1
+        return {
+            "capacity": self.capacity,
+            "exclusive": self._exclusive,
+            "classes": {
+                name: {
+                    "active": self._active[name],
+                    "waiting": waiting[name],
+                    "limit": io_class.limit,
+                    "paused": self._is_yielding(name),
+                    "announced": self._announced[name],
+                }
+                for name, io_class in self._classes.items()
+            },
+        }
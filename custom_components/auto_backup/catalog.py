@@ -0,0 +1,188 @@
+"""Catalog of backups downloaded to a download path."""
+
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    path TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    slug TEXT NOT NULL,
+    size INTEGER,
+    created REAL NOT NULL,
+    expires REAL
+);
+CREATE INDEX IF NOT EXISTS downloads_directory ON downloads (directory);
+CREATE INDEX IF NOT EXISTS downloads_slug ON downloads (slug);
+CREATE INDEX IF NOT EXISTS downloads_expires ON downloads (expires)
+    WHERE expires IS NOT NULL;
+"""
+
+# applied in order to catalogs created by earlier versions, see PRAGMA user_version
+MIGRATIONS = [
+    """
+    ALTER TABLE downloads ADD COLUMN sha256 TEXT;
+    ALTER TABLE downloads ADD COLUMN verified REAL;
+    """,
+]
+
+COLUMNS = (
+    "path",
+    "directory",
+    "slug",
+    "size",
+    "created",
+    "expires",
+    "sha256",
+    "verified",
+)
+
+
+def _row_to_dict(row) -> Dict:
+    entry = dict(zip(COLUMNS, row))
+    entry["created"] = datetime.fromtimestamp(entry["created"]).astimezone()
+    for key in ("expires", "verified"):
+        if entry[key] is not None:
+            entry[key] = datetime.fromtimestamp(entry[key]).astimezone()
+    return entry
+
+
+class DownloadCatalog:
+    """SQLite backed catalog of downloaded backups.
+
+    All methods perform blocking I/O and must be run in the executor.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self._path, check_same_thread=False)
+            self._connection.executescript(SCHEMA)
+            self._migrate(self._connection)
+        return self._connection
+
+    @staticmethod
+    def _migrate(connection: sqlite3.Connection):
+        (version,) = connection.execute("PRAGMA user_version").fetchone()
+        for index, migration in enumerate(MIGRATIONS[version:], version + 1):
+            connection.executescript(
+                f"BEGIN; {migration} PRAGMA user_version = {index}; COMMIT;"
+            )
+
+    def add(
+        self,
+        path: str,
+        slug: str,
+        size: Optional[int],
+        expires: Optional[datetime] = None,
+    ):
+        """Add or replace a downloaded file."""
+        path = os.path.normpath(path)
+        with self._lock, self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO downloads"
+                " (path, directory, slug, size, created, expires)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    path,
+                    os.path.dirname(path),
+                    slug,
+                    size,
+                    datetime.now().timestamp(),
+                    expires.timestamp() if expires else None,
+                ),
+            )
+
+    def get(self, path: str) -> Optional[Dict]:
+        """Return the entry of a downloaded file."""
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    f"SELECT {', '.join(COLUMNS)} FROM downloads WHERE path = ?",
+                    (os.path.normpath(path),),
+                )
+                .fetchone()
+            )
+            return _row_to_dict(row) if row else None
+
+    def set_verified(self, path: str, sha256: str, verified: datetime):
+        """Record the checksum of a file that was verified to be intact."""
+        with self._lock, self._connect() as connection:
+            connection.execute(
+                "UPDATE downloads SET sha256 = ?, verified = ? WHERE path = ?",
+                (sha256, verified.timestamp(), os.path.normpath(path)),
+            )
+
+    def list_directory(self, directory: str) -> List[Dict]:
+        """Return the downloaded files in a directory."""
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT {', '.join(COLUMNS)} FROM downloads WHERE directory = ?"
+                " ORDER BY created",
+                (os.path.normpath(directory),),
+            )
+            return [_row_to_dict(row) for row in rows]
+
+    def paths_by_slug(self, slugs: List[str]) -> Dict[str, List[str]]:
+        """Return the paths each of the backups was downloaded to."""
+        paths: Dict[str, List[str]] = {slug: [] for slug in slugs}
+        if not slugs:
+            return paths
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT slug, path FROM downloads"
+                f" WHERE slug IN ({', '.join('?' * len(slugs))}) ORDER BY created",
+                slugs,
+            )
+            for slug, path in rows:
+                paths[slug].append(path)
+        return paths
+
+    def list_expired(self, now: datetime) -> List[Dict]:
+        """Return all entries that expired before now."""
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT {', '.join(COLUMNS)} FROM downloads"
+                " WHERE expires IS NOT NULL AND expires < ?",
+                (now.timestamp(),),
+            )
+            return [_row_to_dict(row) for row in rows]
+
+    def remove(self, paths: List[str]):
+        """Remove the entries of files that no longer exist."""
+        with self._lock, self._connect() as connection:
+            connection.executemany(
+                "DELETE FROM downloads WHERE path = ?",
+                [(os.path.normpath(path),) for path in paths],
+            )
+
+    def count_expired(self, now: datetime) -> int:
+        """Return the number of entries that expired before now."""
+        with self._lock:
+            (count,) = (
+                self._connect()
+                .execute(
+                    "SELECT COUNT(*) FROM downloads"
+                    " WHERE expires IS NOT NULL AND expires < ?",
+                    (now.timestamp(),),
+                )
+                .fetchone()
+            )
+            return count
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
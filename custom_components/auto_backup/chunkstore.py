@@ -0,0 +1,310 @@
+"""Content-defined chunking and a deduplicating chunk store for downloaded backups.
+
+A downloaded backup is split into variable sized chunks whose boundaries depend
+only on the surrounding content, so data shifted by insertions upstream still
+produces the same chunks. Each chunk is stored once under its SHA-256 digest and
+the backup itself is replaced by an index listing its chunks in order.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from .destinations import Destination
+
+_LOGGER = logging.getLogger(__name__)
+
+STORE_DIRECTORY = ".auto_backup_chunks"
+INDEX_SUFFIX = ".chunks"
+INDEX_VERSION = 1
+
+MIN_CHUNK_SIZE = 16 * 1024  # 16 KB
+MAX_CHUNK_SIZE = 256 * 1024  # 256 KB
+BUFFER_SIZE = 1024 * 1024  # 1 MB
+
+# Chunk boundaries are placed after the first occurrence of this anchor past the
+# minimum chunk size. The anchor matches random data with a probability of 2^-15
+# per byte, giving an average chunk size of ~48 KB. Matching is done by the
+# regex engine in C, which is orders of magnitude faster than a rolling hash in
+# pure Python.
+BOUNDARY = re.compile(rb"\x9b[\x00-\x0f][\x00-\x1f]")
+
+
+class Chunker:
+    """Split a stream of bytes into content-defined chunks."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def _cut(self, final: bool = False) -> Optional[int]:
+        size = len(self._buffer)
+        if size <= MIN_CHUNK_SIZE:
+            return size if final and size else None
+        match = BOUNDARY.search(self._buffer, MIN_CHUNK_SIZE, MAX_CHUNK_SIZE)
+        if match:
+            return match.end()
+        if size >= MAX_CHUNK_SIZE:
+            return MAX_CHUNK_SIZE
+        return size if final else None
+
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        """Add data and yield any chunks that are now complete."""
+        self._buffer += data
+        yield from self._drain()
+
+    def flush(self) -> Iterator[bytes]:
+        """Yield the remaining chunks at the end of the stream."""
+        yield from self._drain(final=True)
+
+    def _drain(self, final: bool = False) -> Iterator[bytes]:
+        while (cut := self._cut(final)) is not None:
+            chunk = bytes(self._buffer[:cut])
+            del self._buffer[:cut]
+            yield chunk
+
+
+class ChunkStore:
+    """Content-addressed store of chunks, shared by all indexes in a directory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.root = os.path.join(directory, STORE_DIRECTORY)
+        self._known: Optional[Set[str]] = None
+        self.writers = 0
+        # held while storing a chunk, collecting garbage and (un)registering
+        # writers, which all run in executor threads
+        self._lock = threading.Lock()
+
+    @property
+    def known_chunks(self) -> Optional[int]:
+        """Number of stored chunks, None until the store has been scanned."""
+        return None if self._known is None else len(self._known)
+
+    def add_writer(self):
+        """Keep garbage from being collected, waits for a running collection."""
+        with self._lock:
+            self.writers += 1
+
+    def remove_writer(self):
+        with self._lock:
+            self.writers -= 1
+
+    def chunk_path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _load(self) -> Set[str]:
+        """Return the digests of all stored chunks, scanning the store once."""
+        if self._known is None:
+            known = set()
+            if os.path.isdir(self.root):
+                for prefix in os.scandir(self.root):
+                    if prefix.is_dir():
+                        known.update(
+                            entry.name
+                            for entry in os.scandir(prefix.path)
+                            if not entry.name.endswith(".tmp")
+                        )
+            self._known = known
+        return self._known
+
+    def put(self, chunk: bytes) -> Tuple[str, bool]:
+        """Store a chunk, returns its digest and whether it had to be written."""
+        digest = hashlib.sha256(chunk).hexdigest()
+        with self._lock:
+            known = self._load()
+            if digest in known:
+                return digest, False
+
+            path = self.chunk_path(digest)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "wb") as file:
+                file.write(chunk)
+            os.replace(tmp, path)
+            known.add(digest)
+        return digest, True
+
+    def get(self, digest: str) -> bytes:
+        with open(self.chunk_path(digest), "rb") as file:
+            return file.read()
+
+    def read_index(self, index_path: str) -> Dict:
+        with open(index_path) as file:
+            return json.load(file)
+
+    def list_indexes(self) -> List[str]:
+        return [
+            entry.path
+            for entry in os.scandir(self.directory)
+            if entry.is_file() and entry.name.endswith(INDEX_SUFFIX)
+        ]
+
+    def reassemble(self, index_path: str, destination: str) -> Dict:
+        """Rebuild the original archive from its index, verifying its checksum."""
+        index = self.read_index(index_path)
+        checksum = hashlib.sha256()
+        tmp = destination + ".tmp"
+        try:
+            with open(tmp, "wb") as file:
+                for digest, size in index["chunks"]:
+                    chunk = self.get(digest)
+                    if len(chunk) != size:
+                        raise ValueError(f"Chunk {digest} is corrupt")
+                    checksum.update(chunk)
+                    file.write(chunk)
+            if checksum.hexdigest() != index["sha256"]:
+                raise ValueError("Checksum of the reassembled backup does not match")
+            os.replace(tmp, destination)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return {"slug": index.get("slug"), "path": destination, "size": index["size"]}
+
+    def collect_garbage(self) -> int:
+        """Remove chunks no longer referenced by any index, returns the count.
+
+        Downloads starting meanwhile wait, so they cannot reuse a chunk that is
+        about to be removed.
+        """
+        with self._lock:
+            if self.writers:
+                # chunks of in-progress downloads are not referenced by an index yet
+                _LOGGER.debug("Skipping garbage collection of '%s', in use", self.root)
+                return 0
+
+            referenced = set()
+            for index_path in self.list_indexes():
+                referenced.update(
+                    digest for digest, _ in self.read_index(index_path)["chunks"]
+                )
+
+            removed = 0
+            for digest in self._load() - referenced:
+                try:
+                    os.remove(self.chunk_path(digest))
+                except FileNotFoundError:
+                    pass
+                self._known.discard(digest)
+                removed += 1
+            return removed
+
+
+class ChunkWriter:
+    """Chunk a backup into the store and write its index, runs in the executor."""
+
+    def __init__(self, store: ChunkStore, index_path: str, slug: str):
+        self._store = store
+        self._index_path = index_path
+        self._slug = slug
+        self._registered = False
+        self._released = False
+        self._chunker = Chunker()
+        self._checksum = hashlib.sha256()
+        self._chunks: List[Tuple[str, int]] = []
+        self._size = 0
+        self.new_chunks = 0
+        self.stored = 0
+
+    def _put(self, chunks: Iterator[bytes]):
+        for chunk in chunks:
+            digest, written = self._store.put(chunk)
+            self._chunks.append((digest, len(chunk)))
+            if written:
+                self.new_chunks += 1
+                self.stored += len(chunk)
+
+    def write(self, data: bytes):
+        self._checksum.update(data)
+        self._size += len(data)
+        self._put(self._chunker.feed(data))
+
+    def register(self):
+        """Keep garbage collection from removing the chunks being written."""
+        self._store.add_writer()
+        self._registered = True
+
+    def release(self):
+        """Allow garbage collection of the store once no writers remain."""
+        if self._registered and not self._released:
+            self._released = True
+            self._store.remove_writer()
+
+    def close(self):
+        self._put(self._chunker.flush())
+        index = {
+            "version": INDEX_VERSION,
+            "slug": self._slug,
+            "size": self._size,
+            "sha256": self._checksum.hexdigest(),
+            "chunks": self._chunks,
+        }
+        with open(self._index_path + ".tmp", "w") as file:
+            json.dump(index, file)
+        os.replace(self._index_path + ".tmp", self._index_path)
+
+    @property
+    def chunks(self) -> int:
+        return len(self._chunks)
+
+
+class ChunkedDestination(Destination):
+    """Stream a backup into a chunk store instead of writing a full archive."""
+
+    def __init__(self, store: ChunkStore, path: str, slug: str):
+        super().__init__(path)
+        self._writer = ChunkWriter(store, path, slug)
+        self._buffer = bytearray()
+        # the last call in the executor, which keeps running when cancelled
+        self._running: Optional[asyncio.Future] = None
+
+    async def _run(self, func, *args):
+        self._running = asyncio.get_running_loop().run_in_executor(None, func, *args)
+        return await asyncio.shield(self._running)
+
+    async def open(self):
+        # may wait for garbage collection, which holds the store's lock
+        try:
+            await self._run(self._writer.register)
+        except asyncio.CancelledError:
+            # abort is not called when opening fails, the writer still registers
+            await self._release()
+            raise
+
+    async def _flush(self):
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        await self._run(self._writer.write, data)
+
+    async def write(self, chunk: bytes):
+        self._buffer += chunk
+        if len(self._buffer) >= BUFFER_SIZE:
+            await self._flush()
+
+    async def close(self) -> Dict:
+        await self._flush()
+        try:
+            await self._run(self._writer.close)
+        finally:
+            await self._release()
+        return {
+            "chunks": self._writer.chunks,
+            "new_chunks": self._writer.new_chunks,
+            "stored": self._writer.stored,
+        }
+
+    async def abort(self):
+        # chunks already written are kept, they are reused by the next attempt
+        # or removed by garbage collection when unreferenced.
+        self._buffer.clear()
+        await self._release()
+
+    async def _release(self):
+        if self._running is not None:
+            # chunks being stored are not referenced yet, release only after
+            await asyncio.wait((self._running,))
+        await self._run(self._writer.release)
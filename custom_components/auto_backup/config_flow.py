@@ -5,10 +5,64 @@ from typing import Any
 import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.core import callback, HomeAssistant
+from homeassistant.helpers import selector
 from homeassistant.helpers.hassio import is_hassio
+from homeassistant.util import dt as dt_util
 
+from . import SCHEMA_BACKUP, SCHEMA_BLOCKING_THRESHOLDS
 from .helpers import is_backup
-from .const import DOMAIN, DEFAULT_BACKUP_TIMEOUT, CONF_AUTO_PURGE, CONF_BACKUP_TIMEOUT
+from .scheduler import CronSchedule
+from .const import (
+    DOMAIN,
+    DEFAULT_BACKUP_TIMEOUT,
+    DEFAULT_DOWNLOAD_RATE_LIMIT,
+    CONF_AUTO_PURGE,
+    CONF_BACKUP_TIMEOUT,
+    CONF_DOWNLOAD_RATE_LIMIT,
+    CONF_ADAPTIVE_THROTTLE,
+    CONF_LOOP_WATCHDOG,
+    CONF_VERIFY_DOWNLOADS,
+    CONF_PAUSE_DOWNLOADS,
+    CONF_TRACING,
+    CONF_UNCACHED_DOWNLOADS,
+    CONF_SYNC_INTERVAL,
+    DEFAULT_SYNC_INTERVAL,
+    CONF_COMPRESSION_LEVEL,
+    CONF_COMPRESSION_WORKERS,
+    DEFAULT_COMPRESSION_LEVEL,
+    DEFAULT_COMPRESSION_WORKERS,
+    CONF_S3_ENDPOINT,
+    CONF_S3_REGION,
+    CONF_S3_ACCESS_KEY,
+    CONF_S3_SECRET_KEY,
+    DEFAULT_S3_REGION,
+    CONF_HIGH_WATERMARK,
+    CONF_LOW_WATERMARK,
+    CONF_WATERMARK_ORDER,
+    CONF_KEEP_HOURLY,
+    CONF_KEEP_DAILY,
+    CONF_KEEP_WEEKLY,
+    CONF_KEEP_MONTHLY,
+    DEFAULT_HIGH_WATERMARK,
+    DEFAULT_LOW_WATERMARK,
+    ORDER_OLDEST,
+    ORDER_EXPIRY,
+    CONF_SCHEDULE,
+    CONF_SCHEDULE_BACKUP,
+    CONF_SCHEDULE_JITTER,
+    CONF_SCHEDULE_WINDOW,
+    CONF_SCHEDULE_CATCH_UP,
+    CONF_MAX_LOAD,
+    CONF_MAX_MEMORY,
+    CONF_MAX_IO_PRESSURE,
+    CONF_BLOCKING_ENTITIES,
+    CONF_BLOCKING_THRESHOLDS,
+    DEFAULT_SCHEDULE_JITTER,
+    DEFAULT_SCHEDULE_WINDOW,
+    DEFAULT_MAX_LOAD,
+    DEFAULT_MAX_MEMORY,
+    DEFAULT_MAX_IO_PRESSURE,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -46,6 +100,78 @@ OPTIONS_SCHEMA = vol.Schema(
     {
         vol.Required(CONF_AUTO_PURGE, default=True): bool,
         vol.Required(CONF_BACKUP_TIMEOUT, default=DEFAULT_BACKUP_TIMEOUT): int,
+        vol.Required(
+            CONF_DOWNLOAD_RATE_LIMIT, default=DEFAULT_DOWNLOAD_RATE_LIMIT
+        ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Required(CONF_ADAPTIVE_THROTTLE, default=False): bool,
+        vol.Required(CONF_VERIFY_DOWNLOADS, default=False): bool,
+        vol.Required(CONF_PAUSE_DOWNLOADS, default=False): bool,
+        vol.Required(CONF_UNCACHED_DOWNLOADS, default=False): bool,
+        vol.Required(CONF_SYNC_INTERVAL, default=DEFAULT_SYNC_INTERVAL): vol.All(
+            vol.Coerce(int), vol.Range(min=0)
+        ),
+        vol.Required(
+            CONF_COMPRESSION_LEVEL, default=DEFAULT_COMPRESSION_LEVEL
+        ): vol.All(vol.Coerce(int), vol.Range(min=1, max=9)),
+        vol.Required(
+            CONF_COMPRESSION_WORKERS, default=DEFAULT_COMPRESSION_WORKERS
+        ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+        vol.Optional(CONF_S3_ENDPOINT, default=""): str,
+        vol.Optional(CONF_S3_REGION, default=DEFAULT_S3_REGION): str,
+        vol.Optional(CONF_S3_ACCESS_KEY, default=""): str,
+        vol.Optional(CONF_S3_SECRET_KEY, default=""): selector.TextSelector(
+            selector.TextSelectorConfig(type=selector.TextSelectorType.PASSWORD)
+        ),
+        vol.Required(CONF_HIGH_WATERMARK, default=DEFAULT_HIGH_WATERMARK): vol.All(
+            vol.Coerce(float), vol.Range(min=0, max=100)
+        ),
+        vol.Required(CONF_LOW_WATERMARK, default=DEFAULT_LOW_WATERMARK): vol.All(
+            vol.Coerce(float), vol.Range(min=0, max=100)
+        ),
+        vol.Required(
+            CONF_WATERMARK_ORDER, default=ORDER_OLDEST
+        ): selector.SelectSelector(
+            selector.SelectSelectorConfig(
+                options=[ORDER_OLDEST, ORDER_EXPIRY],
+                translation_key=CONF_WATERMARK_ORDER,
+            )
+        ),
+        vol.Required(CONF_KEEP_HOURLY, default=0): vol.All(
+            vol.Coerce(int), vol.Range(min=0)
+        ),
+        vol.Required(CONF_KEEP_DAILY, default=0): vol.All(
+            vol.Coerce(int), vol.Range(min=0)
+        ),
+        vol.Required(CONF_KEEP_WEEKLY, default=0): vol.All(
+            vol.Coerce(int), vol.Range(min=0)
+        ),
+        vol.Required(CONF_KEEP_MONTHLY, default=0): vol.All(
+            vol.Coerce(int), vol.Range(min=0)
+        ),
+        vol.Required(CONF_LOOP_WATCHDOG, default=False): bool,
+        vol.Required(CONF_TRACING, default=False): bool,
+        vol.Optional(CONF_SCHEDULE, default=""): str,
+        vol.Optional(CONF_SCHEDULE_BACKUP, default={}): selector.ObjectSelector(),
+        vol.Required(CONF_SCHEDULE_JITTER, default=DEFAULT_SCHEDULE_JITTER): vol.All(
+            vol.Coerce(int), vol.Range(min=0)
+        ),
+        vol.Required(CONF_SCHEDULE_WINDOW, default=DEFAULT_SCHEDULE_WINDOW): vol.All(
+            vol.Coerce(int), vol.Range(min=0)
+        ),
+        vol.Required(CONF_SCHEDULE_CATCH_UP, default=True): bool,
+        vol.Required(CONF_MAX_LOAD, default=DEFAULT_MAX_LOAD): vol.All(
+            vol.Coerce(float), vol.Range(min=0)
+        ),
+        vol.Required(CONF_MAX_MEMORY, default=DEFAULT_MAX_MEMORY): vol.All(
+            vol.Coerce(float), vol.Range(min=0, max=100)
+        ),
+        vol.Required(CONF_MAX_IO_PRESSURE, default=DEFAULT_MAX_IO_PRESSURE): vol.All(
+            vol.Coerce(float), vol.Range(min=0, max=100)
+        ),
+        vol.Optional(CONF_BLOCKING_ENTITIES, default=[]): selector.EntitySelector(
+            selector.EntitySelectorConfig(multiple=True)
+        ),
+        vol.Optional(CONF_BLOCKING_THRESHOLDS, default={}): selector.ObjectSelector(),
     }
 )
 
@@ -53,12 +179,42 @@ OPTIONS_SCHEMA = vol.Schema(
 class OptionsFlowHandler(config_entries.OptionsFlow):
     async def async_step_init(self, user_input: dict[str, Any] | None = None):
         """Manage the Auto Backup options."""
+        errors = {}
         if user_input is not None:
-            return self.async_create_entry(data=user_input)
+            if (
+                user_input.get(CONF_HIGH_WATERMARK)
+                and user_input.get(CONF_LOW_WATERMARK, DEFAULT_LOW_WATERMARK)
+                >= user_input[CONF_HIGH_WATERMARK]
+            ):
+                errors[CONF_LOW_WATERMARK] = "invalid_watermarks"
+            if user_input.get(CONF_S3_ENDPOINT) and not user_input[
+                CONF_S3_ENDPOINT
+            ].startswith(("http://", "https://")):
+                errors[CONF_S3_ENDPOINT] = "invalid_endpoint"
+            if user_input.get(CONF_SCHEDULE):
+                try:
+                    CronSchedule(user_input[CONF_SCHEDULE]).next_after(dt_util.now())
+                except ValueError:
+                    errors[CONF_SCHEDULE] = "invalid_schedule"
+            try:
+                user_input[CONF_SCHEDULE_BACKUP] = SCHEMA_BACKUP(
+                    user_input.get(CONF_SCHEDULE_BACKUP) or {}
+                )
+            except vol.Invalid:
+                errors[CONF_SCHEDULE_BACKUP] = "invalid_backup"
+            try:
+                user_input[CONF_BLOCKING_THRESHOLDS] = SCHEMA_BLOCKING_THRESHOLDS(
+                    user_input.get(CONF_BLOCKING_THRESHOLDS) or {}
+                )
+            except vol.Invalid:
+                errors[CONF_BLOCKING_THRESHOLDS] = "invalid_thresholds"
+            if not errors:
+                return self.async_create_entry(data=user_input)
 
         return self.async_show_form(
             step_id="init",
             data_schema=self.add_suggested_values_to_schema(
-                OPTIONS_SCHEMA, self.config_entry.options
+                OPTIONS_SCHEMA, user_input or self.config_entry.options
             ),
+            errors=errors,
         )
@@ -13,17 +13,78 @@ UNSUB_LISTENER = "unsub_listener"
 
 CONF_AUTO_PURGE = "auto_purge"
 CONF_BACKUP_TIMEOUT = "backup_timeout"
+CONF_DOWNLOAD_RATE_LIMIT = "download_rate_limit"
+CONF_ADAPTIVE_THROTTLE = "adaptive_throttle"
+CONF_LOOP_WATCHDOG = "loop_watchdog"
+CONF_VERIFY_DOWNLOADS = "verify_downloads"
+CONF_PAUSE_DOWNLOADS = "pause_downloads"
+CONF_TRACING = "tracing"
+CONF_UNCACHED_DOWNLOADS = "uncached_downloads"
+CONF_SYNC_INTERVAL = "sync_interval"
+CONF_COMPRESSION_LEVEL = "compression_level"
+CONF_COMPRESSION_WORKERS = "compression_workers"
+CONF_S3_ENDPOINT = "s3_endpoint"
+CONF_S3_REGION = "s3_region"
+CONF_S3_ACCESS_KEY = "s3_access_key_id"
+CONF_S3_SECRET_KEY = "s3_secret_access_key"
+CONF_HIGH_WATERMARK = "purge_high_watermark"
+CONF_LOW_WATERMARK = "purge_low_watermark"
+CONF_WATERMARK_ORDER = "purge_order"
+CONF_KEEP_HOURLY = "keep_hourly"
+CONF_KEEP_DAILY = "keep_daily"
+CONF_KEEP_WEEKLY = "keep_weekly"
+CONF_KEEP_MONTHLY = "keep_monthly"
+CONF_SCHEDULE = "schedule"
+CONF_SCHEDULE_BACKUP = "schedule_backup"
+CONF_SCHEDULE_JITTER = "schedule_jitter"
+CONF_SCHEDULE_WINDOW = "schedule_window"
+CONF_SCHEDULE_CATCH_UP = "schedule_catch_up"
+CONF_MAX_LOAD = "max_load"
+CONF_MAX_MEMORY = "max_memory"
+CONF_MAX_IO_PRESSURE = "max_io_pressure"
+CONF_BLOCKING_ENTITIES = "blocking_entities"
+CONF_BLOCKING_THRESHOLDS = "blocking_thresholds"
 
 DEFAULT_BACKUP_TIMEOUT_SECONDS = 1200
 DEFAULT_BACKUP_TIMEOUT = 20
+DEFAULT_DOWNLOAD_RATE_LIMIT = 0
+DEFAULT_SYNC_INTERVAL = 64
+DEFAULT_COMPRESSION_LEVEL = 6
+DEFAULT_COMPRESSION_WORKERS = 0
+DEFAULT_SCHEDULE_JITTER = 0
+DEFAULT_SCHEDULE_WINDOW = 120
+DEFAULT_MAX_LOAD = 0.8
+DEFAULT_MAX_MEMORY = 90
+DEFAULT_MAX_IO_PRESSURE = 10
+DEFAULT_HIGH_WATERMARK = 0
+DEFAULT_LOW_WATERMARK = 80
+DEFAULT_S3_REGION = "us-east-1"
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
 
 EVENT_BACKUP_SUCCESSFUL = f"{DOMAIN}.backup_successful"
 EVENT_BACKUP_START = f"{DOMAIN}.backup_start"
 EVENT_BACKUP_FAILED = f"{DOMAIN}.backup_failed"
 EVENT_BACKUPS_PURGED = f"{DOMAIN}.purged_backups"
+EVENT_BACKUP_DOWNLOADED = f"{DOMAIN}.backup_downloaded"
+EVENT_DOWNLOADS_PURGED = f"{DOMAIN}.purged_downloads"
+EVENT_BATCH_COMPLETED = f"{DOMAIN}.batch_completed"
+EVENT_BACKUP_DEFERRED = f"{DOMAIN}.backup_deferred"
+EVENT_PROFILE_SAVED = f"{DOMAIN}.profile_saved"
+EVENT_BACKUP_VERIFIED = f"{DOMAIN}.backup_verified"
+EVENT_SUPERVISOR_CIRCUIT = f"{DOMAIN}.supervisor_circuit"
+EVENT_BACKUP_CANCELLED = f"{DOMAIN}.backup_cancelled"
+
+SIGNAL_SCHEDULE_UPDATED = f"{DOMAIN}_schedule_updated"
 
 STORAGE_KEY = "snapshots_expiry"
 STORAGE_VERSION = 1
+SNAPSHOTS_STORAGE_VERSION = 2
+CATALOG_KEY = "downloads"
+FINGERPRINTS_KEY = "fingerprints"
+FOLDER_INDEX_KEY = "folder_index"
+SCHEDULE_KEY = "schedule"
+HISTORY_KEY = "history"
 
 ATTR_KEEP_DAYS = "keep_days"
 ATTR_INCLUDE = "include"
@@ -34,15 +95,51 @@ ATTR_EXCLUDE_ADDONS = "exclude_addons"
 ATTR_EXCLUDE_FOLDERS = "exclude_folders"
 ATTR_EXCLUDE_DATABASE = "exclude_database"
 ATTR_DOWNLOAD_PATH = "download_path"
+ATTR_DEDUPLICATE = "deduplicate"
+ATTR_RECOMPRESS = "recompress"
+ATTR_DOWNLOAD_KEEP_DAYS = "download_keep_days"
+ATTR_DIRECTORY = "directory"
+ATTR_SKIP_UNCHANGED = "skip_unchanged"
+ATTR_SKIPPED = "skipped"
+ATTR_UNCHANGED_ADDONS = "unchanged_addons"
+ATTR_UNCHANGED_FOLDERS = "unchanged_folders"
+ATTR_INDEX = "index"
+ATTR_DESTINATION = "destination"
 ATTR_COMPRESSED = "compressed"
 ATTR_ENCRYPTED = "encrypted"
 ATTR_LOCATION = "location"
+ATTR_FORCE = "force"
+ATTR_LIMIT = "limit"
+ATTR_OUTCOME = "outcome"
+ATTR_JOB = "job"
+ATTR_DRY_RUN = "dry_run"
+ATTR_SORT = "sort"
+ATTR_DESCENDING = "descending"
+ATTR_CURSOR = "cursor"
+ATTR_EXPIRED = "expired"
+ATTR_EXPIRES_BEFORE = "expires_before"
+ATTR_EXPIRES_AFTER = "expires_after"
 
 ATTR_LAST_FAILURE = "last_failure"
 ATTR_PURGEABLE = "purgeable_backups"
 ATTR_MONITORED = "monitored_backups"
 ATTR_ERROR = "error"
 ATTR_SLUG = "slug"
+ATTR_SIZE = "size"
+ATTR_BACKUPS = "backups"
+ATTR_DOWNLOADS = "downloads"
+ATTR_DOWNLOAD_ERRORS = "download_errors"
+ATTR_CANCELLED = "cancelled"
+
+ORDER_OLDEST = "oldest"
+ORDER_EXPIRY = "expiry"
+
+SKIP_EXCLUDE = "exclude"
+SKIP_BACKUP = "skip"
+
+JOB_ALL = "all"
+JOB_CREATE = "create"
+JOB_DOWNLOAD = "download"
 
 DEFAULT_BACKUP_FOLDERS = {
     "ssl": "ssl",
@@ -54,7 +151,42 @@ DEFAULT_BACKUP_FOLDERS = {
     "home assistant configuration": "homeassistant",
 }
 
+# where backup folders are mounted in the Home Assistant container, the
+# configuration folder is resolved from the Home Assistant config instead.
+# Local add-ons are not mounted, so they always count as changed.
+FOLDER_PATHS = {
+    "ssl": "/ssl",
+    "share": "/share",
+    "media": "/media",
+}
+
+# paths relative to a folder left out of its fingerprint, as they change on
+# every run without the folder being changed by the user
+FOLDER_EXCLUDES = {
+    "homeassistant": (
+        ".storage/auto_backup*",
+        ".storage/core.restore_state",
+        # written by the tracer, see tracing.TRACE_FILE
+        "auto_backup_traces.jsonl*",
+        # written by the profiler, see profiling.PROFILE_DIRECTORY
+        "auto_backup_profiles",
+        "*.db",
+        "*.db-*",
+        "*.log",
+        "*.log.*",
+        "*__pycache__",
+    ),
+}
+
 SERVICE_PURGE = "purge"
 SERVICE_BACKUP = "backup"
 SERVICE_BACKUP_FULL = "backup_full"
 SERVICE_BACKUP_PARTIAL = "backup_partial"
+SERVICE_BACKUP_BATCH = "backup_batch"
+SERVICE_REASSEMBLE = "reassemble"
+SERVICE_LIST_DOWNLOADS = "list_downloads"
+SERVICE_PROFILE = "profile"
+SERVICE_VERIFY_DOWNLOADS = "verify_downloads"
+SERVICE_HISTORY = "history"
+SERVICE_CANCEL = "cancel"
+SERVICE_LIST_BACKUPS = "list_backups"
@@ -0,0 +1,195 @@
+"""Destinations that downloaded backups are streamed into."""
+
+import asyncio
+import logging
+import os
+from typing import Dict, Optional, Tuple
+
+import aiofiles
+import aiofiles.os
+
+_LOGGER = logging.getLogger(__name__)
+
+MEMINFO_PATH = "/proc/meminfo"
+# written back and dropped from the page cache one block behind the writes
+WRITE_BLOCK_SIZE = 8 * 1024 * 1024
+# sync_file_range is Linux only, posix_fadvise is unavailable on macOS
+HAS_SYNC_FILE_RANGE = hasattr(os, "sync_file_range")
+HAS_FADVISE = hasattr(os, "posix_fadvise")
+
+
+def read_page_cache() -> Optional[int]:
+    """Return the size of the page cache in bytes, None if unavailable."""
+    try:
+        with open(MEMINFO_PATH) as file:
+            for line in file:
+                if line.startswith("Cached:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class Destination:
+    """Receives the contents of a backup while it is being downloaded."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    async def open(self):
+        """Prepare the destination for writing."""
+
+    async def write(self, chunk: bytes):
+        """Write the next chunk of the backup."""
+        raise NotImplementedError
+
+    async def close(self) -> Dict:
+        """Finish writing, returns any additional transfer statistics."""
+        return {}
+
+    async def abort(self):
+        """Discard any partially written output."""
+
+
+class FileDestination(Destination):
+    """Write the backup to a plain file."""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._file = None
+
+    async def open(self):
+        self._file = await aiofiles.open(self.path, "wb")
+
+    async def write(self, chunk: bytes):
+        await self._file.write(chunk)
+
+    async def close(self) -> Dict:
+        await self._file.close()
+        return {}
+
+    async def abort(self):
+        if self._file is not None:
+            await self._file.close()
+        try:
+            await aiofiles.os.remove(self.path)
+        except OSError:
+            pass
+        else:
+            _LOGGER.debug("Removed partial download '%s'", self.path)
+
+
+class UncachedFileDestination(Destination):
+    """Write the backup to a file while keeping it out of the page cache.
+
+    Writeback of each block is started as soon as it is written and the block
+    is dropped from the page cache once the next one is written, so a large
+    backup does not evict the recorder database and other files Home Assistant
+    uses. Data is flushed to disk every `sync_interval` bytes and on close.
+    """
+
+    def __init__(self, path: str, sync_interval: int, size: Optional[int] = None):
+        super().__init__(path)
+        self._sync_interval = sync_interval
+        self._size = size
+        self._fd: Optional[int] = None
+        self._buffer = bytearray()
+        self._offset = 0
+        # the block being written back, dropped after the next block is written
+        self._pending: Optional[Tuple[int, int]] = None
+        self._unsynced = 0
+        self._dropped = 0
+        # the last call in the executor, which keeps running when cancelled
+        self._running: Optional[asyncio.Future] = None
+
+    async def _run(self, func, *args):
+        self._running = asyncio.get_running_loop().run_in_executor(None, func, *args)
+        # cancelling must not lose track of the call still using the fd
+        return await asyncio.shield(self._running)
+
+    def _open(self):
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+        if self._size:
+            try:
+                # allocating the file at once avoids fragmenting it
+                os.posix_fallocate(self._fd, 0, self._size)
+            except (OSError, AttributeError) as err:
+                _LOGGER.debug("Unable to preallocate '%s': %s", self.path, err)
+
+    def _drop(self, offset: int, length: int):
+        if HAS_SYNC_FILE_RANGE:
+            os.sync_file_range(
+                self._fd,
+                offset,
+                length,
+                os.SYNC_FILE_RANGE_WAIT_BEFORE
+                | os.SYNC_FILE_RANGE_WRITE
+                | os.SYNC_FILE_RANGE_WAIT_AFTER,
+            )
+        if HAS_FADVISE:
+            os.posix_fadvise(self._fd, offset, length, os.POSIX_FADV_DONTNEED)
+            self._dropped += length
+
+    def _write(self, data: bytes):
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view) :]
+        offset = self._offset
+        self._offset += len(data)
+        if HAS_SYNC_FILE_RANGE:
+            os.sync_file_range(self._fd, offset, len(data), os.SYNC_FILE_RANGE_WRITE)
+        if self._pending:
+            self._drop(*self._pending)
+        self._pending = (offset, len(data))
+
+        self._unsynced += len(data)
+        if self._sync_interval and self._unsynced >= self._sync_interval:
+            os.fdatasync(self._fd)
+            self._unsynced = 0
+
+    def _close(self):
+        try:
+            if self._size and self._size != self._offset:
+                # remove what was preallocated but not written
+                os.ftruncate(self._fd, self._offset)
+            os.fdatasync(self._fd)
+            if HAS_FADVISE:
+                # the last block and any pages written back out of order
+                os.posix_fadvise(self._fd, 0, 0, os.POSIX_FADV_DONTNEED)
+                self._dropped += self._pending[1] if self._pending else 0
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    async def open(self):
+        await self._run(self._open)
+
+    async def write(self, chunk: bytes):
+        self._buffer += chunk
+        if len(self._buffer) >= WRITE_BLOCK_SIZE:
+            data = bytes(self._buffer)
+            self._buffer.clear()
+            await self._run(self._write, data)
+
+    async def close(self) -> Dict:
+        if self._buffer:
+            await self._run(self._write, bytes(self._buffer))
+            self._buffer.clear()
+        await self._run(self._close)
+        return {"cache_dropped": self._dropped}
+
+    async def abort(self):
+        self._buffer.clear()
+        if self._running is not None:
+            # the fd may only be closed once nothing writes to it, or its number
+            # could be reused for another file the write then ends up in
+            await asyncio.wait((self._running,))
+        if self._fd is not None:
+            await self._run(os.close, self._fd)
+            self._fd = None
+        try:
+            await aiofiles.os.remove(self.path)
+        except OSError:
+            pass
+        else:
+            _LOGGER.debug("Removed partial download '%s'", self.path)
@@ -0,0 +1,52 @@
+"""Diagnostics support for Auto Backup."""
+
+import os
+from typing import Any, Dict, Optional
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.components.hassio import ATTR_PASSWORD
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import STORAGE_DIR
+
+from .const import (
+    DOMAIN,
+    DATA_AUTO_BACKUP,
+    CONF_S3_ACCESS_KEY,
+    CONF_S3_SECRET_KEY,
+    STORAGE_KEY,
+)
+
+TO_REDACT = {ATTR_PASSWORD, CONF_S3_ACCESS_KEY, CONF_S3_SECRET_KEY}
+
+
+def _file_size(path: str) -> Optional[int]:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> Dict[str, Any]:
+    """Return diagnostics for a config entry.
+
+    Everything is read from state kept in memory, apart from the size of the
+    store and a count of expired downloads, so this is safe during a backup.
+    """
+    auto_backup = hass.data[DATA_AUTO_BACKUP]
+    state = auto_backup.diagnostics()
+    state["tracked_backups"]["store_size"] = await hass.async_add_executor_job(
+        _file_size, hass.config.path(STORAGE_DIR, f"{DOMAIN}.{STORAGE_KEY}")
+    )
+    state["expired_downloads"] = await auto_backup.async_count_expired_downloads()
+    return {
+        "options": async_redact_data(entry.options, TO_REDACT),
+        **state,
+        "metrics": auto_backup.metrics.snapshot(),
+        "loop_stalls": {
+            "enabled": auto_backup.watchdog.enabled,
+            "worst": auto_backup.watchdog.report(),
+        },
+    }
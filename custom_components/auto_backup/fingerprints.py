@@ -0,0 +1,138 @@
+"""Fingerprints of backed up items, used to skip items that have not changed.
+
+Fingerprints are kept for each backup spec, with the slug of the backup
+holding the item as of that fingerprint. An item only counts as unchanged while
+that backup still exists, otherwise it would be in no backup at all.
+"""
+
+import hashlib
+import json
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN, FINGERPRINTS_KEY, STORAGE_VERSION
+
+_LOGGER = logging.getLogger(__name__)
+
+# the Supervisor does not expose when an add-on was last updated, an update
+# always changes its version which is covered instead.
+ADDON_FINGERPRINT_FIELDS = ("version", "state")
+
+SAVE_DELAY = 10  # seconds
+
+
+def addon_fingerprint(addon: Dict) -> str:
+    """Return a fingerprint of the add-on metadata returned by `get_addons`."""
+    fields = {field: addon.get(field) for field in ADDON_FINGERPRINT_FIELDS}
+    return hashlib.sha1(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+
+
+class Fingerprints:
+    """Persistent fingerprints of items as of their last successful backup."""
+
+    def __init__(self, hass: HomeAssistant):
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{FINGERPRINTS_KEY}")
+        # spec -> add-on or folder -> (fingerprint or digest, backup slug)
+        self._addons: Dict[str, Dict[str, List[str]]] = {}
+        self._folders: Dict[str, Dict[str, List[str]]] = {}
+
+    async def async_load(self):
+        data = await self._store.async_load()
+        if data is not None:
+            for key, items in (("addons", self._addons), ("folders", self._folders)):
+                recorded = data.get(key, {})
+                # fingerprints of earlier versions are not tied to a backup, drop them
+                if all(isinstance(value, dict) for value in recorded.values()):
+                    items.update(recorded)
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        """Number of add-ons and folders with a recorded fingerprint."""
+        return {
+            "addons": sum(len(addons) for addons in self._addons.values()),
+            "folders": sum(len(folders) for folders in self._folders.values()),
+        }
+
+    def backups(self, spec: str) -> Set[str]:
+        """Return the slugs of the backups the fingerprints of a spec refer to."""
+        return {
+            slug
+            for items in (self._addons, self._folders)
+            for _, slug in items.get(spec, {}).values()
+        }
+
+    def forget_backup(self, backup: str):
+        """Drop the fingerprints of items held by a backup that was removed."""
+        changed = False
+        for items in (self._addons, self._folders):
+            for recorded in items.values():
+                for item in [
+                    item for item, (_, slug) in recorded.items() if slug == backup
+                ]:
+                    del recorded[item]
+                    changed = True
+        if changed:
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def _data_to_save(self) -> Dict:
+        return {"addons": self._addons, "folders": self._folders}
+
+    def compare_addons(
+        self,
+        spec: str,
+        installed_addons: List[Dict],
+        slugs: List[str],
+        backups: Set[str],
+    ) -> Tuple[Dict[str, str], List[str]]:
+        """Return the current fingerprints of the add-ons and which are unchanged.
+
+        `backups` are the slugs of the backups that still exist.
+        """
+        wanted = set(slugs)
+        fingerprints = {
+            addon["slug"]: addon_fingerprint(addon)
+            for addon in installed_addons
+            if addon["slug"] in wanted
+        }
+        recorded = self._addons.get(spec, {})
+        unchanged = [
+            slug
+            for slug in dict.fromkeys(slugs)
+            if slug in fingerprints
+            and slug in recorded
+            and recorded[slug][0] == fingerprints[slug]
+            and recorded[slug][1] in backups
+        ]
+        return fingerprints, unchanged
+
+    def commit_addons(self, spec: str, fingerprints: Dict[str, str], backup: str):
+        """Record the fingerprints of add-ons successfully backed up in a backup."""
+        self._addons.setdefault(spec, {}).update(
+            (addon, [fingerprint, backup])
+            for addon, fingerprint in fingerprints.items()
+        )
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def compare_folders(
+        self, spec: str, digests: Dict[str, Optional[str]], backups: Set[str]
+    ) -> List[str]:
+        """Return the folders whose digest is unchanged, in a backup that exists."""
+        recorded = self._folders.get(spec, {})
+        return [
+            folder
+            for folder, digest in digests.items()
+            if digest is not None
+            and folder in recorded
+            and recorded[folder][0] == digest
+            and recorded[folder][1] in backups
+        ]
+
+    def commit_folders(self, spec: str, digests: Dict[str, Optional[str]], backup: str):
+        """Record the digests of folders successfully backed up in a backup."""
+        self._folders.setdefault(spec, {}).update(
+            (folder, [digest, backup]) for folder, digest in digests.items() if digest
+        )
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
@@ -0,0 +1,170 @@
+"""Incremental fingerprint index of the folders included in backups.
+
+The index stores the stat results of every directory and file under a folder.
+On a rescan, directories whose mtime and inode are unchanged have the same
+entries, so they are not listed again and only their known entries are stat'ed.
+Each directory's digest is derived from its entries and the digests of its
+subdirectories, so the digest of a folder changes when anything below it does.
+"""
+
+import hashlib
+import logging
+import os
+from fnmatch import fnmatchcase
+from typing import Dict, List, Optional, Tuple
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    DOMAIN,
+    FOLDER_EXCLUDES,
+    FOLDER_INDEX_KEY,
+    FOLDER_PATHS,
+    STORAGE_VERSION,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+SAVE_DELAY = 30  # seconds
+
+# keys of a directory node in the index
+MTIME, INODE, FILES, DIRS, DIGEST = "m", "i", "f", "d", "h"
+
+
+def _stat_entry(stat: os.stat_result) -> List[int]:
+    return [stat.st_mtime_ns, stat.st_size, stat.st_ino]
+
+
+def _digest(files: Dict[str, List[int]], dirs: Dict[str, Dict]) -> str:
+    digest = hashlib.sha1()
+    for name in sorted(files):
+        digest.update(f"f{name}\0{files[name]}\0".encode("utf-8", "surrogateescape"))
+    for name in sorted(dirs):
+        digest.update(
+            f"d{name}\0{dirs[name][DIGEST]}\0".encode("utf-8", "surrogateescape")
+        )
+    return digest.hexdigest()
+
+
+def _is_excluded(relative: str, exclude: Tuple[str, ...]) -> bool:
+    return any(fnmatchcase(relative, pattern) for pattern in exclude)
+
+
+def scan_directory(
+    path: str,
+    node: Optional[Dict],
+    exclude: Tuple[str, ...] = (),
+    relative: str = "",
+) -> Dict:
+    """Return an updated index node for a directory, reusing the previous node.
+
+    Entries matching an `exclude` pattern, relative to the scanned folder, are
+    left out of the index.
+    """
+    stat = os.stat(path)
+    files: Dict[str, List[int]] = {}
+    dirs: Dict[str, Dict] = {}
+    previous_dirs = node[DIRS] if node else {}
+
+    if node and node[MTIME] == stat.st_mtime_ns and node[INODE] == stat.st_ino:
+        # entries are unchanged, only their metadata can differ
+        try:
+            for name in node[FILES]:
+                if not _is_excluded(relative + name, exclude):
+                    files[name] = _stat_entry(os.lstat(os.path.join(path, name)))
+            for name, child in previous_dirs.items():
+                if not _is_excluded(relative + name, exclude):
+                    dirs[name] = scan_directory(
+                        os.path.join(path, name), child, exclude, f"{relative}{name}/"
+                    )
+        except FileNotFoundError:
+            # modified within the mtime granularity, list it again
+            return scan_directory(path, {**node, MTIME: None}, exclude, relative)
+        if (
+            files == node[FILES]
+            and dirs.keys() == previous_dirs.keys()
+            and all(
+                dirs[name][DIGEST] == child[DIGEST]
+                for name, child in previous_dirs.items()
+            )
+        ):
+            return {**node, DIRS: dirs}
+    else:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if _is_excluded(relative + entry.name, exclude):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs[entry.name] = scan_directory(
+                            entry.path,
+                            previous_dirs.get(entry.name),
+                            exclude,
+                            f"{relative}{entry.name}/",
+                        )
+                    else:
+                        files[entry.name] = _stat_entry(
+                            entry.stat(follow_symlinks=False)
+                        )
+                except OSError as err:
+                    _LOGGER.debug("Unable to index '%s': %s", entry.path, err)
+
+    return {
+        MTIME: stat.st_mtime_ns,
+        INODE: stat.st_ino,
+        FILES: files,
+        DIRS: dirs,
+        DIGEST: _digest(files, dirs),
+    }
+
+
+class FolderIndex:
+    """Persistent index used to fingerprint backup folders."""
+
+    def __init__(self, hass: HomeAssistant):
+        self._hass = hass
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{FOLDER_INDEX_KEY}")
+        self._trees: Optional[Dict[str, Dict]] = None
+
+    @property
+    def indexed(self) -> Optional[int]:
+        """Number of indexed folders, None until the index has been loaded."""
+        return None if self._trees is None else len(self._trees)
+
+    def folder_path(self, folder: str) -> Optional[str]:
+        """Return the local path of a backup folder, if it is accessible."""
+        if folder == "homeassistant":
+            return self._hass.config.config_dir
+        path = FOLDER_PATHS.get(folder)
+        return path if path and os.path.isdir(path) else None
+
+    def _scan(self, folders: List[str]) -> Dict[str, Optional[str]]:
+        digests = {}
+        for folder in folders:
+            path = self.folder_path(folder)
+            if path is None:
+                # unknown or inaccessible folders always count as changed
+                digests[folder] = None
+                continue
+            try:
+                tree = scan_directory(
+                    path, self._trees.get(folder), FOLDER_EXCLUDES.get(folder, ())
+                )
+            except OSError as err:
+                _LOGGER.warning("Unable to index folder '%s': %s", folder, err)
+                digests[folder] = None
+                continue
+            self._trees[folder] = tree
+            digests[folder] = tree[DIGEST]
+        return digests
+
+    async def async_digests(self, folders: List[str]) -> Dict[str, Optional[str]]:
+        """Rescan the folders and return their current digests."""
+        if self._trees is None:
+            data = await self._store.async_load()
+            self._trees = data or {}
+
+        digests = await self._hass.async_add_executor_job(self._scan, folders)
+        self._store.async_delay_save(lambda: dict(self._trees), SAVE_DELAY)
+        return digests
@@ -1,10 +1,11 @@
 import asyncio
 import logging
-import shutil
+import threading
+import time
 from dataclasses import asdict
 from http import HTTPStatus
-from os import getenv
-from typing import Dict, List, Optional
+from os import getenv, remove
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Union
 
 import aiofiles
 import aiohttp
@@ -18,16 +19,57 @@ from homeassistant.const import ATTR_NAME
 from homeassistant.core import HomeAssistant
 
 from .const import DEFAULT_BACKUP_TIMEOUT_SECONDS
+from .destinations import Destination, FileDestination
+from .metrics import Metrics
+from .retry import CircuitBreaker, CircuitOpenError, RetryPolicy, call_with_retry
+from .s3 import S3Error
+from .throttle import Throttle
+from .tracing import NO_TRACER, SPAN_KIND_CLIENT, Tracer
 
 _LOGGER = logging.getLogger(__name__)
 
-CHUNK_SIZE = 64 * 1024  # 64 KB
+LOCAL_CHUNK_SIZE = 1024 * 1024  # 1 MB
+# a cancelled copy stops at the next block
+COPY_BLOCK_SIZE = 8 * 1024 * 1024  # 8 MB
+SUPERVISOR_BACKUP_DIRECTORY = "/backup"
+
+# connections to the Supervisor, enough for several downloads alongside API calls
+SUPERVISOR_CONNECTION_LIMIT = 8
+# the Supervisor closes idle connections after 75 seconds
+SUPERVISOR_KEEPALIVE_TIMEOUT = 60
+# API responses are small, downloads are read with a larger buffer
+API_READ_BUFSIZE = 64 * 1024  # 64 KB
+DOWNLOAD_READ_BUFSIZE = 1024 * 1024  # 1 MB
+# returned while the Supervisor or its proxy is restarting or overloaded
+TRANSIENT_STATUSES = (
+    HTTPStatus.INTERNAL_SERVER_ERROR,
+    HTTPStatus.BAD_GATEWAY,
+    HTTPStatus.SERVICE_UNAVAILABLE,
+    HTTPStatus.GATEWAY_TIMEOUT,
+)
+IDEMPOTENT_METHODS = ("get", "delete")
+# a failing delete holds up other purges and creates, so it is retried briefly
+REMOVE_TIMEOUT = 60  # seconds, per attempt
+REMOVE_DEADLINE = 180  # seconds, after which it is not retried
 
 
 class HassioAPIError(RuntimeError):
     """Return if an API throws an error."""
 
 
+class SupervisorRequestError(HassioAPIError):
+    """A request to the Supervisor failed without a result.
+
+    `transient` errors may succeed when repeated, `sent` is False when the
+    request cannot have reached the Supervisor, so repeating it is always safe.
+    """
+
+    def __init__(self, message: str, transient: bool = True, sent: bool = True):
+        super().__init__(message)
+        self.transient = transient
+        self.sent = sent
+
+
 def api_data(funct):
     """Return data of an api."""
 
@@ -42,6 +84,18 @@ def api_data(funct):
 
 
 class HandlerBase:
+    # set by AutoBackup, counters are updated as data is transferred
+    metrics: Optional[Metrics] = None
+    # guards requests to the backend, if it is remote
+    breaker: Optional[CircuitBreaker] = None
+    # set by AutoBackup, requests to the backend are recorded as spans
+    tracer: Tracer = NO_TRACER
+
+    @property
+    def backup_directory(self) -> Optional[str]:
+        """Local directory backups are stored in, if it is accessible."""
+        return None
+
     async def get_addons(self) -> List[Dict]:
         """Returns a list of the installed addons."""
         raise NotImplementedError
@@ -62,27 +116,196 @@ class HandlerBase:
         """
         raise NotImplementedError
 
-    async def download_backup(
-        self, slug: str, destination: str, timeout: int = DEFAULT_BACKUP_TIMEOUT_SECONDS
-    ):
-        """Download and save a backup from Hass.io."""
+    async def get_backup_size(self, slug: str) -> Optional[int]:
+        """Return the size of a backup in bytes, if it can be determined."""
+        return None
+
+    async def has_backup(self, slug: str) -> bool:
+        """Return whether a backup exists, False if that cannot be determined."""
+        raise NotImplementedError
+
+    async def async_close(self):
+        """Release connections held by the handler."""
+
+    def iter_backup(self, slug: str) -> AsyncIterator[bytes]:
+        """Return an async iterator over the contents of a backup."""
         raise NotImplementedError
 
+    async def download_backup(
+        self,
+        slug: str,
+        destination: Union[str, Destination],
+        timeout: int = DEFAULT_BACKUP_TIMEOUT_SECONDS,
+        throttle: Optional[Throttle] = None,
+        pause: Optional[Callable[[], Optional[Awaitable]]] = None,
+    ) -> Dict:
+        """Download and save a backup, returns the transfer statistics.
+
+        `pause` is called before each chunk is written and returns an awaitable
+        while the download must pause, time paused does not count towards the
+        timeout.
+        """
+        if isinstance(destination, str):
+            destination = FileDestination(destination)
+
+        start = time.monotonic()
+        size = 0
+
+        try:
+            async with asyncio.timeout(timeout) as deadline:
+                await destination.open()
+                try:
+                    async for chunk in self.iter_backup(slug):
+                        if pause and (resumed := pause()) is not None:
+                            loop = asyncio.get_running_loop()
+                            remaining = deadline.when() - loop.time()
+                            deadline.reschedule(None)
+                            await resumed
+                            deadline.reschedule(loop.time() + remaining)
+                        if throttle:
+                            await throttle.consume(len(chunk))
+                        await destination.write(chunk)
+                        size += len(chunk)
+                        if self.metrics:
+                            self.metrics.downloaded_bytes.inc(len(chunk))
+                    extra = await destination.close()
+                except BaseException:
+                    await destination.abort()
+                    raise
+
+            return {**transfer_stats(slug, destination.path, size, start), **extra}
+
+        except TimeoutError:
+            _LOGGER.error("Timeout downloading backup '%s'", slug)
+            error = "timed out"
+
+        except aiohttp.ClientError as err:
+            _LOGGER.error("Client error downloading backup '%s' %s", slug, err)
+            error = str(err)
+
+        except S3Error as err:
+            _LOGGER.error(
+                "Failed to upload backup '%s' to S3 '%s': %s",
+                slug,
+                destination.path,
+                err,
+            )
+            error = f"S3 upload failed: {err}"
+
+        except IOError as err:
+            _LOGGER.error(
+                "Failed to download backup '%s' to '%s': %s",
+                slug,
+                destination.path,
+                err,
+            )
+            error = str(err)
+
+        raise HassioAPIError(
+            f"Backup download failed ({error}). Check the logs for more information."
+        )
+
+
+def transfer_stats(slug: str, destination: str, size: int, start: float) -> Dict:
+    """Log and return the statistics of a completed transfer."""
+    duration = time.monotonic() - start
+    rate = size / duration if duration > 0 else None
+    _LOGGER.info(
+        "Downloaded backup '%s' to '%s' (%.1f MB in %.1fs)",
+        slug,
+        destination,
+        size / 1e6,
+        duration,
+    )
+    return {"size": size, "duration": duration, "rate": rate}
+
+
+def create_supervisor_session() -> aiohttp.ClientSession:
+    """Create a session for Supervisor traffic, separate from other integrations.
+
+    Long downloads would otherwise hold connections of Home Assistant's shared
+    session, which are limited across all hosts.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=SUPERVISOR_CONNECTION_LIMIT,
+        limit_per_host=SUPERVISOR_CONNECTION_LIMIT,
+        keepalive_timeout=SUPERVISOR_KEEPALIVE_TIMEOUT,
+    )
+    return aiohttp.ClientSession(connector=connector, read_bufsize=API_READ_BUFSIZE)
+
 
 class SupervisorHandler(HandlerBase):
     """Small API wrapper for Hass.io."""
 
-    def __init__(self, ip: str, session: aiohttp.ClientSession) -> None:
-        """Initialize Hass.io API."""
+    def __init__(self, ip: str, session: Optional[aiohttp.ClientSession] = None):
+        """Initialize Hass.io API, with a dedicated session unless one is given."""
         self._ip = ip
-        self._session = session
+        self._owns_session = session is None
+        self._session = session or create_supervisor_session()
         self._headers = {AUTHORIZATION: f"Bearer {getenv('SUPERVISOR_TOKEN')}"}
+        self._retry_policy = RetryPolicy()
+        self.breaker = CircuitBreaker()
+
+    async def async_close(self):
+        if self._owns_session and not self._session.closed:
+            await self._session.close()
 
-    async def send_command(self, command, method="post", payload=None, timeout=10):
-        """Send API command to Hass.io.
+    @property
+    def backup_directory(self) -> Optional[str]:
+        # the Supervisor mounts its backup directory into the Home Assistant container
+        return SUPERVISOR_BACKUP_DIRECTORY
+
+    async def _with_retry(
+        self, request, method: str, command: str, deadline: Optional[float] = None
+    ):
+        """Make a request, retrying transient failures when it is safe to."""
+
+        def can_retry(err: Exception) -> bool:
+            # creating a backup twice is not safe, unless it was never sent
+            return method.lower() in IDEMPOTENT_METHODS or not err.sent
+
+        def on_retry(err: Exception, delay: float):
+            _LOGGER.warning("%s, retrying in %.1fs", err, delay)
+            if self.metrics:
+                self.metrics.api_retries.inc()
+
+        try:
+            return await call_with_retry(
+                request,
+                self._retry_policy,
+                self.breaker,
+                is_transient=lambda err: getattr(err, "transient", False),
+                can_retry=can_retry,
+                on_retry=on_retry,
+                deadline=deadline,
+            )
+        except CircuitOpenError as err:
+            self._count_request("rejected")
+            raise HassioAPIError(f"{err}, {command} was not sent") from None
+
+    async def send_command(
+        self, command, method="post", payload=None, timeout=10, deadline=None
+    ):
+        """Send API command to Hass.io, retrying transient failures.
 
         This method is a coroutine.
         """
+        return await self._with_retry(
+            lambda: self._send_command_once(command, method, payload, timeout),
+            method,
+            command,
+            deadline,
+        )
+
+    async def _send_command_once(self, command, method, payload, timeout):
+        with self.tracer.span(
+            f"{method.upper()} {command}",
+            SPAN_KIND_CLIENT,
+            **{"http.request.method": method.upper(), "url.path": command},
+        ) as span:
+            return await self._request_once(command, method, payload, timeout, span)
+
+    async def _request_once(self, command, method, payload, timeout, span):
         try:
             async with asyncio.timeout(timeout):
                 request = await self._session.request(
@@ -92,21 +315,39 @@ class SupervisorHandler(HandlerBase):
                     headers=self._headers,
                     timeout=None,
                 )
+                span.set_attribute("http.response.status_code", request.status)
 
                 if request.status not in (HTTPStatus.OK, HTTPStatus.BAD_REQUEST):
-                    _LOGGER.error("%s return code %d.", command, request.status)
-                    raise HassioAPIError()
+                    request.release()
+                    self._count_request("error")
+                    raise SupervisorRequestError(
+                        f"{command} returned status {request.status}",
+                        transient=request.status in TRANSIENT_STATUSES,
+                    )
 
                 answer = await request.json()
+                self._count_request("ok")
                 return answer
 
         except TimeoutError:
-            raise HassioAPIError("Timeout on %s request" % command)
+            self._count_request("timeout")
+            raise SupervisorRequestError(f"Timeout on {command} request") from None
+
+        except aiohttp.ClientConnectorError as err:
+            self._count_request("error")
+            raise SupervisorRequestError(
+                f"Unable to connect for {command} request: {err}", sent=False
+            ) from None
 
         except aiohttp.ClientError as err:
-            raise HassioAPIError("Client error on %s request %s" % (command, err))
+            self._count_request("error")
+            raise SupervisorRequestError(
+                f"Client error on {command} request: {err}"
+            ) from None
 
-        raise HassioAPIError("Failed to call %s" % command)
+    def _count_request(self, result: str):
+        if self.metrics:
+            self.metrics.api_requests.inc(result=result)
 
     @api_data
     def _get_addons_repositories(self):
@@ -128,48 +369,100 @@ class SupervisorHandler(HandlerBase):
 
     @api_data
     def remove_backup(self, slug):
-        return self.send_command(f"/backups/{slug}", method="delete", timeout=300)
+        return self.send_command(
+            f"/backups/{slug}",
+            method="delete",
+            timeout=REMOVE_TIMEOUT,
+            deadline=REMOVE_DEADLINE,
+        )
 
-    async def download_backup(
-        self, slug: str, destination: str, timeout: int = DEFAULT_BACKUP_TIMEOUT_SECONDS
-    ):
-        command = f"/backups/{slug}/download"
+    @api_data
+    def _get_backup_info(self, slug: str):
+        return self.send_command(f"/backups/{slug}/info", method="get")
 
+    async def has_backup(self, slug: str) -> bool:
         try:
-            async with asyncio.timeout(timeout):
-                request = await self._session.request(
-                    "get",
-                    f"http://{self._ip}{command}",
-                    headers=self._headers,
-                    timeout=None,
-                )
+            await self._get_backup_info(slug)
+        except HassioAPIError as err:
+            _LOGGER.debug("Unable to find backup %s: %s", slug, err)
+            return False
+        return True
 
-                if request.status not in (200, 400):
-                    _LOGGER.error("%s return code %d.", command, request.status)
-                    raise HassioAPIError()
-
-                async with aiofiles.open(destination, "wb") as file:
-                    while True:
-                        chunk = await request.content.read(CHUNK_SIZE)
-                        if not chunk:
-                            break
-                        await file.write(chunk)
+    async def get_backup_size(self, slug: str) -> Optional[int]:
+        try:
+            info = await self._get_backup_info(slug)
+        except HassioAPIError as err:
+            _LOGGER.debug("Unable to get size of backup %s: %s", slug, err)
+            return None
+        if info.get("size_bytes") is not None:
+            return int(info["size_bytes"])
+        # older Supervisors only report the size in MiB
+        if info.get("size") is not None:
+            return int(info["size"] * 2**20)
+        return None
+
+    async def _open_download(self, command: str) -> aiohttp.ClientResponse:
+        with self.tracer.span(
+            f"GET {command}",
+            SPAN_KIND_CLIENT,
+            **{"http.request.method": "GET", "url.path": command},
+        ) as span:
+            return await self._open_download_once(command, span)
+
+    async def _open_download_once(self, command: str, span) -> aiohttp.ClientResponse:
+        try:
+            request = await self._session.request(
+                "get",
+                f"http://{self._ip}{command}",
+                headers=self._headers,
+                timeout=None,
+                read_bufsize=DOWNLOAD_READ_BUFSIZE,
+            )
+        except aiohttp.ClientConnectorError as err:
+            self._count_request("error")
+            raise SupervisorRequestError(
+                f"Unable to connect for {command} request: {err}", sent=False
+            ) from None
+        except aiohttp.ClientError as err:
+            self._count_request("error")
+            raise SupervisorRequestError(
+                f"Client error on {command} request: {err}"
+            ) from None
+
+        span.set_attribute("http.response.status_code", request.status)
+        if request.status not in (200, 400):
+            request.release()
+            self._count_request("error")
+            raise SupervisorRequestError(
+                f"{command} returned status {request.status}",
+                transient=request.status in TRANSIENT_STATUSES,
+            )
+        self._count_request("ok")
+        return request
 
-                _LOGGER.info("Downloaded backup '%s' to '%s'", slug, destination)
-                return
+    async def iter_backup(self, slug: str) -> AsyncIterator[bytes]:
+        command = f"/backups/{slug}/download"
 
-        except TimeoutError:
-            _LOGGER.error("Timeout on %s request", command)
+        # only starting the download is retried, a partial download cannot resume
+        request = await self._with_retry(
+            lambda: self._open_download(command), "get", command
+        )
 
-        except aiohttp.ClientError as err:
-            _LOGGER.error("Client error on %s request %s", command, err)
+        async with request:
+            while True:
+                chunk = await request.content.read(DOWNLOAD_READ_BUFSIZE)
+                if not chunk:
+                    break
+                yield chunk
 
-        except IOError:
-            _LOGGER.error("Failed to download backup '%s' to '%s'", slug, destination)
 
-        raise HassioAPIError(
-            "Backup download failed. Check the logs for more information."
-        )
+def _local_backup_size(backup: Dict) -> Optional[int]:
+    """Return the size of a backup of the backup integration, in bytes."""
+    # recent versions report the size stored by each agent
+    for agent in (backup.get("agents") or {}).values():
+        if agent.get("size") is not None:
+            return agent["size"]
+    return backup.get("size")
 
 
 class BackupHandler(HandlerBase):
@@ -177,6 +470,10 @@ class BackupHandler(HandlerBase):
         self._hass = hass
         self._manager = manager
 
+    @property
+    def backup_directory(self) -> Optional[str]:
+        return self._hass.config.path("backups")
+
     async def get_addons(self):
         raise NotImplementedError("This should be unreachable")
 
@@ -200,24 +497,89 @@ class BackupHandler(HandlerBase):
             backup.backup_job_id
         )
 
-        return {"slug": backup.backup_id, **asdict(backup)}
+        return {
+            "slug": backup.backup_id,
+            **asdict(backup),
+            "size_bytes": _local_backup_size(asdict(backup)),
+        }
 
     async def remove_backup(self, slug):
         await self._manager.async_delete_backup(slug)
 
-    async def download_backup(
-        self, slug: str, destination: str, timeout: int = DEFAULT_BACKUP_TIMEOUT_SECONDS
-    ):
+    async def get_backup_size(self, slug: str) -> Optional[int]:
         [backup, agent_errors] = await self._manager.async_get_backup(slug)
-        if backup:
-            agent_id = list(self._manager.local_backup_agents)[0]
-            agent = self._manager.local_backup_agents[agent_id]
-            backup_path = agent.get_backup_path(backup.backup_id)
+        return _local_backup_size(asdict(backup)) if backup else None
 
-            def _copyfile():
-                shutil.copyfile(backup_path, destination)
+    async def has_backup(self, slug: str) -> bool:
+        [backup, agent_errors] = await self._manager.async_get_backup(slug)
+        return backup is not None
 
-            await self._hass.async_add_executor_job(_copyfile)
+    async def _get_backup_path(self, slug: str):
+        [backup, agent_errors] = await self._manager.async_get_backup(slug)
+        if not backup:
+            return None
+        agent_id = list(self._manager.local_backup_agents)[0]
+        agent = self._manager.local_backup_agents[agent_id]
+        return agent.get_backup_path(backup.backup_id)
+
+    async def iter_backup(self, slug: str) -> AsyncIterator[bytes]:
+        backup_path = await self._get_backup_path(slug)
+        if not backup_path:
+            raise HassioAPIError(f"Backup ({slug}) does not exist")
+
+        async with aiofiles.open(backup_path, "rb") as file:
+            while True:
+                chunk = await file.read(LOCAL_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    async def download_backup(
+        self,
+        slug: str,
+        destination: Union[str, Destination],
+        timeout: int = DEFAULT_BACKUP_TIMEOUT_SECONDS,
+        throttle: Optional[Throttle] = None,
+        pause: Optional[Callable[[], Optional[Awaitable]]] = None,
+    ) -> Optional[Dict]:
+        if not isinstance(destination, str) or (throttle and throttle.enabled) or pause:
+            # streamed, throttled and pausable copies must go through the chunked copy
+            return await super().download_backup(
+                slug, destination, timeout, throttle, pause
+            )
+
+        backup_path = await self._get_backup_path(slug)
+        if backup_path:
+            start = time.monotonic()
+
+            cancelled = threading.Event()
+
+            def _copyfile():
+                size = 0
+                buffer = bytearray(COPY_BLOCK_SIZE)
+                with open(backup_path, "rb") as source, open(destination, "wb") as file:
+                    while not cancelled.is_set() and (read := source.readinto(buffer)):
+                        file.write(memoryview(buffer)[:read])
+                        size += read
+                return size
+
+            copy = self._hass.async_add_executor_job(_copyfile)
+            try:
+                size = await asyncio.shield(copy)
+            except asyncio.CancelledError:
+                # the thread cannot be interrupted, stop it and wait before removing
+                cancelled.set()
+                await asyncio.wait((copy,))
+                try:
+                    await self._hass.async_add_executor_job(remove, destination)
+                except OSError:
+                    pass
+                else:
+                    _LOGGER.debug("Removed partial copy '%s'", destination)
+                raise
+            if self.metrics:
+                self.metrics.downloaded_bytes.inc(size)
+            return transfer_stats(slug, destination, size, start)
         else:
             _LOGGER.error(
                 "Cannot move backup (%s) to '%s' as it does not exist.",
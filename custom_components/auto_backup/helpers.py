@@ -1,10 +1,25 @@
+import hashlib
+import json
+from typing import Dict, Optional
+
+from homeassistant.components.hassio import ATTR_FOLDERS, ATTR_ADDONS
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.device_registry import DeviceEntryType, DeviceInfo
 from homeassistant.components.backup.const import DOMAIN as DOMAIN_BACKUP
 from homeassistant.loader import bind_hass
 
-from .const import DOMAIN
+from .const import (
+    DOMAIN,
+    ATTR_INCLUDE,
+    ATTR_EXCLUDE,
+    ATTR_INCLUDE_ADDONS,
+    ATTR_INCLUDE_FOLDERS,
+    ATTR_EXCLUDE_ADDONS,
+    ATTR_EXCLUDE_FOLDERS,
+    SERVICE_BACKUP,
+    SERVICE_BACKUP_PARTIAL,
+)
 
 
 @callback
@@ -25,3 +40,31 @@ def get_device_info(entry: ConfigEntry) -> DeviceInfo:
         identifiers={(DOMAIN, entry.entry_id)},
         name=entry.title,
     )
+
+
+def normalize_backup_data(service: str, data: Dict) -> Dict:
+    """Convert the service specific include/exclude options to the common format."""
+    data = dict(data)
+    if service == SERVICE_BACKUP_PARTIAL:
+        data[ATTR_INCLUDE] = {
+            ATTR_FOLDERS: data.pop(ATTR_FOLDERS, []),
+            ATTR_ADDONS: data.pop(ATTR_ADDONS, []),
+        }
+    elif service == SERVICE_BACKUP:
+        if ATTR_INCLUDE_ADDONS in data or ATTR_INCLUDE_FOLDERS in data:
+            data[ATTR_INCLUDE] = {
+                ATTR_FOLDERS: data.pop(ATTR_INCLUDE_FOLDERS, []),
+                ATTR_ADDONS: data.pop(ATTR_INCLUDE_ADDONS, []),
+            }
+        if ATTR_EXCLUDE_ADDONS in data or ATTR_EXCLUDE_FOLDERS in data:
+            data[ATTR_EXCLUDE] = {
+                ATTR_FOLDERS: data.pop(ATTR_EXCLUDE_FOLDERS, []),
+                ATTR_ADDONS: data.pop(ATTR_EXCLUDE_ADDONS, []),
+            }
+    return data
+
+
+def backup_spec(include: Optional[Dict], exclude: Optional[Dict]) -> str:
+    """Return a key for what a backup includes, the same on every run of a backup."""
+    spec = json.dumps([include, exclude], sort_keys=True, default=str)
+    return hashlib.sha1(spec.encode()).hexdigest()[:16]
@@ -0,0 +1,93 @@
+"""Bounded history of backup runs, persisted across restarts."""
+
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN, HISTORY_KEY, STORAGE_VERSION
+
+HISTORY_SIZE = 100  # runs
+SAVE_DELAY = 10  # seconds
+
+OUTCOME_OK = "ok"
+OUTCOME_FAILED = "failed"
+OUTCOME_SKIPPED = "skipped"
+OUTCOME_CANCELLED = "cancelled"
+
+
+@dataclass
+class RunRecord:
+    """The outcome of creating a single backup."""
+
+    name: str
+    slug: Optional[str]
+    type: str
+    started: datetime
+    duration: float
+    outcome: str
+    size: Optional[int] = None
+    error: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "started": self.started.isoformat()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RunRecord":
+        return cls(**{**data, "started": datetime.fromisoformat(data["started"])})
+
+
+class RunHistory:
+    """The most recent backup runs, oldest runs are dropped once full.
+
+    Memory use is constant, and saving is delayed so a batch of backups is
+    written to storage once.
+    """
+
+    def __init__(self, hass: HomeAssistant, size: int = HISTORY_SIZE):
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{HISTORY_KEY}")
+        self._runs: Deque[RunRecord] = deque(maxlen=size)
+
+    async def async_load(self):
+        data = await self._store.async_load()
+        if data is not None:
+            self._runs.extend(RunRecord.from_dict(run) for run in data)
+
+    def _data_to_save(self) -> List[Dict]:
+        return [run.as_dict() for run in self._runs]
+
+    def add(self, record: RunRecord):
+        self._runs.append(record)
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def __len__(self) -> int:
+        return len(self._runs)
+
+    def records(
+        self, limit: Optional[int] = None, outcome: Optional[str] = None
+    ) -> List[Dict]:
+        """Return the most recent runs first, optionally only with an outcome."""
+        records = []
+        for run in reversed(self._runs):
+            if limit is not None and len(records) >= limit:
+                break
+            if outcome is None or run.outcome == outcome:
+                records.append(run.as_dict())
+        return records
+
+    def averages(self, type_: Optional[str] = None) -> Dict[str, Optional[float]]:
+        """Return the average duration and size of successful runs."""
+        runs = [
+            run
+            for run in self._runs
+            if run.outcome == OUTCOME_OK and (type_ is None or run.type == type_)
+        ]
+        sizes = [run.size for run in runs if run.size is not None]
+        return {
+            "runs": len(runs),
+            "duration": sum(run.duration for run in runs) / len(runs) if runs else None,
+            "size": sum(sizes) / len(sizes) if sizes else None,
+        }
@@ -1,8 +1,13 @@
+import asyncio
 import logging
+import time
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
 from fnmatch import fnmatchcase
-from os.path import join, isfile
-from typing import List, Dict, Tuple, Optional
+from os import remove, stat
+from os.path import dirname, join, isfile
+from typing import Awaitable, Iterator, List, Dict, Set, Tuple, Optional
 
 from homeassistant.components.backup.manager import DATA_MANAGER
 from homeassistant.components.hassio import (
@@ -15,9 +20,10 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import ATTR_NAME, __version__
 from homeassistant.core import HomeAssistant
 from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.helpers.hassio import is_hassio
 from homeassistant.helpers.json import JSONEncoder
-from homeassistant.helpers.storage import Store
+from homeassistant.helpers.storage import STORAGE_DIR
 from homeassistant.util import dt as dt_util
 from slugify import slugify
 
@@ -27,49 +33,298 @@ from .const import (
     EVENT_BACKUPS_PURGED,
     EVENT_BACKUP_SUCCESSFUL,
     EVENT_BACKUP_START,
+    EVENT_BACKUP_DOWNLOADED,
+    EVENT_DOWNLOADS_PURGED,
+    EVENT_BATCH_COMPLETED,
+    EVENT_PROFILE_SAVED,
+    EVENT_BACKUP_VERIFIED,
+    EVENT_SUPERVISOR_CIRCUIT,
+    EVENT_BACKUP_CANCELLED,
     CONF_AUTO_PURGE,
     CONF_BACKUP_TIMEOUT,
+    CONF_DOWNLOAD_RATE_LIMIT,
+    CONF_ADAPTIVE_THROTTLE,
+    CONF_LOOP_WATCHDOG,
+    CONF_VERIFY_DOWNLOADS,
+    CONF_PAUSE_DOWNLOADS,
+    CONF_TRACING,
+    CONF_UNCACHED_DOWNLOADS,
+    CONF_SYNC_INTERVAL,
+    DEFAULT_SYNC_INTERVAL,
+    CONF_COMPRESSION_LEVEL,
+    CONF_COMPRESSION_WORKERS,
+    DEFAULT_COMPRESSION_LEVEL,
+    DEFAULT_COMPRESSION_WORKERS,
+    CONF_HIGH_WATERMARK,
+    CONF_LOW_WATERMARK,
+    CONF_WATERMARK_ORDER,
+    DEFAULT_HIGH_WATERMARK,
+    DEFAULT_LOW_WATERMARK,
+    ORDER_OLDEST,
+    ORDER_EXPIRY,
+    SNAPSHOTS_STORAGE_VERSION,
+    DEFAULT_DOWNLOAD_RATE_LIMIT,
     STORAGE_KEY,
-    STORAGE_VERSION,
+    CATALOG_KEY,
     DEFAULT_BACKUP_FOLDERS,
     ATTR_INCLUDE,
     ATTR_EXCLUDE,
     ATTR_KEEP_DAYS,
     ATTR_DOWNLOAD_PATH,
+    ATTR_DEDUPLICATE,
+    ATTR_RECOMPRESS,
+    ATTR_DOWNLOAD_KEEP_DAYS,
+    ATTR_SKIP_UNCHANGED,
+    ATTR_BACKUPS,
+    ATTR_DOWNLOADS,
+    ATTR_DOWNLOAD_ERRORS,
+    ATTR_CANCELLED,
+    ATTR_JOB,
+    JOB_ALL,
+    JOB_CREATE,
+    JOB_DOWNLOAD,
+    ATTR_ERROR,
+    ATTR_SLUG,
+    ATTR_SIZE,
+    ATTR_SKIPPED,
+    ATTR_UNCHANGED_ADDONS,
+    ATTR_UNCHANGED_FOLDERS,
+    SKIP_BACKUP,
+    SKIP_EXCLUDE,
     ATTR_ENCRYPTED,
     ATTR_EXCLUDE_DATABASE,
 )
+from .arbiter import IOArbiter, IO_CREATE, IO_DOWNLOAD, IO_PURGE, IO_VERIFY
+from .catalog import DownloadCatalog
+from .chunkstore import ChunkStore, ChunkedDestination, INDEX_SUFFIX
+from .destinations import UncachedFileDestination, read_page_cache
+from .fingerprints import Fingerprints
+from .folders import FolderIndex
 from .handlers import HassioAPIError, HandlerBase
+from .helpers import backup_spec
+from .history import (
+    RunHistory,
+    RunRecord,
+    OUTCOME_OK,
+    OUTCOME_FAILED,
+    OUTCOME_SKIPPED,
+    OUTCOME_CANCELLED,
+)
+from .metrics import Metrics
+from .profiling import RunProfiler, PROFILE_DIRECTORY
+from .recompress import RecompressingDestination
+from .retention import RetentionPlan, RetentionPolicy
+from .scheduler import BackupScheduler
+from .throttle import Throttle
+from .verify import VerificationError, verify_archive
+from .retry import STATE_OPEN
+from .s3 import S3Config, S3Destination, S3_SCHEME, parse_s3_url
+from .tracing import Span, Tracer, TRACE_FILE
+from .tracking import (
+    TrackedBackup,
+    TrackedBackups,
+    TrackedBackupStore,
+    SORT_EXPIRES,
+    decode_cursor,
+    disk_usage,
+    encode_cursor,
+)
+from .watchdog import LoopWatchdog
 
 _LOGGER = logging.getLogger(__name__)
 
+# number of recent backup runs and downloads included in diagnostics
+RECENT_RUNS = 10
+RECENT_DOWNLOADS = 20
+
 
 class AutoBackup:
     def __init__(self, hass: HomeAssistant, options: Dict, handler: HandlerBase):
         self._hass = hass
         self._handler = handler
+        self.metrics = Metrics()
+        self._handler.metrics = self.metrics
         self._manager = hass.data[DATA_MANAGER]
         self._auto_purge = options[CONF_AUTO_PURGE]
         self._backup_timeout = options[CONF_BACKUP_TIMEOUT] * 60
+        self._throttle = Throttle(
+            options[CONF_DOWNLOAD_RATE_LIMIT] * 1e6, options[CONF_ADAPTIVE_THROTTLE]
+        )
         self._state = 0
-        self._snapshots = {}
+        self._snapshots = TrackedBackups()
+        self._high_watermark = options.get(CONF_HIGH_WATERMARK, DEFAULT_HIGH_WATERMARK)
+        self._low_watermark = options.get(CONF_LOW_WATERMARK, DEFAULT_LOW_WATERMARK)
+        self._watermark_order = options.get(CONF_WATERMARK_ORDER, ORDER_OLDEST)
+        self._chunk_stores: Dict[str, ChunkStore] = {}
+        self._fingerprints = Fingerprints(hass)
+        self._downloads: Dict[str, Set[asyncio.Task]] = {}
+        # backups being created, by the name of the backup
+        self._creates: Dict[asyncio.Task, str] = {}
+        self._history = RunHistory(hass)
+        self._recent_downloads: deque = deque(maxlen=RECENT_DOWNLOADS)
+        self._last_saved: Optional[datetime] = None
+        self._profile_next = False
+        self._profiler: Optional[RunProfiler] = None
+        self._watchdog = LoopWatchdog(options.get(CONF_LOOP_WATCHDOG, False))
+        self._tracer = Tracer(
+            hass, hass.config.path(TRACE_FILE), options.get(CONF_TRACING, False)
+        )
+        self._handler.tracer = self._tracer
+        self._verify_downloads = options.get(CONF_VERIFY_DOWNLOADS, False)
+        self._s3 = S3Config.from_options(options)
+        self._retention = RetentionPolicy.from_options(options)
+        self._io = IOArbiter()
+        self._io.exclusive = options.get(CONF_PAUSE_DOWNLOADS, False)
+        self._uncached_downloads = options.get(CONF_UNCACHED_DOWNLOADS, False)
+        self._sync_interval = int(
+            options.get(CONF_SYNC_INTERVAL, DEFAULT_SYNC_INTERVAL) * 1e6
+        )
+        self._compression_level = options.get(
+            CONF_COMPRESSION_LEVEL, DEFAULT_COMPRESSION_LEVEL
+        )
+        self._compression_workers = options.get(
+            CONF_COMPRESSION_WORKERS, DEFAULT_COMPRESSION_WORKERS
+        )
+        self._folder_index = FolderIndex(hass)
+        self._scheduler = BackupScheduler(
+            hass, self._async_scheduled_backup, lambda: self._state > 0
+        )
+        self._scheduler.configure(options)
+        self._catalog = DownloadCatalog(
+            hass.config.path(STORAGE_DIR, f"{DOMAIN}.{CATALOG_KEY}.db")
+        )
         self._supervised = is_hassio(hass)
-        self._store = Store(
-            hass, STORAGE_VERSION, f"{DOMAIN}.{STORAGE_KEY}", encoder=JSONEncoder
+        self._store = TrackedBackupStore(
+            hass,
+            SNAPSHOTS_STORAGE_VERSION,
+            f"{DOMAIN}.{STORAGE_KEY}",
+            encoder=JSONEncoder,
+        )
+        self._add_gauges()
+        if handler.breaker:
+            handler.breaker.listener = self._circuit_changed
+
+    def _circuit_changed(self, state: str, error: Optional[str]):
+        self._hass.bus.async_fire(
+            EVENT_SUPERVISOR_CIRCUIT, {"state": state, ATTR_ERROR: error}
+        )
+
+    def _add_gauges(self):
+        self.metrics.add_gauge(
+            "auto_backup_backups_in_progress",
+            "Backups currently being created.",
+            lambda: self._state,
+        )
+        self.metrics.add_gauge(
+            "auto_backup_downloads_in_progress",
+            "Downloads currently running or waiting.",
+            lambda: sum(len(tasks) for tasks in self._downloads.values()),
+        )
+        self.metrics.add_gauge(
+            "auto_backup_monitored_backups",
+            "Backups with an expiry date.",
+            lambda: self.monitored,
+        )
+        self.metrics.add_gauge(
+            "auto_backup_purgeable_backups",
+            "Backups past their expiry date.",
+            lambda: self.purgeable,
+        )
+        self.metrics.add_gauge(
+            "auto_backup_monitored_bytes",
+            "Total size of backups with an expiry date.",
+            lambda: self.monitored_size,
+        )
+        self.metrics.add_gauge(
+            "auto_backup_purgeable_bytes",
+            "Total size of backups past their expiry date.",
+            lambda: self.purgeable_size,
+        )
+        self.metrics.add_gauge(
+            "auto_backup_supervisor_circuit_open",
+            "1 while requests to the Supervisor fail fast.",
+            lambda: int(
+                self._handler.breaker is not None
+                and self._handler.breaker.state == STATE_OPEN
+            ),
+        )
+        self.metrics.add_gauge(
+            "auto_backup_io_waiting",
+            "Operations waiting for their turn to use the disk.",
+            lambda: self._io.waiting,
+        )
+        self.metrics.add_gauge(
+            "auto_backup_download_rate_limit_bytes",
+            "Current download rate limit, 0 when unlimited.",
+            lambda: self._throttle.limit or 0,
         )
 
     async def update_listener(self, hass, entry: ConfigEntry):
         """Handle options update."""
         self._auto_purge = entry.options[CONF_AUTO_PURGE]
         self._backup_timeout = entry.options[CONF_BACKUP_TIMEOUT] * 60
+        self._throttle.configure(
+            entry.options.get(CONF_DOWNLOAD_RATE_LIMIT, DEFAULT_DOWNLOAD_RATE_LIMIT)
+            * 1e6,
+            entry.options.get(CONF_ADAPTIVE_THROTTLE, False),
+        )
+        self._scheduler.configure(entry.options)
+        self._watchdog.enabled = entry.options.get(CONF_LOOP_WATCHDOG, False)
+        self._tracer.enabled = entry.options.get(CONF_TRACING, False)
+        self._verify_downloads = entry.options.get(CONF_VERIFY_DOWNLOADS, False)
+        self._io.exclusive = entry.options.get(CONF_PAUSE_DOWNLOADS, False)
+        self._uncached_downloads = entry.options.get(CONF_UNCACHED_DOWNLOADS, False)
+        self._sync_interval = int(
+            entry.options.get(CONF_SYNC_INTERVAL, DEFAULT_SYNC_INTERVAL) * 1e6
+        )
+        self._compression_level = entry.options.get(
+            CONF_COMPRESSION_LEVEL, DEFAULT_COMPRESSION_LEVEL
+        )
+        self._compression_workers = entry.options.get(
+            CONF_COMPRESSION_WORKERS, DEFAULT_COMPRESSION_WORKERS
+        )
+        self._s3 = S3Config.from_options(entry.options)
+        self._retention = RetentionPolicy.from_options(entry.options)
+        self._high_watermark = entry.options.get(
+            CONF_HIGH_WATERMARK, DEFAULT_HIGH_WATERMARK
+        )
+        self._low_watermark = entry.options.get(
+            CONF_LOW_WATERMARK, DEFAULT_LOW_WATERMARK
+        )
+        self._watermark_order = entry.options.get(CONF_WATERMARK_ORDER, ORDER_OLDEST)
 
     async def load_snapshots_expiry(self):
         """Load snapshots expiry dates from Home Assistant's storage."""
-        data = await self._store.async_load()
+        with self._stage("load_snapshots"):
+            data = await self._store.async_load()
 
-        if data is not None:
-            for slug, expiry in data.items():
-                self._snapshots[slug] = datetime.fromisoformat(expiry)
+            if data is not None:
+                for slug, backup in data.items():
+                    self._snapshots[slug] = TrackedBackup.from_dict(backup)
+
+    @property
+    def watchdog(self) -> LoopWatchdog:
+        return self._watchdog
+
+    @property
+    def tracer(self) -> Tracer:
+        return self._tracer
+
+    @property
+    def scheduler(self) -> BackupScheduler:
+        return self._scheduler
+
+    async def load_fingerprints(self):
+        """Load fingerprints of previously backed up items."""
+        await self._fingerprints.async_load()
+
+    async def load_history(self):
+        """Load the history of previous backup runs."""
+        await self._history.async_load()
+
+    @property
+    def history(self) -> RunHistory:
+        return self._history
 
     @property
     def monitored(self):
@@ -77,22 +332,82 @@ class AutoBackup:
 
     @property
     def purgeable(self):
-        return len(self.get_purgeable_snapshots())
+        if self._retention is not None:
+            return len(self.get_purgeable_snapshots())
+        return self._snapshots.purgeable_count(datetime.now(timezone.utc))
+
+    @property
+    def monitored_size(self) -> int:
+        """Total size of monitored backups in bytes, backups of unknown size excluded."""
+        return self._snapshots.total_size
+
+    @property
+    def purgeable_size(self) -> int:
+        """Total size of purgeable backups in bytes."""
+        if self._retention is not None:
+            return sum(
+                self._snapshots[slug].size or 0
+                for slug in self.get_purgeable_snapshots()
+            )
+        return self._snapshots.purgeable_size(datetime.now(timezone.utc))
 
     @property
     def state(self):
         return self._state
 
+    def diagnostics(self) -> Dict:
+        """Return the internal state of Auto Backup, without any I/O."""
+        now = datetime.now(timezone.utc)
+        breaker = self._handler.breaker
+        return {
+            "handler": type(self._handler).__name__,
+            "backups_in_progress": self._state,
+            "creating": list(self._creates.values()),
+            "downloads_in_progress": {
+                slug: len(tasks) for slug, tasks in self._downloads.items()
+            },
+            "tracked_backups": {
+                "count": len(self._snapshots),
+                "size": self._snapshots.total_size,
+                "purgeable": self._snapshots.purgeable_count(now),
+                "purgeable_size": self._snapshots.purgeable_size(now),
+                "next_expiry": self._snapshots.next_expiry(now),
+                "last_saved": self._last_saved,
+            },
+            "supervisor": breaker
+            and {"circuit": breaker.state, "failures": breaker.failures},
+            "scheduler": {
+                "next_run": self._scheduler.next_run,
+                "deferred": self._scheduler.deferred,
+            },
+            "rate_limit": self._throttle.limit,
+            "tracing": {
+                "enabled": self._tracer.enabled,
+                "spans_written": self._tracer.spans_written,
+            },
+            "retention": self._retention and self._retention.tiers,
+            "io": self._io.state(),
+            "recent_runs": self._history.records(RECENT_RUNS),
+            "recent_downloads": list(self._recent_downloads),
+            "caches": {
+                "fingerprints": self._fingerprints.counts,
+                "indexed_folders": self._folder_index.indexed,
+                "chunk_stores": {
+                    directory: {"chunks": store.known_chunks, "writers": store.writers}
+                    for directory, store in self._chunk_stores.items()
+                },
+            },
+        }
+
+    async def async_count_expired_downloads(self) -> int:
+        """Return the number of downloads waiting to be purged."""
+        return await self._hass.async_add_executor_job(
+            self._catalog.count_expired, datetime.now(timezone.utc)
+        )
+
     def get_next_expiry(self) -> datetime | None:
         """Return the next snapshot expiry date that has not expired"""
-        return min(
-            (
-                expiry
-                for expiry in self._snapshots.values()
-                if expiry > datetime.now().astimezone()
-            ),
-            default=None,
-        )
+        return self._snapshots.next_expiry(datetime.now(timezone.utc))
 
     @classmethod
     def ensure_slugs(
@@ -164,7 +479,131 @@ class AutoBackup:
         if not config.get(ATTR_NAME):
             config[ATTR_NAME] = self.generate_backup_name()
 
-    async def async_create_backup(self, data: Dict):
+    def profile_next_run(self):
+        """Profile the next backup run, including its downloads and purge."""
+        _LOGGER.info("The next backup run will be profiled")
+        self._profile_next = True
+
+    def _start_profiling(self) -> bool:
+        if not self._profile_next or self._profiler:
+            return False
+        self._profile_next = False
+        self._profiler = RunProfiler()
+        self._profiler.start()
+        return True
+
+    async def _async_stop_profiling(self):
+        profiler, self._profiler = self._profiler, None
+        profiler.stop()
+        profile_path, timings_path = await self._hass.async_add_executor_job(
+            profiler.save, self._hass.config.path(PROFILE_DIRECTORY)
+        )
+        _LOGGER.info("Saved profile of backup run to '%s'", timings_path)
+        self._hass.bus.async_fire(
+            EVENT_PROFILE_SAVED, {"profile": profile_path, "timings": timings_path}
+        )
+
+    @contextmanager
+    def _stage(self, name: str, attributes: Optional[Dict] = None) -> Iterator[Span]:
+        """Mark a stage of a backup run for the profiler, loop watchdog and tracer."""
+        operation = name.split(" ", 1)[0]
+        with (
+            self._watchdog.operation(operation),
+            self._tracer.span(operation, **(attributes or {})) as span,
+        ):
+            if self._profiler:
+                with self._profiler.stage(name):
+                    yield span
+            else:
+                yield span
+
+    async def _async_scheduled_backup(self, data: Dict) -> Dict:
+        with self._tracer.span("schedule"):
+            return await self.async_create_backup(data)
+
+    async def async_create_backup(self, data: Dict) -> Dict:
+        """Create a backup and purge expired backups."""
+        profiling = self._start_profiling()
+        try:
+            # make room for the new backup first
+            await self._async_purge_before_create()
+            result = await self._async_create_from_config(data)
+
+            if profiling:
+                # include the downloads of the backup in the profile
+                tasks = list(self._downloads.get(result.get(ATTR_SLUG), ()))
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+            ### PURGE BACKUPS ###
+            if self._auto_purge:
+                await self.purge_backups()
+        finally:
+            if profiling:
+                await self._async_stop_profiling()
+
+        return result
+
+    async def async_create_backups(self, backups: List[Dict]) -> List[Dict]:
+        """Create backups one at a time, downloading each while creating the next."""
+        profiling = self._start_profiling()
+        try:
+            return await self._async_create_backups(backups)
+        finally:
+            if profiling:
+                await self._async_stop_profiling()
+
+    async def _async_create_backups(self, backups: List[Dict]) -> List[Dict]:
+        await self._async_purge_before_create()
+        installed_addons = None
+        if self._supervised and any(
+            data.get(ATTR_INCLUDE) or data.get(ATTR_EXCLUDE) for data in backups
+        ):
+            with self._stage("get_addons"):
+                installed_addons = await self._handler.get_addons()
+
+        results = []
+        downloads = []
+        for data in backups:
+            try:
+                result = await self._async_create_from_config(data, installed_addons)
+            except HomeAssistantError as err:
+                _LOGGER.error("Error during backup. %s", err)
+                result = {ATTR_NAME: data.get(ATTR_NAME), ATTR_ERROR: str(err)}
+            results.append(result)
+            downloads.append(list(self._downloads.get(result.get(ATTR_SLUG), ())))
+
+        # wait for all downloads to finish before reporting the result
+        for result, tasks in zip(results, downloads):
+            outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+            result[ATTR_DOWNLOADS] = [
+                outcome for outcome in outcomes if isinstance(outcome, str)
+            ]
+            errors = [
+                (
+                    "Download cancelled"
+                    if isinstance(err, asyncio.CancelledError)
+                    else str(err)
+                )
+                for err in outcomes
+                if isinstance(err, BaseException)
+            ]
+            if errors:
+                result[ATTR_DOWNLOAD_ERRORS] = errors
+
+        if self._auto_purge:
+            await self.purge_backups()
+
+        _LOGGER.info(
+            "Batch of %s backups completed, %s failed",
+            len(results),
+            sum(ATTR_ERROR in result for result in results),
+        )
+        self._hass.bus.async_fire(EVENT_BATCH_COMPLETED, {ATTR_BACKUPS: results})
+        return results
+
+    async def _async_create_from_config(
+        self, data: Dict, installed_addons: Optional[List[Dict]] = None
+    ) -> Dict:
         """Identify actual type of backup to create and handle include/exclude options"""
         self.validate_backup_config(data)
 
@@ -172,12 +611,18 @@ class AutoBackup:
 
         include: Dict = data.pop(ATTR_INCLUDE, None)
         exclude: Dict = data.pop(ATTR_EXCLUDE, None)
+        skip_unchanged: Optional[str] = data.pop(ATTR_SKIP_UNCHANGED, None)
+        spec = backup_spec(include, exclude)
 
         if not (include or exclude):
             # must be a full backup
-            await self._async_create_backup(data)
+            if skip_unchanged:
+                _LOGGER.warning("Skipping unchanged items requires a partial backup")
+            return await self._async_create_backup(data, spec=spec)
         else:
-            installed_addons = await self._handler.get_addons()
+            if installed_addons is None:
+                with self._stage("get_addons"):
+                    installed_addons = await self._handler.get_addons()
 
             _LOGGER.debug("Installed addons: %s", installed_addons)
 
@@ -186,14 +631,16 @@ class AutoBackup:
             folders: List[str] = list(set(DEFAULT_BACKUP_FOLDERS.values()))
 
             if include:
-                addons, folders = self.ensure_slugs(include, installed_addons)
+                with self._stage("resolve_slugs"):
+                    addons, folders = self.ensure_slugs(include, installed_addons)
 
                 _LOGGER.debug("Including; addons: %s, folders: %s", addons, folders)
 
             if exclude:
-                excluded_addons, excluded_folders = self.ensure_slugs(
-                    exclude, installed_addons
-                )
+                with self._stage("resolve_slugs"):
+                    excluded_addons, excluded_folders = self.ensure_slugs(
+                        exclude, installed_addons
+                    )
 
                 addons = [addon for addon in addons if addon not in excluded_addons]
                 folders = [
@@ -209,18 +656,125 @@ class AutoBackup:
                     "Including (excluded); addons: %s, folders: %s", addons, folders
                 )
 
+            backups = set()
+            if skip_unchanged:
+                backups = await self._async_existing_backups(
+                    self._fingerprints.backups(spec)
+                )
+            fingerprints, unchanged = self._fingerprints.compare_addons(
+                spec, installed_addons, addons, backups
+            )
+            details = {}
+            digests = {}
+            unchanged_folders = []
+
+            if skip_unchanged:
+                with self._stage("folder_digests"):
+                    digests = await self._folder_index.async_digests(
+                        list(dict.fromkeys(folders))
+                    )
+                unchanged_folders = self._fingerprints.compare_folders(
+                    spec, digests, backups
+                )
+                self.metrics.record_lookups(
+                    self.metrics.fingerprint_lookups,
+                    len(unchanged),
+                    len(fingerprints),
+                    kind="addon",
+                )
+                self.metrics.record_lookups(
+                    self.metrics.fingerprint_lookups,
+                    len(unchanged_folders),
+                    len(digests),
+                    kind="folder",
+                )
+
+                _LOGGER.debug(
+                    "Unchanged; addons: %s, folders: %s", unchanged, unchanged_folders
+                )
+                details[ATTR_UNCHANGED_ADDONS] = unchanged
+                details[ATTR_UNCHANGED_FOLDERS] = unchanged_folders
+
+                if skip_unchanged == SKIP_EXCLUDE:
+                    addons = [addon for addon in addons if addon not in unchanged]
+                    folders = [
+                        folder for folder in folders if folder not in unchanged_folders
+                    ]
+
+            if (
+                skip_unchanged
+                and set(addons) <= set(unchanged)
+                and set(folders) <= set(unchanged_folders)
+            ):
+                return self._skip_backup(data[ATTR_NAME], details)
+
             data[ATTR_ADDONS] = addons
             data[ATTR_FOLDERS] = folders
-            await self._async_create_backup(data, partial=True)
+            result = await self._async_create_backup(
+                data, partial=True, details=details, spec=spec
+            )
+            if ATTR_SLUG in result:
+                self._fingerprints.commit_addons(
+                    spec,
+                    {
+                        addon: fingerprints[addon]
+                        for addon in addons
+                        if addon in fingerprints
+                    },
+                    result[ATTR_SLUG],
+                )
+                self._fingerprints.commit_folders(
+                    spec,
+                    {
+                        folder: digests[folder]
+                        for folder in folders
+                        if folder in digests
+                    },
+                    result[ATTR_SLUG],
+                )
+            return result
 
-        ### PURGE BACKUPS ###
-        if self._auto_purge:
-            await self.purge_backups()
+    async def _async_existing_backups(self, slugs: Set[str]) -> Set[str]:
+        """Return which of the backups still exist, tracked ones are assumed to."""
+        existing = set()
+        for slug in slugs:
+            if slug in self._snapshots or await self._handler.has_backup(slug):
+                existing.add(slug)
+        return existing
 
-    async def _async_create_backup(self, data: Dict, partial: bool = False):
+    def _skip_backup(self, name: str, details: Dict) -> Dict:
+        """Record a backup that was skipped as nothing changed."""
+        _LOGGER.info("Skipping backup '%s', nothing has changed", name)
+        self.metrics.backups_skipped.inc()
+        self._history.add(
+            RunRecord(
+                name=name,
+                slug=None,
+                type="partial",
+                started=datetime.now(timezone.utc),
+                duration=0,
+                outcome=OUTCOME_SKIPPED,
+            )
+        )
+        self._hass.bus.async_fire(
+            EVENT_BACKUP_SUCCESSFUL,
+            {"name": name, "slug": None, ATTR_SKIPPED: True, **details},
+        )
+        return {ATTR_NAME: name, ATTR_SKIPPED: True}
+
+    async def _async_create_backup(
+        self,
+        data: Dict,
+        partial: bool = False,
+        details: Optional[Dict] = None,
+        spec: Optional[str] = None,
+    ) -> Dict:
         """Create backup, update state, fire events, download backup and purge old backups"""
         keep_days = data.pop(ATTR_KEEP_DAYS, None)
         download_paths: Optional[List[str]] = data.pop(ATTR_DOWNLOAD_PATH, None)
+        deduplicate = data.pop(ATTR_DEDUPLICATE, False)
+        recompress = data.pop(ATTR_RECOMPRESS, False)
+        download_keep_days = data.pop(ATTR_DOWNLOAD_KEEP_DAYS, None)
 
         # handle exclude database
         if data.pop(ATTR_EXCLUDE_DATABASE, False):
@@ -260,16 +814,18 @@ class AutoBackup:
         ### CREATE BACKUP ###
         self._state += 1
         self._hass.bus.async_fire(EVENT_BACKUP_START, {"name": data[ATTR_NAME]})
+        self.metrics.backups_started.inc()
+        started = datetime.now(timezone.utc)
+        start = time.monotonic()
 
         try:
+            create = self._hass.async_create_task(self._async_run_create(data, partial))
+            self._creates[create] = data[ATTR_NAME]
             try:
-                result = await self._handler.create_backup(
-                    data, partial, timeout=self._backup_timeout
-                )
-            except HassioAPIError as err:
-                raise HassioAPIError(
-                    str(err) + ". There may be a backup already in progress."
-                )
+                result, size = await create
+            finally:
+                del self._creates[create]
+                self._state -= 1
 
             # backup creation was successful
             slug = result["slug"]
@@ -277,58 +833,535 @@ class AutoBackup:
 
             _LOGGER.info("Backup created successfully: '%s' (%s)", name, slug)
 
-            self._state -= 1
+            self.metrics.backups_succeeded.inc()
+            self.metrics.create_duration.observe(time.monotonic() - start)
+            self._history.add(
+                RunRecord(
+                    name=name,
+                    slug=slug,
+                    type="partial" if partial else "full",
+                    started=started,
+                    duration=round(time.monotonic() - start, 3),
+                    outcome=OUTCOME_OK,
+                    size=size,
+                )
+            )
             self._hass.bus.async_fire(
-                EVENT_BACKUP_SUCCESSFUL, {"name": name, "slug": slug}
+                EVENT_BACKUP_SUCCESSFUL,
+                {"name": name, "slug": slug, ATTR_SIZE: size, **(details or {})},
             )
 
             if keep_days is not None:
                 # set snapshot expiry
-                self._snapshots[slug] = datetime.now(timezone.utc) + timedelta(
-                    days=float(keep_days)
+                now = datetime.now(timezone.utc)
+                self._snapshots[slug] = TrackedBackup(
+                    expires=now + timedelta(days=float(keep_days)),
+                    created=now,
+                    size=size,
+                    spec=spec,
                 )
                 # write snapshot expiry to storage
-                await self._store.async_save(self._snapshots)
+                await self._async_save_snapshots()
 
             # download backup to location if specified
             if download_paths:
                 for download_path in download_paths:
-                    self._hass.async_create_task(
-                        self.async_download_backup(name, slug, download_path)
+                    task = self._hass.async_create_task(
+                        self.async_download_backup(
+                            name,
+                            slug,
+                            download_path,
+                            deduplicate,
+                            download_keep_days,
+                            recompress,
+                        )
                     )
+                    self._track_download(slug, task)
+
+            return {ATTR_NAME: name, ATTR_SLUG: slug}
+
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                # the caller was cancelled, not just this backup
+                raise
+            _LOGGER.warning("Backup '%s' was cancelled", data[ATTR_NAME])
+            self.metrics.backups_cancelled.inc()
+            self._history.add(
+                RunRecord(
+                    name=data[ATTR_NAME],
+                    slug=None,
+                    type="partial" if partial else "full",
+                    started=started,
+                    duration=round(time.monotonic() - start, 3),
+                    outcome=OUTCOME_CANCELLED,
+                )
+            )
+            self._hass.bus.async_fire(
+                EVENT_BACKUP_CANCELLED,
+                {"name": data[ATTR_NAME], "slug": None, ATTR_JOB: JOB_CREATE},
+            )
+            return {ATTR_NAME: data[ATTR_NAME], ATTR_CANCELLED: True}
 
         except Exception as err:
             _LOGGER.error("Error during backup. %s", err)
-            self._state -= 1
+            self.metrics.backups_failed.inc()
+            self._history.add(
+                RunRecord(
+                    name=data[ATTR_NAME],
+                    slug=None,
+                    type="partial" if partial else "full",
+                    started=started,
+                    duration=round(time.monotonic() - start, 3),
+                    outcome=OUTCOME_FAILED,
+                    error=str(err),
+                )
+            )
             self._hass.bus.async_fire(
                 EVENT_BACKUP_FAILED,
                 {"name": data[ATTR_NAME], "error": str(err)},
             )
+            return {ATTR_NAME: data[ATTR_NAME], ATTR_ERROR: str(err)}
+
+    async def _async_run_create(
+        self, data: Dict, partial: bool
+    ) -> Tuple[Dict, Optional[int]]:
+        """Create a backup and return the Supervisor's response and its size.
+
+        Runs as its own task, so it can be cancelled without cancelling a batch.
+        """
+        start = time.monotonic()
+        try:
+            async with self._io.slot(IO_CREATE, timeout=self._backup_timeout):
+                # time spent waiting for the slot counts towards the timeout
+                timeout = self._backup_timeout - (time.monotonic() - start)
+                with self._stage(
+                    "create",
+                    {
+                        "auto_backup.name": data[ATTR_NAME],
+                        "auto_backup.type": "partial" if partial else "full",
+                    },
+                ) as span:
+                    result = await self._handler.create_backup(
+                        data, partial, timeout=timeout
+                    )
+                    span.set_attribute("auto_backup.slug", result.get("slug"))
+        except TimeoutError:
+            raise HassioAPIError(
+                f"Timed out after {self._backup_timeout}s waiting for other "
+                "operations to finish before creating the backup"
+            ) from None
+        except HassioAPIError as err:
+            raise HassioAPIError(
+                str(err) + ". There may be a backup already in progress."
+            )
+
+        # the Supervisor does not include the size in its response
+        size = result.get("size_bytes")
+        if size is None:
+            size = await self._handler.get_backup_size(result["slug"])
+        return result, size
+
+    async def async_cancel(
+        self, slug: Optional[str] = None, job: str = JOB_ALL
+    ) -> Dict:
+        """Cancel backups being created and downloads in progress.
+
+        With a slug only the downloads of that backup are cancelled. Returns
+        once the cancelled tasks have cleaned up after themselves.
+        """
+        cancelled = {ATTR_BACKUPS: [], ATTR_DOWNLOADS: []}
+        tasks = []
+        if slug is None and job in (JOB_ALL, JOB_CREATE):
+            for task, name in self._creates.items():
+                task.cancel()
+                tasks.append(task)
+                cancelled[ATTR_BACKUPS].append(name)
+        if job in (JOB_ALL, JOB_DOWNLOAD):
+            slugs = list(self._downloads) if slug is None else [slug]
+            for download_slug in slugs:
+                for task in self._downloads.get(download_slug, ()):
+                    task.cancel()
+                    tasks.append(task)
+                    cancelled[ATTR_DOWNLOADS].append(download_slug)
+        if tasks:
+            _LOGGER.info(
+                "Cancelling %s backups and %s downloads",
+                len(cancelled[ATTR_BACKUPS]),
+                len(cancelled[ATTR_DOWNLOADS]),
+            )
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return cancelled
+
+    def _pause_download(self) -> Optional[Awaitable]:
+        """Pause a download while a backup is being created."""
+        return self._io.pause_point(IO_DOWNLOAD)
+
+    def _track_download(self, slug: str, task: asyncio.Task):
+        """Keep track of in-progress downloads of a backup."""
+        tasks = self._downloads.setdefault(slug, set())
+        tasks.add(task)
+        # purges wait for the download from now, not once it asks for a slot
+        release = self._io.announce(IO_DOWNLOAD)
+
+        def _done(_):
+            release()
+            tasks.discard(task)
+            if not tasks:
+                self._downloads.pop(slug, None)
+
+        task.add_done_callback(_done)
 
     def get_purgeable_snapshots(self) -> List[str]:
-        """Returns the slugs of purgeable snapshots."""
+        """Returns the slugs of purgeable snapshots, expired and not retained."""
+        expired = self._snapshots.purgeable(datetime.now(timezone.utc))
+        plan = self.retention_plan()
+        if plan is not None:
+            expired = [slug for slug in expired if slug not in plan.keep]
+        return expired
+
+    async def _async_save_snapshots(self):
+        with self._stage("save_snapshots"):
+            await self._store.async_save(
+                {slug: backup.as_dict() for slug, backup in self._snapshots.items()}
+            )
+        self._last_saved = datetime.now(timezone.utc)
+
+    async def purge_backups(self) -> List[str]:
+        """Purge expired backups from the Supervisor, returns the purged slugs."""
+        async with self._io.slot(IO_PURGE):
+            start = time.monotonic()
+            with self._stage("purge", {"auto_backup.reason": "expired"}) as span:
+                # backups let go by the retention policy are purged after
+                plan = self.retention_plan()
+                purged = [
+                    slug
+                    for slug in self.get_purgeable_snapshots()
+                    if not (plan and slug in plan.purge)
+                    and await self._purge_snapshot(slug)
+                ]
+                span.set_attribute("auto_backup.purged", len(purged))
+            self.metrics.backups_purged.inc(len(purged), reason="expired")
+
+            if purged:
+                _LOGGER.info(
+                    "Purged %s backups: %s",
+                    len(purged),
+                    purged,
+                )
+                self._hass.bus.async_fire(EVENT_BACKUPS_PURGED, {"backups": purged})
+                # write updated snapshots list to storage
+                await self._async_save_snapshots()
+            else:
+                _LOGGER.debug("No backups required purging.")
+
+            # the list of expired backups was fired with the event, extend a copy
+            purged = [
+                *purged,
+                *await self.purge_for_retention(),
+                *await self.purge_for_space(),
+            ]
+            await self.purge_downloads()
+            self.metrics.purge_duration.observe(time.monotonic() - start)
+        return purged
+
+    def retention_plan(self) -> Optional[RetentionPlan]:
+        """Return the backups the retention policy keeps and purges, if there is one.
+
+        The policy decides what happens to a backup once its `keep_days` have
+        passed: kept backups stay, others are purged. Backups tracked before
+        their creation time was recorded, or with a `keep_days` of 0 or less,
+        are left to expire.
+        """
+        if self._retention is None:
+            return None
         now = datetime.now(timezone.utc)
-        return [slug for slug, expires in self._snapshots.items() if expires < now]
-
-    async def purge_backups(self):
-        """Purge expired backups from the Supervisor."""
-        purged = [
-            slug
-            for slug in self.get_purgeable_snapshots()
-            if await self._purge_snapshot(slug)
+        plan = self._retention.plan(
+            (slug, backup.created, backup.spec)
+            for slug, backup in self._snapshots.items()
+            if backup.created is not None and backup.expires > backup.created
+        )
+        plan.purge = [
+            slug for slug in plan.purge if self._snapshots.is_expired(slug, now)
         ]
+        return plan
+
+    def purge_plan(self) -> Dict:
+        """Return the backups the next purge removes, without removing them."""
+        plan = self.retention_plan()
+        expired = self.get_purgeable_snapshots()
+        if plan is not None:
+            expired = [slug for slug in expired if slug not in plan.purge]
+        return {
+            "expired": expired,
+            "retention": plan and plan.as_dict(),
+        }
+
+    async def purge_for_retention(self) -> List[str]:
+        """Purge tracked backups that are not kept by the retention policy."""
+        plan = self.retention_plan()
+        if plan is None or not plan.purge:
+            return []
+
+        purged = []
+        with self._stage("purge", {"auto_backup.reason": "retention"}) as span:
+            for slug in plan.purge:
+                if await self._purge_snapshot(slug):
+                    purged.append(slug)
+            span.set_attribute("auto_backup.purged", len(purged))
+        self.metrics.backups_purged.inc(len(purged), reason="retention")
 
         if purged:
             _LOGGER.info(
-                "Purged %s backups: %s",
-                len(purged),
-                purged,
+                "Purged %s backups by retention policy: %s", len(purged), purged
+            )
+            self._hass.bus.async_fire(
+                EVENT_BACKUPS_PURGED, {"backups": purged, "reason": "retention"}
+            )
+            await self._async_save_snapshots()
+        return purged
+
+    def _watermark_candidates(self) -> List[str]:
+        """Return tracked backups in the order they are purged to free space."""
+        if not self._snapshots:
+            return []
+
+        def created(slug: str) -> datetime:
+            return self._snapshots[slug].created or self._snapshots[slug].expires
+
+        def expires(slug: str) -> datetime:
+            return self._snapshots[slug].expires
+
+        # never remove the most recent backup to free space, whatever the order
+        newest = max(self._snapshots, key=created)
+        key = expires if self._watermark_order == ORDER_EXPIRY else created
+        return [slug for slug in sorted(self._snapshots, key=key) if slug != newest]
+
+    async def _async_purge_before_create(self):
+        async with self._io.slot(IO_PURGE):
+            await self.purge_for_space()
+
+    async def purge_for_space(self) -> List[str]:
+        """Purge tracked backups while the backup location is above the high watermark."""
+        directory = self._handler.backup_directory
+        if not self._high_watermark or not directory:
+            return []
+
+        usage = await self._hass.async_add_executor_job(disk_usage, directory)
+        if usage is None or usage < self._high_watermark:
+            return []
+
+        _LOGGER.warning(
+            "Backup location '%s' is %.1f%% full, purging backups until below %s%%",
+            directory,
+            usage,
+            self._low_watermark,
+        )
+        purged = []
+        with self._stage("purge", {"auto_backup.reason": "disk_usage"}) as span:
+            span.set_attribute("auto_backup.disk_usage", usage)
+            for slug in self._watermark_candidates():
+                if usage < self._low_watermark:
+                    break
+                if await self._purge_snapshot(slug):
+                    purged.append(slug)
+                usage = await self._hass.async_add_executor_job(disk_usage, directory)
+                if usage is None:
+                    break
+        self.metrics.backups_purged.inc(len(purged), reason="disk_usage")
+
+        if purged:
+            _LOGGER.info("Purged %s backups to free space: %s", len(purged), purged)
+            self._hass.bus.async_fire(
+                EVENT_BACKUPS_PURGED, {"backups": purged, "reason": "disk_usage"}
+            )
+            await self._async_save_snapshots()
+        if usage is not None and usage >= self._low_watermark:
+            _LOGGER.warning(
+                "Backup location '%s' is still %.1f%% full after purging",
+                directory,
+                usage,
+            )
+        return purged
+
+    def _purge_downloads(self) -> List[str]:
+        """Remove expired downloads and any chunks no longer referenced."""
+        expired = self._catalog.list_expired(datetime.now(timezone.utc))
+        removed = []
+        directories = set()
+        for entry in expired:
+            try:
+                remove(entry["path"])
+            except FileNotFoundError:
+                pass
+            except OSError as err:
+                # kept in the catalog, so removing it is retried next time
+                _LOGGER.error("Failed to remove download '%s': %s", entry["path"], err)
+                continue
+            removed.append(entry["path"])
+            if entry["path"].endswith(INDEX_SUFFIX):
+                directories.add(entry["directory"])
+        self._catalog.remove(removed)
+
+        for directory in directories:
+            chunks = self._get_chunk_store(directory).collect_garbage()
+            _LOGGER.debug("Removed %s unreferenced chunks in '%s'", chunks, directory)
+
+        return removed
+
+    async def purge_downloads(self):
+        """Remove expired downloaded copies of backups."""
+        with self._stage("purge_downloads"):
+            purged = await self._hass.async_add_executor_job(self._purge_downloads)
+        if purged:
+            _LOGGER.info("Purged %s downloads: %s", len(purged), purged)
+            self._hass.bus.async_fire(EVENT_DOWNLOADS_PURGED, {"downloads": purged})
+        else:
+            _LOGGER.debug("No downloads required purging.")
+
+    async def async_list_backups(
+        self,
+        sort: str = SORT_EXPIRES,
+        descending: bool = False,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        expired: Optional[bool] = None,
+        expires_before: Optional[datetime] = None,
+        expires_after: Optional[datetime] = None,
+    ) -> Dict:
+        """Return a page of tracked backups, with where they were downloaded to."""
+        try:
+            after = decode_cursor(sort, cursor) if cursor else None
+        except ValueError as err:
+            raise HomeAssistantError(str(err)) from err
+        now = datetime.now(timezone.utc)
+        if expires_before is not None:
+            expires_before = dt_util.as_utc(expires_before)
+        if expires_after is not None:
+            expires_after = dt_util.as_utc(expires_after)
+
+        def match(slug: str, backup: TrackedBackup) -> bool:
+            if expired is not None and self._snapshots.is_expired(slug, now) != expired:
+                return False
+            if expires_before is not None and backup.expires >= expires_before:
+                return False
+            return expires_after is None or backup.expires > expires_after
+
+        backups, last = self._snapshots.page(sort, descending, limit, after, match)
+        downloads = await self._hass.async_add_executor_job(
+            self._catalog.paths_by_slug, [slug for slug, _ in backups]
+        )
+        return {
+            ATTR_BACKUPS: [
+                {
+                    ATTR_SLUG: slug,
+                    "created": backup.created and backup.created.isoformat(),
+                    "expires": backup.expires.isoformat(),
+                    ATTR_SIZE: backup.size,
+                    "expired": self._snapshots.is_expired(slug, now),
+                    ATTR_DOWNLOADS: downloads[slug],
+                }
+                for slug, backup in backups
+            ],
+            "total": len(self._snapshots),
+            "next_cursor": last and encode_cursor(sort, last),
+        }
+
+    async def async_list_downloads(self, directory: str) -> List[Dict]:
+        """Return the catalogued downloads in a directory."""
+        downloads = await self._hass.async_add_executor_job(
+            self._catalog.list_directory, directory
+        )
+        return [
+            {
+                **download,
+                "created": download["created"].isoformat(),
+                "expires": download["expires"] and download["expires"].isoformat(),
+                "verified": download["verified"] and download["verified"].isoformat(),
+            }
+            for download in downloads
+        ]
+
+    async def async_verify_download(
+        self, path: str, slug: Optional[str] = None, force: bool = False
+    ) -> Dict:
+        """Check a downloaded backup can be read end to end."""
+        entry = await self._hass.async_add_executor_job(self._catalog.get, path)
+        slug = slug or (entry and entry["slug"])
+        result = {"path": path, "slug": slug}
+
+        try:
+            file_stat = await self._hass.async_add_executor_job(stat, path)
+        except OSError as err:
+            return self._verified({**result, "result": "missing"}, err)
+
+        if (
+            not force
+            and entry
+            and entry["verified"]
+            and entry["size"] == file_stat.st_size
+            and entry["verified"].timestamp() >= file_stat.st_mtime
+        ):
+            _LOGGER.debug("Skipping verification of unchanged download %s", path)
+            return self._verified(
+                {**result, "result": "unchanged", "sha256": entry["sha256"]}
+            )
+
+        async with self._io.slot(IO_VERIFY):
+            # changes made to the file while it is verified invalidate the result
+            verified = datetime.now(timezone.utc)
+            start = time.monotonic()
+            try:
+                with self._stage(
+                    f"verify {path}",
+                    {"auto_backup.path": path, "auto_backup.slug": slug},
+                ):
+                    details = await self._hass.async_add_executor_job(
+                        verify_archive, path
+                    )
+            except (VerificationError, OSError) as err:
+                result["duration"] = time.monotonic() - start
+                return self._verified({**result, "result": "corrupt"}, err)
+            result["duration"] = time.monotonic() - start
+
+        if entry:
+            await self._hass.async_add_executor_job(
+                self._catalog.set_verified,
+                path,
+                details["sha256"],
+                verified,
             )
-            self._hass.bus.async_fire(EVENT_BACKUPS_PURGED, {"backups": purged})
-            # write updated snapshots list to storage
-            await self._store.async_save(self._snapshots)
+        return self._verified({**result, "result": "ok", **details})
+
+    def _verified(self, result: Dict, error: Optional[Exception] = None) -> Dict:
+        if error:
+            _LOGGER.error("Verification of %s failed: %s", result["path"], error)
+            result[ATTR_ERROR] = str(error)
         else:
-            _LOGGER.debug("No backups required purging.")
+            _LOGGER.info("Verified %s: %s", result["path"], result["result"])
+        self.metrics.verifications.inc(result=result["result"])
+        self._hass.bus.async_fire(EVENT_BACKUP_VERIFIED, result)
+        return result
+
+    async def async_verify_downloads(self, directory: str, force: bool = False):
+        """Verify all catalogued downloads in a directory."""
+        downloads = await self._hass.async_add_executor_job(
+            self._catalog.list_directory, directory
+        )
+        return await asyncio.gather(
+            *(
+                self.async_verify_download(download["path"], force=force)
+                for download in downloads
+                if not download["path"].endswith(INDEX_SUFFIX)
+            )
+        )
+
+    async def async_unload(self):
+        """Release resources held by Auto Backup, once running work is cancelled."""
+        self._scheduler.async_stop()
+        await self.async_cancel()
+        await self._handler.async_close()
+        await self._hass.async_add_executor_job(self._catalog.close)
+        await self._tracer.async_flush()
 
     async def _purge_snapshot(self, slug):
         """Purge an individual snapshot from Hass.io."""
@@ -345,9 +1378,24 @@ class AutoBackup:
         finally:
             # remove snapshot expiry.
             del self._snapshots[slug]
+        # items only in this backup must be backed up again
+        self._fingerprints.forget_backup(slug)
         return True
 
-    def async_download_backup(self, name, slug, backup_path):
+    def _get_chunk_store(self, directory: str) -> ChunkStore:
+        if directory not in self._chunk_stores:
+            self._chunk_stores[directory] = ChunkStore(directory)
+        return self._chunk_stores[directory]
+
+    async def async_download_backup(
+        self,
+        name,
+        slug,
+        backup_path,
+        deduplicate=False,
+        keep_days=None,
+        recompress=False,
+    ):
         """Download backup to the specified location."""
 
         # ensure the name is a valid filename.
@@ -360,12 +1408,168 @@ class AutoBackup:
         if not filename.endswith(".tar"):
             filename += ".tar"
 
-        destination = join(backup_path, filename)
+        remote = backup_path.startswith(S3_SCHEME)
+        if remote:
+            if self._s3 is None:
+                self.metrics.downloads.inc(result="failed")
+                raise HassioAPIError(f"No S3 endpoint configured for {backup_path}")
+            if deduplicate:
+                _LOGGER.warning(
+                    "Deduplication is not supported for %s, uploading the full backup",
+                    backup_path,
+                )
+                deduplicate = False
+            if recompress:
+                _LOGGER.warning(
+                    "Recompression is not supported for %s, uploading the backup as is",
+                    backup_path,
+                )
+            bucket, prefix = parse_s3_url(backup_path)
+            target = S3Destination(
+                async_get_clientsession(self._hass), self._s3, bucket, prefix + filename
+            )
+            destination = target.path
+        else:
+            destination = join(backup_path, filename)
+            if deduplicate:
+                destination += INDEX_SUFFIX
 
-        # check if file already exists
-        if isfile(destination):
-            destination = join(backup_path, f"{slug}.tar")
+            # check if file already exists
+            if await self._hass.async_add_executor_job(isfile, destination):
+                destination = join(backup_path, f"{slug}.tar")
+                if deduplicate:
+                    destination += INDEX_SUFFIX
 
-        return self._handler.download_backup(
-            slug, destination, timeout=self._backup_timeout
-        )
+            target = destination
+            if deduplicate:
+                if recompress:
+                    _LOGGER.warning(
+                        "Compressed backups deduplicate poorly, not recompressing %s",
+                        destination,
+                    )
+                target = ChunkedDestination(
+                    self._get_chunk_store(backup_path), destination, slug
+                )
+            elif recompress:
+                target = RecompressingDestination(
+                    destination, self._compression_level, self._compression_workers
+                )
+            elif self._uncached_downloads:
+                target = UncachedFileDestination(
+                    destination,
+                    self._sync_interval,
+                    await self._handler.get_backup_size(slug),
+                )
+
+        # growth of the page cache shows how much a download evicts other files
+        cached = None
+        if not remote:
+            cached = await self._hass.async_add_executor_job(read_page_cache)
+
+        try:
+            async with self._io.slot(IO_DOWNLOAD):
+                with self._stage(
+                    f"download {destination}",
+                    {"auto_backup.slug": slug, "auto_backup.path": destination},
+                ) as span:
+                    stats = await self._handler.download_backup(
+                        slug,
+                        target,
+                        timeout=self._backup_timeout,
+                        throttle=self._throttle,
+                        pause=self._pause_download if self._io.exclusive else None,
+                    )
+                    if stats:
+                        span.set_attribute("auto_backup.size", stats["size"])
+                        span.set_attribute("auto_backup.rate", stats["rate"])
+        except HassioAPIError:
+            self.metrics.downloads.inc(result="failed")
+            raise
+        except asyncio.CancelledError:
+            self.metrics.downloads.inc(result="cancelled")
+            _LOGGER.warning("Download of '%s' to %s was cancelled", name, destination)
+            self._hass.bus.async_fire(
+                EVENT_BACKUP_CANCELLED,
+                {
+                    "name": name,
+                    "slug": slug,
+                    "path": destination,
+                    ATTR_JOB: JOB_DOWNLOAD,
+                },
+            )
+            raise
+
+        if stats:
+            if cached is not None:
+                after = await self._hass.async_add_executor_job(read_page_cache)
+                if after is not None:
+                    stats["page_cache_growth"] = after - cached
+            self.metrics.cache_dropped_bytes.inc(stats.get("cache_dropped", 0))
+            self.metrics.downloads.inc(result="ok")
+            self.metrics.download_duration.observe(stats["duration"])
+            if slug in self._snapshots and self._snapshots[slug].size is None:
+                # the handler could not tell the size when the backup was created
+                self._snapshots.set_size(slug, stats["size"])
+                await self._async_save_snapshots()
+            self._recent_downloads.append(
+                {
+                    "path": destination,
+                    "finished": datetime.now(timezone.utc),
+                    "size": stats["size"],
+                    "duration": round(stats["duration"], 3),
+                    "rate": stats["rate"] and round(stats["rate"]),
+                    "page_cache_growth": stats.get("page_cache_growth"),
+                    "compression_ratio": stats.get("compression_ratio"),
+                }
+            )
+            if deduplicate:
+                self.metrics.record_lookups(
+                    self.metrics.chunk_lookups,
+                    stats["chunks"] - stats["new_chunks"],
+                    stats["chunks"],
+                )
+            # uploads are not catalogued, object storage has its own expiry rules
+            if not remote:
+                expires = None
+                if keep_days is not None:
+                    expires = datetime.now(timezone.utc) + timedelta(
+                        days=float(keep_days)
+                    )
+                await self._hass.async_add_executor_job(
+                    self._catalog.add, destination, slug, stats["size"], expires
+                )
+            self._hass.bus.async_fire(
+                EVENT_BACKUP_DOWNLOADED,
+                {
+                    "name": name,
+                    "slug": slug,
+                    "path": destination,
+                    **stats,
+                    "rate_limit": self._throttle.limit,
+                },
+            )
+            # deduplicated downloads are checked against their checksum when reassembled
+            if self._verify_downloads and not deduplicate and not remote:
+                await self.async_verify_download(destination, slug)
+            return destination
+
+        self.metrics.downloads.inc(result="failed")
+
+    async def async_reassemble(self, index_path: str, destination: Optional[str]):
+        """Rebuild a deduplicated backup into its original archive."""
+        if not destination:
+            destination = index_path.removesuffix(INDEX_SUFFIX)
+        store = self._get_chunk_store(dirname(index_path))
+
+        _LOGGER.debug("Reassembling '%s' to '%s'", index_path, destination)
+        try:
+            result = await self._hass.async_add_executor_job(
+                store.reassemble, index_path, destination
+            )
+        except (OSError, ValueError, KeyError) as err:
+            raise HomeAssistantError(
+                f"Failed to reassemble '{index_path}': {err}"
+            ) from err
+
+        _LOGGER.info("Reassembled backup '%s' to '%s'", index_path, destination)
+        return result
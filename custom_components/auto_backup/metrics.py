@@ -0,0 +1,218 @@
+"""Prometheus metrics of backup operations.
+
+Metrics are updated in place as operations happen, so rendering them for a
+scrape never queries the Supervisor or the backup integration.
+"""
+
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from aiohttp import web
+from homeassistant.components.http import KEY_HASS, HomeAssistantView
+
+from .const import DATA_AUTO_BACKUP
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+CREATE_BUCKETS = (10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+DOWNLOAD_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+PURGE_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    labels = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", r"\\").replace('"', r"\""))
+        for name, value in zip(names, values)
+    )
+    return "{" + labels + "}"
+
+
+class Counter:
+    """Monotonically increasing value, optionally split by labels."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        if not self.labels:
+            self._values[()] = 0
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(labels[label] for label in self.labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        return [
+            (self.name, _format_labels(self.labels, key), value)
+            for key, value in self._values.items()
+        ]
+
+
+class Gauge:
+    """Value read from a callback at scrape time, the callback must be O(1)."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self._callback = callback
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        return [(self.name, "", self._callback())]
+
+
+class Histogram:
+    """Distribution of observed values in fixed cumulative buckets."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+
+    def observe(self, value: float):
+        self._counts[bisect_left(self.buckets, value)] += 1
+        self._sum += value
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        samples = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self._counts):
+            cumulative += count
+            samples.append((f"{self.name}_bucket", f'{{le="{bound}"}}', cumulative))
+        samples.append((f"{self.name}_sum", "", self._sum))
+        samples.append((f"{self.name}_count", "", cumulative))
+        return samples
+
+
+class Metrics:
+    """All metrics exported by Auto Backup."""
+
+    def __init__(self):
+        self.backups_started = Counter(
+            "auto_backup_backups_started_total", "Backups started."
+        )
+        self.backups_succeeded = Counter(
+            "auto_backup_backups_succeeded_total", "Backups created successfully."
+        )
+        self.backups_failed = Counter(
+            "auto_backup_backups_failed_total", "Backups that failed to be created."
+        )
+        self.backups_cancelled = Counter(
+            "auto_backup_backups_cancelled_total",
+            "Backups cancelled while being created.",
+        )
+        self.backups_skipped = Counter(
+            "auto_backup_backups_skipped_total", "Backups skipped as unchanged."
+        )
+        self.backups_purged = Counter(
+            "auto_backup_backups_purged_total", "Backups removed by reason.", ["reason"]
+        )
+        self.downloads = Counter(
+            "auto_backup_downloads_total", "Backup downloads by result.", ["result"]
+        )
+        self.downloaded_bytes = Counter(
+            "auto_backup_downloaded_bytes_total", "Bytes of backups downloaded."
+        )
+        self.cache_dropped_bytes = Counter(
+            "auto_backup_page_cache_dropped_bytes_total",
+            "Bytes of downloaded backups dropped from the page cache once written.",
+        )
+        self.api_retries = Counter(
+            "auto_backup_api_retries_total",
+            "Requests to the Supervisor API retried after a transient failure.",
+        )
+        self.verifications = Counter(
+            "auto_backup_verifications_total",
+            "Verifications of downloaded backups by result.",
+            ["result"],
+        )
+        self.api_requests = Counter(
+            "auto_backup_api_requests_total",
+            "Requests made to the Supervisor API.",
+            ["result"],
+        )
+        self.chunk_lookups = Counter(
+            "auto_backup_chunk_lookups_total",
+            "Chunks of deduplicated downloads, a hit was already stored.",
+            ["result"],
+        )
+        self.fingerprint_lookups = Counter(
+            "auto_backup_fingerprint_lookups_total",
+            "Add-ons and folders compared to their last backup, a hit is unchanged.",
+            ["kind", "result"],
+        )
+        self.create_duration = Histogram(
+            "auto_backup_create_duration_seconds",
+            "Time taken to create a backup.",
+            CREATE_BUCKETS,
+        )
+        self.download_duration = Histogram(
+            "auto_backup_download_duration_seconds",
+            "Time taken to download a backup.",
+            DOWNLOAD_BUCKETS,
+        )
+        self.purge_duration = Histogram(
+            "auto_backup_purge_duration_seconds",
+            "Time taken to purge expired backups and downloads.",
+            PURGE_BUCKETS,
+        )
+        self._gauges: List[Gauge] = []
+
+    def add_gauge(self, name: str, documentation: str, callback: Callable[[], float]):
+        self._gauges.append(Gauge(name, documentation, callback))
+
+    def record_lookups(self, counter: Counter, hits: int, total: int, **labels: str):
+        """Count hits and misses of a cache lookup."""
+        counter.inc(hits, result="hit", **labels)
+        counter.inc(total - hits, result="miss", **labels)
+
+    def _metrics(self):
+        return (
+            *(value for value in vars(self).values() if hasattr(value, "samples")),
+            *self._gauges,
+        )
+
+    def snapshot(self) -> Dict[str, float]:
+        """Return the current value of every sample, keyed as in the exposition format."""
+        return {
+            f"{name}{labels}": value
+            for metric in self._metrics()
+            for name, labels, value in metric.samples()
+            if not name.endswith("_bucket")
+        }
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class AutoBackupMetricsView(HomeAssistantView):
+    """Expose the metrics of Auto Backup to Prometheus."""
+
+    url = "/api/auto_backup/metrics"
+    name = "api:auto_backup:metrics"
+
+    async def get(self, request: web.Request) -> web.Response:
+        auto_backup = request.app[KEY_HASS].data.get(DATA_AUTO_BACKUP)
+        if auto_backup is None:
+            return web.Response(status=404)
+        return web.Response(
+            body=auto_backup.metrics.render(),
+            headers={"Content-Type": CONTENT_TYPE},
+        )
@@ -0,0 +1,90 @@
+"""Profiling of a single backup run."""
+
+import asyncio
+import cProfile
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+_LOGGER = logging.getLogger(__name__)
+
+PROFILE_DIRECTORY = "auto_backup_profiles"
+
+
+class RunProfiler:
+    """Profile a backup run with cProfile and record the timing of its stages.
+
+    cProfile only observes the event loop thread, time spent in the executor
+    shows up as the awaiting coroutine being suspended. The stage timings cover
+    the wall time of each stage and the task it ran in, including time spent
+    waiting on the Supervisor and disk I/O.
+    """
+
+    def __init__(self):
+        self._profile: Optional[cProfile.Profile] = cProfile.Profile()
+        self._started: Optional[datetime] = None
+        self._start = 0.0
+        self._duration = 0.0
+        self._stages: List[Dict] = []
+
+    def start(self):
+        self._started = datetime.now().astimezone()
+        self._start = time.monotonic()
+        try:
+            self._profile.enable()
+        except ValueError as err:
+            # another profiler, such as the profiler integration, is running
+            _LOGGER.warning(
+                "Unable to enable cProfile, recording timings only: %s", err
+            )
+            self._profile = None
+
+    def stop(self):
+        self._duration = time.monotonic() - self._start
+        if self._profile:
+            self._profile.disable()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Record the wall time of a stage of the run."""
+        start = time.monotonic()
+        task = asyncio.current_task()
+        try:
+            yield
+        finally:
+            self._stages.append(
+                {
+                    "name": name,
+                    "task": task.get_name() if task else None,
+                    "start": round(start - self._start, 6),
+                    "duration": round(time.monotonic() - start, 6),
+                }
+            )
+
+    def save(self, directory: str) -> Tuple[Optional[str], str]:
+        """Write the profile (pstats format) and the stage timings (JSON)."""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self._started.strftime("%Y%m%d-%H%M%S"))
+
+        profile_path = None
+        if self._profile:
+            profile_path = base + ".prof"
+            self._profile.dump_stats(profile_path)
+
+        timings_path = base + ".json"
+        with open(timings_path, "w") as file:
+            json.dump(
+                {
+                    "started": self._started.isoformat(),
+                    "duration": round(self._duration, 6),
+                    "profile": profile_path,
+                    "stages": sorted(self._stages, key=lambda stage: stage["start"]),
+                },
+                file,
+                indent=2,
+            )
+        return profile_path, timings_path
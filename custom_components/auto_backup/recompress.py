@@ -0,0 +1,285 @@
+"""Compression of the inner archives of uncompressed backups as they are written.
+
+The Supervisor compresses each archive of a backup in a single thread. Backups
+created with `compressed: false` are instead compressed while downloading,
+with the blocks of each archive deflated in parallel and joined into a single
+gzip stream, the same way as pigz. The result is a regular compressed backup.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import struct
+import tarfile
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Deque, Dict, Optional
+
+from .destinations import Destination
+
+_LOGGER = logging.getLogger(__name__)
+
+BLOCK_SIZE = 1024 * 1024
+# back-references of deflate reach at most this far into the previous block
+WINDOW_SIZE = 32 * 1024
+BLOCK_SIZE_TAR = tarfile.BLOCKSIZE
+RECORD_SIZE = tarfile.RECORDSIZE
+TAR_MAGIC = b"ustar"
+# chunks buffered between the download and the thread writing the archive
+QUEUE_SIZE = 16
+GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+
+
+def _deflate(block: bytes, level: int, dictionary: bytes, last: bool) -> bytes:
+    """Deflate a block so it continues the stream of the blocks before it."""
+    if dictionary:
+        compressor = zlib.compressobj(
+            level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=dictionary
+        )
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    data = compressor.compress(block)
+    # a sync flush ends on a byte boundary without marking the last block
+    return data + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+class _QueueReader:
+    """File-like reader of the chunks written to a destination, used in a thread."""
+
+    def __init__(self, queue: asyncio.Queue, loop: asyncio.AbstractEventLoop):
+        self._queue = queue
+        self._loop = loop
+        self._buffer = bytearray()
+        self._eof = False
+
+    def _next(self) -> Optional[bytes]:
+        return asyncio.run_coroutine_threadsafe(self._queue.get(), self._loop).result()
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            chunk = self._next()
+            if chunk is None:
+                self._eof = True
+            elif isinstance(chunk, Exception):
+                raise chunk
+            else:
+                self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+
+class RecompressingDestination(Destination):
+    """Write a backup to a file, gzipping its uncompressed inner archives.
+
+    Inner archives are only compressed when they are readable tar archives, the
+    archives of password protected backups are encrypted and copied as is.
+    """
+
+    def __init__(self, path: str, level: int, workers: int):
+        super().__init__(path)
+        self._level = level
+        self._workers = workers or os.cpu_count() or 1
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Future] = None
+        # decided by backup.json, None until it has been read
+        self._compress: Optional[bool] = None
+        # inner archives copied as is before backup.json was read
+        self._kept = 0
+        self._stats = {"recompressed": 0, "in": 0, "out": 0, "time": 0.0}
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(QUEUE_SIZE)
+        self._task = loop.run_in_executor(
+            None, self._rewrite, _QueueReader(self._queue, loop)
+        )
+
+    async def _put(self, item):
+        if not self._queue.full():
+            self._queue.put_nowait(item)
+            return
+        put = asyncio.ensure_future(self._queue.put(item))
+        await asyncio.wait((put, self._task), return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            # the archive could not be written, raise why
+            put.cancel()
+            self._raise_error()
+
+    async def write(self, chunk: bytes):
+        if self._task.done():
+            self._raise_error()
+        await self._put(chunk)
+
+    async def close(self) -> Dict:
+        await self._put(None)
+        await asyncio.wait((self._task,))
+        self._raise_error()
+        stats = self._stats
+        return {
+            "recompressed": stats["recompressed"],
+            "compression_ratio": (
+                round(stats["in"] / stats["out"], 2) if stats["out"] else None
+            ),
+            "compression_time": round(stats["time"], 3),
+        }
+
+    def _raise_error(self):
+        """Raise why the archive could not be written, as an IOError."""
+        try:
+            self._task.result()
+        except tarfile.TarError as err:
+            _LOGGER.error("Unable to recompress '%s': %s", self.path, err)
+            raise IOError(f"Unable to recompress {self.path}: {err}") from err
+
+    async def abort(self):
+        if self._task is not None:
+            if not self._task.done():
+                # fails the next read, waking the thread if it is waiting
+                while not self._queue.empty():
+                    self._queue.get_nowait()
+                self._queue.put_nowait(IOError("Download aborted"))
+            await asyncio.gather(self._task, return_exceptions=True)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, os.remove, self.path)
+        except OSError:
+            pass
+        else:
+            _LOGGER.debug("Removed partial download '%s'", self.path)
+
+    def _rewrite(self, reader: _QueueReader):
+        """Copy the backup, compressing its inner archives, runs in the executor."""
+        with (
+            open(self.path, "wb") as out,
+            ThreadPoolExecutor(
+                self._workers, thread_name_prefix="auto_backup_compress"
+            ) as pool,
+            tarfile.open(fileobj=reader, mode="r|") as archive,
+        ):
+            for member in archive:
+                data = archive.extractfile(member) if member.isfile() else None
+                if data is None:
+                    out.write(member.tobuf(tarfile.GNU_FORMAT))
+                elif member.name.endswith("backup.json"):
+                    self._copy_metadata(out, member, data)
+                elif member.name.endswith(".tar") and self._should_compress(data):
+                    self._compress_member(out, member, data, pool)
+                else:
+                    if member.name.endswith(".tar") and self._compress is None:
+                        self._kept += 1
+                    self._copy_member(out, member, data)
+            out.write(bytes(2 * BLOCK_SIZE_TAR))
+            out.write(bytes(-out.tell() % RECORD_SIZE))
+        # read to the end, like tar does, so closing the download does not block
+        reader.read()
+
+    def _should_compress(self, data: BinaryIO) -> bool:
+        if self._compress is None:
+            # The Supervisor writes backup.json after the archives, so until then
+            # only archives that are plain tars are compressed. The archives of
+            # protected backups are encrypted and never have a tar header.
+            header = data.peek(BLOCK_SIZE_TAR)
+            return header[257:262] == TAR_MAGIC
+        return self._compress
+
+    @staticmethod
+    def _pad(out: BinaryIO, size: int):
+        out.write(bytes(-size % BLOCK_SIZE_TAR))
+
+    def _copy_member(self, out: BinaryIO, member: tarfile.TarInfo, data: BinaryIO):
+        out.write(member.tobuf(tarfile.GNU_FORMAT))
+        while block := data.read(BLOCK_SIZE):
+            out.write(block)
+        self._pad(out, member.size)
+
+    def _copy_metadata(self, out: BinaryIO, member: tarfile.TarInfo, data: BinaryIO):
+        metadata = json.loads(data.read())
+        if self._stats["recompressed"] and (self._kept or metadata.get("protected")):
+            # a backup is either compressed or not, restoring a mix would fail
+            raise tarfile.ReadError(
+                f"Cannot recompress some archives of {self.path} and not others"
+            )
+        if self._compress is None:
+            # backups of older Supervisors have backup.json first
+            self._compress = not metadata.get("compressed", True) and not (
+                metadata.get("protected")
+            )
+        if self._compress or self._stats["recompressed"]:
+            metadata["compressed"] = True
+        content = json.dumps(metadata).encode()
+        member.size = len(content)
+        out.write(member.tobuf(tarfile.GNU_FORMAT))
+        out.write(content)
+        self._pad(out, member.size)
+
+    def _compress_member(
+        self,
+        out: BinaryIO,
+        member: tarfile.TarInfo,
+        data: BinaryIO,
+        pool: ThreadPoolExecutor,
+    ):
+        start = time.monotonic()
+        member_size = member.size
+        member.name += ".gz"
+        # the size is only known once compressed, the header is rewritten after
+        header_offset = out.tell()
+        member.size = 0
+        header = member.tobuf(tarfile.GNU_FORMAT)
+        out.write(header)
+
+        out.write(GZIP_HEADER)
+        size = len(GZIP_HEADER)
+        crc = 0
+        remaining = member_size
+        dictionary = b""
+        pending: Deque[Future] = deque()
+        while remaining:
+            block = data.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                raise tarfile.ReadError(f"Unexpected end of {member.name}")
+            remaining -= len(block)
+            crc = zlib.crc32(block, crc)
+            pending.append(
+                pool.submit(_deflate, block, self._level, dictionary, not remaining)
+            )
+            dictionary = block[-WINDOW_SIZE:]
+            # keep every worker busy without holding the whole archive in memory
+            while len(pending) > 2 * self._workers or (pending and not remaining):
+                compressed = pending.popleft().result()
+                out.write(compressed)
+                size += len(compressed)
+        if not member_size:
+            compressed = _deflate(b"", self._level, b"", True)
+            out.write(compressed)
+            size += len(compressed)
+        trailer = struct.pack("<II", crc & 0xFFFFFFFF, member_size & 0xFFFFFFFF)
+        out.write(trailer)
+        size += len(trailer)
+        self._pad(out, size)
+
+        end = out.tell()
+        member.size = size
+        updated = member.tobuf(tarfile.GNU_FORMAT)
+        if len(updated) != len(header):
+            raise tarfile.HeaderError(f"Header of {member.name} changed length")
+        out.seek(header_offset)
+        out.write(updated)
+        out.seek(end)
+
+        self._stats["recompressed"] += 1
+        self._stats["in"] += member_size
+        self._stats["out"] += size
+        self._stats["time"] += time.monotonic() - start
+        _LOGGER.debug(
+            "Compressed %s from %s to %s bytes in %.1fs",
+            member.name,
+            member_size,
+            size,
+            time.monotonic() - start,
+        )
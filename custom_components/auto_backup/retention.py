@@ -0,0 +1,113 @@
+"""Grandfather-father-son retention of tracked backups."""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    CONF_KEEP_HOURLY,
+    CONF_KEEP_DAILY,
+    CONF_KEEP_WEEKLY,
+    CONF_KEEP_MONTHLY,
+)
+
+TIER_HOURLY = "hourly"
+TIER_DAILY = "daily"
+TIER_WEEKLY = "weekly"
+TIER_MONTHLY = "monthly"
+
+# the period of each tier a backup falls in, in local time
+PERIODS: Dict[str, Callable[[datetime], Tuple]] = {
+    TIER_HOURLY: lambda time: (time.year, time.month, time.day, time.hour),
+    TIER_DAILY: lambda time: (time.year, time.month, time.day),
+    TIER_WEEKLY: lambda time: tuple(time.isocalendar()[:2]),
+    TIER_MONTHLY: lambda time: (time.year, time.month),
+}
+
+
+@dataclass
+class RetentionPlan:
+    """The backups a policy keeps, with the tiers keeping them, and purges."""
+
+    keep: Dict[str, List[str]] = field(default_factory=dict)
+    purge: List[str] = field(default_factory=list)
+
+    def as_dict(self) -> Dict:
+        return {"keep": self.keep, "purge": self.purge}
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """Keep the newest backup of each of the last N hours, days, weeks and months."""
+
+    hourly: int = 0
+    daily: int = 0
+    weekly: int = 0
+    monthly: int = 0
+
+    @classmethod
+    def from_options(cls, options: Dict) -> Optional["RetentionPolicy"]:
+        """Return the configured policy, if any tier keeps backups."""
+        policy = cls(
+            hourly=options.get(CONF_KEEP_HOURLY, 0),
+            daily=options.get(CONF_KEEP_DAILY, 0),
+            weekly=options.get(CONF_KEEP_WEEKLY, 0),
+            monthly=options.get(CONF_KEEP_MONTHLY, 0),
+        )
+        return policy if any(policy.tiers.values()) else None
+
+    @property
+    def tiers(self) -> Dict[str, int]:
+        return {
+            TIER_HOURLY: self.hourly,
+            TIER_DAILY: self.daily,
+            TIER_WEEKLY: self.weekly,
+            TIER_MONTHLY: self.monthly,
+        }
+
+    def plan(
+        self, backups: Iterable[Tuple[str, datetime, Optional[str]]]
+    ) -> RetentionPlan:
+        """Decide which of the backups, by slug, creation time and spec, to keep.
+
+        The policy applies to the backups of each spec on their own, so backups
+        of one add-on do not count towards those of another. The newest backup
+        of each spec is always kept.
+        """
+        groups: Dict[Optional[str], List[Tuple[str, datetime]]] = {}
+        for slug, created, spec in backups:
+            groups.setdefault(spec, []).append((slug, created))
+        plan = RetentionPlan()
+        for group in groups.values():
+            self._plan_group(group, plan)
+        return plan
+
+    def _plan_group(self, backups: List[Tuple[str, datetime]], plan: RetentionPlan):
+        """Add the backups of a spec to the plan.
+
+        Backups are visited once, newest first. Each tier keeps the first backup
+        it sees in a period it has not kept one for yet, until it has kept as
+        many as it is configured to.
+        """
+        remaining = {tier: count for tier, count in self.tiers.items() if count}
+        last_periods: Dict[str, Tuple] = {}
+        for slug, created in sorted(
+            backups, key=lambda backup: backup[1], reverse=True
+        ):
+            created = dt_util.as_local(created)
+            tiers = []
+            for tier in list(remaining):
+                period = PERIODS[tier](created)
+                if period == last_periods.get(tier):
+                    continue
+                last_periods[tier] = period
+                tiers.append(tier)
+                remaining[tier] -= 1
+                if not remaining[tier]:
+                    del remaining[tier]
+            if tiers:
+                plan.keep[slug] = tiers
+            else:
+                plan.purge.append(slug)
@@ -0,0 +1,147 @@
+"""Retries with backoff and a circuit breaker for requests to the Supervisor."""
+
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional, TypeVar
+
+_LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """The circuit is open, the request was not attempted."""
+
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff, by default retrying for about a minute.
+
+    Long enough to ride out a restart of the Supervisor.
+    """
+
+    attempts: int = 6
+    base_delay: float = 2.0
+    max_delay: float = 30.0
+
+    def delay(self, retry: int) -> float:
+        """Return how long to wait before the given retry, starting at 1."""
+        delay = min(self.max_delay, self.base_delay * 2 ** (retry - 1))
+        # jitter spreads out the retries of requests that failed together
+        return random.uniform(delay / 2, delay)
+
+
+class CircuitBreaker:
+    """Fail fast after consecutive failed requests, until a trial request succeeds.
+
+    A request only counts as failed once its retries are exhausted. While open,
+    requests fail immediately, after `reset_timeout` a single trial request is
+    let through (half open), which closes the circuit if it succeeds.
+    """
+
+    def __init__(
+        self,
+        threshold: int = 2,
+        reset_timeout: float = 60,
+        listener: Optional[Callable[[str, Optional[str]], None]] = None,
+    ):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        # called with the new state and the error that caused it
+        self.listener = listener
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self._opened = 0.0
+        self._trial = False
+
+    def _set_state(self, state: str, error: Optional[str] = None):
+        if state == self.state:
+            return
+        _LOGGER.log(
+            logging.WARNING if state == STATE_OPEN else logging.INFO,
+            "Supervisor circuit %s%s",
+            state,
+            f": {error}" if error else "",
+        )
+        self.state = state
+        if self.listener:
+            self.listener(state, error)
+
+    def before_request(self):
+        """Raise CircuitOpenError if a request may not be made right now."""
+        if self.state == STATE_OPEN:
+            if time.monotonic() - self._opened < self.reset_timeout:
+                raise CircuitOpenError("Supervisor is unavailable, not retrying yet")
+            self._set_state(STATE_HALF_OPEN)
+        if self.state == STATE_HALF_OPEN:
+            if self._trial:
+                raise CircuitOpenError("Supervisor is unavailable, waiting for trial")
+            self._trial = True
+
+    def record_success(self):
+        self._trial = False
+        self.failures = 0
+        self._set_state(STATE_CLOSED)
+
+    def record_failure(self, error: Exception):
+        self._trial = False
+        self.failures += 1
+        if self.state == STATE_HALF_OPEN or self.failures >= self.threshold:
+            self._opened = time.monotonic()
+            self._set_state(STATE_OPEN, str(error))
+
+    def record_cancelled(self):
+        """Release the trial of a request that was cancelled."""
+        self._trial = False
+
+
+async def call_with_retry(
+    func: Callable[[], Awaitable[T]],
+    policy: RetryPolicy,
+    breaker: CircuitBreaker,
+    is_transient: Callable[[Exception], bool],
+    can_retry: Callable[[Exception], bool],
+    on_retry: Optional[Callable[[Exception, float], None]] = None,
+    deadline: Optional[float] = None,
+) -> T:
+    """Call func, retrying transient errors that are safe to retry.
+
+    `is_transient` decides whether an error counts towards the circuit breaker
+    and `can_retry` whether repeating the request is safe. No retry is started
+    after `deadline` seconds, which bounds how long a failing call takes.
+    """
+    breaker.before_request()
+    end = None if deadline is None else time.monotonic() + deadline
+    try:
+        for attempt in range(1, policy.attempts + 1):
+            try:
+                result = await func()
+            except Exception as err:
+                if not is_transient(err):
+                    # the Supervisor responded, so it is available
+                    breaker.record_success()
+                    raise
+                delay = policy.delay(attempt)
+                if (
+                    attempt == policy.attempts
+                    or not can_retry(err)
+                    or (end is not None and time.monotonic() + delay >= end)
+                ):
+                    breaker.record_failure(err)
+                    raise
+                if on_retry:
+                    on_retry(err, delay)
+                await asyncio.sleep(delay)
+            else:
+                breaker.record_success()
+                return result
+    except asyncio.CancelledError:
+        breaker.record_cancelled()
+        raise
@@ -0,0 +1,277 @@
+"""Streaming upload of backups to S3 compatible object storage.
+
+Backups are uploaded with a multipart upload as they are downloaded, so they
+are never written to local disk. Requests are signed with AWS Signature
+Version 4 and use path-style URLs, which all S3 compatible services support.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+import aiohttp
+from multidict import CIMultiDict
+from yarl import URL
+
+from .const import (
+    CONF_S3_ENDPOINT,
+    CONF_S3_REGION,
+    CONF_S3_ACCESS_KEY,
+    CONF_S3_SECRET_KEY,
+    DEFAULT_S3_REGION,
+)
+from .destinations import Destination
+
+_LOGGER = logging.getLogger(__name__)
+
+S3_SCHEME = "s3://"
+# S3 requires all parts but the last to be at least 5 MiB, and allows 10000
+# parts, so backups of up to 80 GiB can be uploaded.
+PART_SIZE = 8 * 1024 * 1024
+# parts uploaded at the same time, memory used is at most one more part than this
+MAX_CONCURRENT_PARTS = 3
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=300)
+
+
+class S3Error(IOError):
+    """A request to the object storage failed."""
+
+
+@dataclass
+class S3Config:
+    endpoint: str
+    region: str
+    access_key: str
+    secret_key: str
+
+    @classmethod
+    def from_options(cls, options: Dict) -> Optional["S3Config"]:
+        """Return the configured object storage, if there is one."""
+        if not options.get(CONF_S3_ENDPOINT):
+            return None
+        return cls(
+            endpoint=options[CONF_S3_ENDPOINT].rstrip("/"),
+            region=options.get(CONF_S3_REGION) or DEFAULT_S3_REGION,
+            access_key=options.get(CONF_S3_ACCESS_KEY, ""),
+            secret_key=options.get(CONF_S3_SECRET_KEY, ""),
+        )
+
+
+def parse_s3_url(url: str) -> Tuple[str, str]:
+    """Return the bucket and key prefix of an s3://bucket/prefix URL."""
+    bucket, _, prefix = url[len(S3_SCHEME) :].partition("/")
+    prefix = prefix.strip("/")
+    return bucket, f"{prefix}/" if prefix else ""
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode(), hashlib.sha256).digest()
+
+
+def _canonical_query(params: Dict[str, str]) -> str:
+    return "&".join(
+        f"{quote(key, safe='~')}={quote(value, safe='~')}"
+        for key, value in sorted(params.items())
+    )
+
+
+def sign_request(
+    config: S3Config,
+    method: str,
+    url: str,
+    params: Dict[str, str],
+    payload_hash: str,
+    now: Optional[datetime] = None,
+) -> Dict[str, str]:
+    """Return the headers authenticating a request with Signature Version 4.
+
+    The path of the URL must already be percent-encoded.
+    """
+    now = now or datetime.now(timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    date = now.strftime("%Y%m%d")
+    scope = f"{date}/{config.region}/s3/aws4_request"
+    parts = urlsplit(url)
+
+    headers = {
+        "host": parts.netloc,
+        "x-amz-content-sha256": payload_hash,
+        "x-amz-date": amz_date,
+    }
+    signed_headers = ";".join(sorted(headers))
+    canonical_request = "\n".join(
+        (
+            method,
+            parts.path or "/",
+            _canonical_query(params),
+            "".join(f"{key}:{headers[key]}\n" for key in sorted(headers)),
+            signed_headers,
+            payload_hash,
+        )
+    )
+    string_to_sign = "\n".join(
+        (
+            "AWS4-HMAC-SHA256",
+            amz_date,
+            scope,
+            hashlib.sha256(canonical_request.encode()).hexdigest(),
+        )
+    )
+
+    key = _hmac(f"AWS4{config.secret_key}".encode(), date)
+    for part in (config.region, "s3", "aws4_request"):
+        key = _hmac(key, part)
+    signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+    del headers["host"]
+    headers["Authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={config.access_key}/{scope}, "
+        f"SignedHeaders={signed_headers}, Signature={signature}"
+    )
+    return headers
+
+
+def _find(body: bytes, name: str) -> Optional[str]:
+    """Return the text of an element of an XML response, ignoring namespaces."""
+    try:
+        root = ET.fromstring(body)
+    except ET.ParseError:
+        return None
+    for element in root.iter():
+        if element.tag == name or element.tag.endswith("}" + name):
+            return element.text
+    return None
+
+
+class S3Destination(Destination):
+    """Stream a backup into a multipart upload to S3 compatible storage.
+
+    Writes are buffered until a part is full, which is then uploaded in the
+    background. Once the maximum number of parts are being uploaded, writing
+    waits for one to complete, which also slows down the download.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        config: S3Config,
+        bucket: str,
+        key: str,
+    ):
+        super().__init__(f"{S3_SCHEME}{bucket}/{key}")
+        self._session = session
+        self._config = config
+        self._url = config.endpoint + quote(f"/{bucket}/{key}", safe="/~")
+        self._upload_id: Optional[str] = None
+        self._buffer = bytearray()
+        self._slots = asyncio.Semaphore(MAX_CONCURRENT_PARTS)
+        self._tasks: List[asyncio.Task] = []
+        self._etags: Dict[int, str] = {}
+
+    async def _request(
+        self,
+        method: str,
+        params: Dict[str, str],
+        data: bytes = b"",
+        payload_hash: Optional[str] = None,
+    ) -> Tuple[CIMultiDict, bytes]:
+        if payload_hash is None:
+            payload_hash = hashlib.sha256(data).hexdigest()
+        headers = sign_request(self._config, method, self._url, params, payload_hash)
+        # the URL is encoded exactly as signed, not re-encoded by aiohttp
+        url = URL(f"{self._url}?{_canonical_query(params)}", encoded=True)
+        async with self._session.request(
+            method,
+            url,
+            data=data,
+            headers=headers,
+            timeout=REQUEST_TIMEOUT,
+        ) as response:
+            body = await response.read()
+            if response.status >= 300:
+                raise S3Error(
+                    f"{method} {self.path} failed with status {response.status}:"
+                    f" {_find(body, 'Message') or _find(body, 'Code')}"
+                )
+            return response.headers.copy(), body
+
+    async def open(self):
+        _, body = await self._request("POST", {"uploads": ""})
+        self._upload_id = _find(body, "UploadId")
+        if not self._upload_id:
+            raise S3Error(f"No upload id returned for {self.path}")
+        _LOGGER.debug("Started multipart upload of %s", self.path)
+
+    async def _upload_part(self, number: int, data: bytes):
+        try:
+            # hashing a part would stall the event loop
+            payload_hash = await asyncio.get_running_loop().run_in_executor(
+                None, lambda: hashlib.sha256(data).hexdigest()
+            )
+            headers, _ = await self._request(
+                "PUT",
+                {"partNumber": str(number), "uploadId": self._upload_id},
+                data,
+                payload_hash,
+            )
+            self._etags[number] = headers["ETag"]
+        finally:
+            self._slots.release()
+
+    async def _start_part(self):
+        await self._slots.acquire()
+        # a failed part fails the upload, without waiting for the download to end
+        for task in self._tasks:
+            if task.done() and task.exception():
+                self._slots.release()
+                raise task.exception()
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        self._tasks.append(
+            asyncio.create_task(self._upload_part(len(self._tasks) + 1, data))
+        )
+
+    async def write(self, chunk: bytes):
+        self._buffer += chunk
+        if len(self._buffer) >= PART_SIZE:
+            await self._start_part()
+
+    async def close(self) -> Dict:
+        if self._buffer or not self._tasks:
+            await self._start_part()
+        await asyncio.gather(*self._tasks)
+
+        parts = "".join(
+            f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>"
+            for number, etag in sorted(self._etags.items())
+        )
+        _, body = await self._request(
+            "POST",
+            {"uploadId": self._upload_id},
+            f"<CompleteMultipartUpload>{parts}</CompleteMultipartUpload>".encode(),
+        )
+        # errors completing an upload can be returned with a 200 status
+        error = _find(body, "Code")
+        if error:
+            raise S3Error(f"Failed to complete upload of {self.path}: {error}")
+        return {"parts": len(self._etags)}
+
+    async def abort(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._buffer.clear()
+        if self._upload_id is None:
+            return
+        try:
+            await self._request("DELETE", {"uploadId": self._upload_id})
+        except (S3Error, aiohttp.ClientError, TimeoutError) as err:
+            _LOGGER.warning("Failed to abort upload of %s: %s", self.path, err)
+        else:
+            _LOGGER.debug("Aborted multipart upload of %s", self.path)
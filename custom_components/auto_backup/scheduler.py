@@ -0,0 +1,329 @@
+"""Built-in backup schedule that waits for the host to be idle."""
+
+import logging
+import os
+import random
+from datetime import datetime, date, time, timedelta
+from typing import Callable, Dict, List, Optional
+
+from homeassistant.const import ATTR_UNIT_OF_MEASUREMENT, STATE_ON
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    STORAGE_VERSION,
+    SCHEDULE_KEY,
+    SIGNAL_SCHEDULE_UPDATED,
+    EVENT_BACKUP_DEFERRED,
+    CONF_SCHEDULE,
+    CONF_SCHEDULE_BACKUP,
+    CONF_SCHEDULE_JITTER,
+    CONF_SCHEDULE_WINDOW,
+    CONF_SCHEDULE_CATCH_UP,
+    CONF_MAX_LOAD,
+    CONF_MAX_MEMORY,
+    CONF_MAX_IO_PRESSURE,
+    CONF_BLOCKING_ENTITIES,
+    CONF_BLOCKING_THRESHOLDS,
+    DEFAULT_SCHEDULE_WINDOW,
+    DEFAULT_MAX_LOAD,
+    DEFAULT_MAX_MEMORY,
+    DEFAULT_MAX_IO_PRESSURE,
+    SERVICE_BACKUP,
+)
+from .helpers import normalize_backup_data
+from .throttle import read_io_pressure
+
+_LOGGER = logging.getLogger(__name__)
+
+CHECK_INTERVAL = timedelta(minutes=1)
+MEMINFO_PATH = "/proc/meminfo"
+
+CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+# (minimum, maximum) of each cron field
+CRON_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+MAX_SEARCH_DAYS = 366 * 5
+
+
+def _parse_field(field: str, minimum: int, maximum: int) -> List[int]:
+    values = set()
+    for part in field.split(","):
+        value_range, _, step = part.partition("/")
+        try:
+            if value_range == "*":
+                start, end = minimum, maximum
+            elif "-" in value_range:
+                start, end = (int(value) for value in value_range.split("-", 1))
+            else:
+                start = end = int(value_range)
+                if step:
+                    end = maximum
+            step = int(step) if step else 1
+        except ValueError:
+            raise ValueError(f"Invalid cron field '{field}'") from None
+        if not minimum <= start <= end <= maximum or step < 1:
+            raise ValueError(f"Invalid cron field '{field}'")
+        values.update(range(start, end + 1, step))
+    return sorted(values)
+
+
+class CronSchedule:
+    """Minimal 5 field cron expression (minute hour day month weekday)."""
+
+    def __init__(self, expression: str):
+        expression = CRON_ALIASES.get(expression.strip(), expression)
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Expected 5 fields in cron expression '{expression}'")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _parse_field(field, *limits) for field, limits in zip(fields, CRON_RANGES)
+        )
+        # both 0 and 7 are sunday
+        self.weekdays = {weekday % 7 for weekday in weekdays}
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _matches_day(self, day: date) -> bool:
+        if day.month not in self.months:
+            return False
+        in_days = day.day in self.days
+        in_weekdays = (day.weekday() + 1) % 7 in self.weekdays
+        # like cron, a day matches either field when both are restricted
+        if not self._any_day and not self._any_weekday:
+            return in_days or in_weekdays
+        return in_days and in_weekdays
+
+    def next_after(self, after: datetime) -> datetime:
+        """Return the first time after `after` matching the schedule."""
+        start = after.replace(tzinfo=None, second=0, microsecond=0)
+        start += timedelta(minutes=1)
+        day = start.date()
+        for _ in range(MAX_SEARCH_DAYS):
+            if self._matches_day(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        candidate = datetime.combine(day, time(hour, minute))
+                        if candidate >= start:
+                            return candidate.replace(tzinfo=after.tzinfo)
+            day += timedelta(days=1)
+        raise ValueError(f"Cron expression '{self.expression}' never matches")
+
+
+def read_host_load() -> Dict[str, Optional[float]]:
+    """Return the load per CPU, used memory (%) and I/O pressure (%) of the host."""
+    try:
+        load = os.getloadavg()[0] / (os.cpu_count() or 1)
+    except OSError:
+        load = None
+
+    memory = None
+    try:
+        with open(MEMINFO_PATH) as file:
+            meminfo = {
+                key: int(value.split()[0])
+                for key, value in (line.split(":", 1) for line in file)
+            }
+        memory = 100 * (1 - meminfo["MemAvailable"] / meminfo["MemTotal"])
+    except (OSError, ValueError, KeyError, ZeroDivisionError):
+        pass
+
+    return {"load": load, "memory": memory, "io_pressure": read_io_pressure()}
+
+
+class BackupScheduler:
+    """Create backups on a cron schedule, deferring them while the host is busy.
+
+    A due backup is deferred while the host load exceeds any threshold or a
+    blocking entity is on, and is created anyway once the window has passed.
+    A run still blocked by a backup in progress then is skipped instead.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        create_backup: Callable,
+        is_running: Callable[[], bool],
+    ):
+        self._hass = hass
+        self._create_backup = create_backup
+        self._is_running = is_running
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{SCHEDULE_KEY}")
+        self._schedule: Optional[CronSchedule] = None
+        self._options: Dict = {}
+        self._last_run: Optional[datetime] = None
+        self._due: Optional[datetime] = None
+        self._unsub: Optional[Callable] = None
+        self._started = False
+        self.next_run: Optional[datetime] = None
+        self.deferred: Optional[str] = None
+        self.host_load: Dict[str, Optional[float]] = {}
+
+    def configure(self, options: Dict):
+        """Update the schedule and thresholds, rescheduling if started."""
+        self._options = options
+        try:
+            self._schedule = (
+                CronSchedule(options[CONF_SCHEDULE])
+                if options.get(CONF_SCHEDULE)
+                else None
+            )
+        except ValueError as err:
+            _LOGGER.error("Invalid backup schedule: %s", err)
+            self._schedule = None
+        if self._started:
+            self._due = None
+            self._schedule_next(dt_util.now())
+
+    async def async_start(self):
+        """Load the last run and schedule the next one, catching up if missed."""
+        data = await self._store.async_load()
+        if data and data.get("last_run"):
+            self._last_run = datetime.fromisoformat(data["last_run"])
+        self._started = True
+
+        now = dt_util.now()
+        missed = None
+        if (
+            self._schedule
+            and self._last_run
+            and self._options.get(CONF_SCHEDULE_CATCH_UP, True)
+        ):
+            missed = self._schedule.next_after(dt_util.as_local(self._last_run))
+        if missed and missed < now:
+            _LOGGER.info("Catching up on scheduled backup missed at %s", missed)
+            # the window starts now, a backup missed long ago is still wanted
+            self._due = now
+            self._set_timer(now)
+        else:
+            self._schedule_next(now)
+
+    @callback
+    def async_stop(self):
+        self._started = False
+        self._cancel_timer()
+
+    def _cancel_timer(self):
+        if self._unsub:
+            self._unsub()
+            self._unsub = None
+
+    def _set_timer(self, point: datetime):
+        self._cancel_timer()
+        self.next_run = point
+        self._unsub = async_track_point_in_utc_time(
+            self._hass, self._async_fire, dt_util.as_utc(point)
+        )
+        async_dispatcher_send(self._hass, SIGNAL_SCHEDULE_UPDATED)
+
+    def _schedule_next(self, now: datetime):
+        self.deferred = None
+        if not self._schedule:
+            self._cancel_timer()
+            self.next_run = None
+            async_dispatcher_send(self._hass, SIGNAL_SCHEDULE_UPDATED)
+            return
+        point = self._schedule.next_after(now)
+        jitter = self._options.get(CONF_SCHEDULE_JITTER, 0)
+        if jitter:
+            point += timedelta(seconds=random.uniform(0, jitter * 60))
+        self._set_timer(point)
+
+    async def _async_defer_reasons(self) -> List[str]:
+        """Return why a backup should not be created right now."""
+        reasons = []
+        if self._is_running():
+            reasons.append("backup in progress")
+
+        self.host_load = await self._hass.async_add_executor_job(read_host_load)
+        thresholds = (
+            ("load", CONF_MAX_LOAD, DEFAULT_MAX_LOAD, "load {:.2f} per CPU"),
+            ("memory", CONF_MAX_MEMORY, DEFAULT_MAX_MEMORY, "memory {:.0f}%"),
+            (
+                "io_pressure",
+                CONF_MAX_IO_PRESSURE,
+                DEFAULT_MAX_IO_PRESSURE,
+                "I/O pressure {:.1f}%",
+            ),
+        )
+        for key, option, default, message in thresholds:
+            limit = self._options.get(option, default)
+            value = self.host_load.get(key)
+            if limit and value is not None and value > limit:
+                reasons.append(message.format(value))
+
+        for entity_id in self._options.get(CONF_BLOCKING_ENTITIES, []):
+            state = self._hass.states.get(entity_id)
+            if state and state.state == STATE_ON:
+                reasons.append(f"{state.name} is on")
+
+        thresholds = self._options.get(CONF_BLOCKING_THRESHOLDS) or {}
+        for entity_id, limit in thresholds.items():
+            state = self._hass.states.get(entity_id)
+            try:
+                value = float(state.state)
+            except (AttributeError, ValueError):
+                # missing, unavailable or not numeric
+                continue
+            if value > limit:
+                unit = state.attributes.get(ATTR_UNIT_OF_MEASUREMENT) or ""
+                reasons.append(f"{state.name} is {state.state}{unit}")
+        return reasons
+
+    async def _async_fire(self, now: datetime):
+        self._unsub = None
+        now = dt_util.as_local(now)
+        if self._due is None:
+            self._due = now
+
+        reasons = await self._async_defer_reasons()
+        window = timedelta(
+            minutes=self._options.get(CONF_SCHEDULE_WINDOW, DEFAULT_SCHEDULE_WINDOW)
+        )
+        if reasons and now < self._due + window:
+            reason = ", ".join(reasons)
+            if reason != self.deferred:
+                _LOGGER.info("Deferring scheduled backup: %s", reason)
+                self._hass.bus.async_fire(EVENT_BACKUP_DEFERRED, {"reason": reason})
+            self.deferred = reason
+            self._set_timer(now + CHECK_INTERVAL)
+            return
+
+        if self._is_running():
+            _LOGGER.warning(
+                "Skipping scheduled backup due at %s, a backup is still in progress",
+                self._due,
+            )
+            self._due = None
+            self._schedule_next(now)
+            return
+
+        if reasons:
+            _LOGGER.warning(
+                "Creating scheduled backup after waiting %s for an idle host: %s",
+                window,
+                ", ".join(reasons),
+            )
+
+        self._due = None
+        self._last_run = now
+        await self._store.async_save({"last_run": now.isoformat()})
+        self._schedule_next(now)
+
+        data = normalize_backup_data(
+            SERVICE_BACKUP, self._options.get(CONF_SCHEDULE_BACKUP) or {}
+        )
+        try:
+            await self._create_backup(data)
+        except Exception as err:
+            # nothing awaits the timer callback, the error would go unnoticed
+            _LOGGER.error("Scheduled backup failed: %s", err)
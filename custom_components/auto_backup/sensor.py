@@ -7,8 +7,9 @@ from homeassistant.components.sensor import (
     RestoreSensor,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import ATTR_NAME
+from homeassistant.const import ATTR_NAME, UnitOfInformation
 from homeassistant.core import HomeAssistant, callback, Event
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
 from .const import (
@@ -16,12 +17,15 @@ from .const import (
     EVENT_BACKUP_SUCCESSFUL,
     EVENT_BACKUP_FAILED,
     EVENT_BACKUP_START,
+    EVENT_BACKUP_CANCELLED,
     DATA_AUTO_BACKUP,
+    SIGNAL_SCHEDULE_UPDATED,
     ATTR_LAST_FAILURE,
     ATTR_MONITORED,
     ATTR_PURGEABLE,
     ATTR_ERROR,
     ATTR_SLUG,
+    ATTR_SIZE,
 )
 from .helpers import get_device_info
 from .manager import AutoBackup
@@ -40,6 +44,11 @@ async def async_setup_entry(
             AutoBackupLastFailureSensor(entry, auto_backup),
             AutoBackupLastSuccessSensor(entry, auto_backup),
             AutoBackupNextExpirySensor(entry, auto_backup),
+            AutoBackupMonitoredSizeSensor(entry, auto_backup),
+            AutoBackupPurgeableSizeSensor(entry, auto_backup),
+            AutoBackupLastSizeSensor(entry, auto_backup),
+            AutoBackupNextScheduledSensor(entry, auto_backup),
+            AutoBackupDeferredSensor(entry, auto_backup),
         ]
     )
 
@@ -87,6 +96,7 @@ class AutoBackupSensor(AutoBackupBaseSensor):
         for event in (
             EVENT_BACKUP_START,
             EVENT_BACKUP_SUCCESSFUL,
+            EVENT_BACKUP_CANCELLED,
             EVENT_BACKUPS_PURGED,
         ):
             self.async_on_remove(self.hass.bus.async_listen(event, update))
@@ -257,3 +267,127 @@ class AutoBackupNextExpirySensor(RestoreSensor, AutoBackupBaseSensor):
     def native_value(self):
         """Return next expiry datetime."""
         return self._auto_backup.get_next_expiry()
+
+
+class AutoBackupSizeBaseSensor(AutoBackupBaseSensor):
+    async def async_added_to_hass(self):
+        """Run when entity about to be added."""
+        await super().async_added_to_hass()
+
+        @callback
+        def update(_):
+            """Update sensor on backup events."""
+            self.async_schedule_update_ha_state(True)
+
+        for event in (EVENT_BACKUP_SUCCESSFUL, EVENT_BACKUPS_PURGED):
+            self.async_on_remove(self.hass.bus.async_listen(event, update))
+
+
+class AutoBackupMonitoredSizeSensor(AutoBackupSizeBaseSensor):
+    entity_description = SensorEntityDescription(
+        key="monitored-size",
+        name="Monitored backups size",
+        icon="mdi:harddisk",
+        device_class=SensorDeviceClass.DATA_SIZE,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        suggested_unit_of_measurement=UnitOfInformation.MEGABYTES,
+    )
+
+    @property
+    def native_value(self):
+        """Return the total size of monitored backups."""
+        return self._auto_backup.monitored_size
+
+
+class AutoBackupPurgeableSizeSensor(AutoBackupSizeBaseSensor):
+    entity_description = SensorEntityDescription(
+        key="purgeable-size",
+        name="Reclaimable size",
+        icon="mdi:harddisk-remove",
+        device_class=SensorDeviceClass.DATA_SIZE,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        suggested_unit_of_measurement=UnitOfInformation.MEGABYTES,
+    )
+
+    @property
+    def native_value(self):
+        """Return the space freed by the next purge."""
+        return self._auto_backup.purgeable_size
+
+
+class AutoBackupLastSizeSensor(RestoreSensor, AutoBackupBaseSensor):
+    entity_description = SensorEntityDescription(
+        key="last-size",
+        name="Last backup size",
+        icon="mdi:package-variant-closed",
+        device_class=SensorDeviceClass.DATA_SIZE,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        suggested_unit_of_measurement=UnitOfInformation.MEGABYTES,
+    )
+    _attr_should_poll = False
+
+    async def async_added_to_hass(self):
+        """Run when entity about to be added."""
+        await super().async_added_to_hass()
+        data = await self.async_get_last_sensor_data()
+        if data:
+            self._attr_native_value = data.native_value
+
+        @callback
+        def backup_success(event_: Event):
+            """Store the size of the last backup, if it is known"""
+            if event_.data.get(ATTR_SIZE) is None:
+                return
+            self._attr_native_value = event_.data[ATTR_SIZE]
+            self.async_write_ha_state()
+
+        self.async_on_remove(
+            self.hass.bus.async_listen(EVENT_BACKUP_SUCCESSFUL, backup_success)
+        )
+
+
+class AutoBackupScheduleBaseSensor(AutoBackupBaseSensor):
+    _attr_should_poll = False
+
+    async def async_added_to_hass(self):
+        """Run when entity about to be added."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass, SIGNAL_SCHEDULE_UPDATED, self.async_write_ha_state
+            )
+        )
+
+
+class AutoBackupNextScheduledSensor(AutoBackupScheduleBaseSensor):
+    entity_description = SensorEntityDescription(
+        key="next-scheduled",
+        name="Next scheduled backup",
+        icon="mdi:calendar-clock",
+        device_class=SensorDeviceClass.TIMESTAMP,
+    )
+
+    @property
+    def native_value(self):
+        """Return when the scheduler will next try to create a backup."""
+        return self._auto_backup.scheduler.next_run
+
+
+class AutoBackupDeferredSensor(AutoBackupScheduleBaseSensor):
+    entity_description = SensorEntityDescription(
+        key="deferred-because",
+        name="Deferred because",
+        icon="mdi:timer-sand-paused",
+    )
+
+    @property
+    def native_value(self):
+        """Return why the scheduled backup is deferred, if it is."""
+        return self._auto_backup.scheduler.deferred
+
+    @property
+    def extra_state_attributes(self):
+        return self._auto_backup.scheduler.host_load
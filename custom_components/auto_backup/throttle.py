@@ -0,0 +1,140 @@
+"""Bandwidth throttling for backup downloads."""
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+PSI_IO_PATH = "/proc/pressure/io"
+PSI_SAMPLE_INTERVAL = 1.0  # seconds
+PSI_HIGH = 20.0  # % of wall time with at least one task stalled on I/O
+PSI_LOW = 5.0
+
+MIN_RATE = 1024 * 1024  # 1 MB/s
+BURST = 1.0  # seconds worth of tokens
+
+
+def read_io_pressure(path: str = PSI_IO_PATH) -> Optional[float]:
+    """Return the 10 second "some" average from Linux I/O pressure stall information.
+
+    Returns None when PSI is unavailable (non-Linux or kernels without PSI).
+    """
+    try:
+        with open(path) as file:
+            for line in file:
+                if line.startswith("some"):
+                    fields = dict(field.split("=", 1) for field in line.split()[1:])
+                    return float(fields["avg10"])
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+
+class Throttle:
+    """Token bucket shared by all backup transfers.
+
+    In adaptive mode the limit is halved while the system is under I/O pressure
+    and gradually restored, up to the configured rate, once the pressure eases.
+    """
+
+    def __init__(self, rate: Optional[float] = None, adaptive: bool = False):
+        self._rate: Optional[float] = None
+        self._adaptive = False
+        self._limit: Optional[float] = None
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self._sampled = 0.0
+        self._pressure: Optional[float] = None
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+        self._observed: Optional[float] = None
+        self.configure(rate, adaptive)
+
+    def configure(self, rate: Optional[float], adaptive: bool):
+        """Update the configured rate (bytes per second) and adaptive mode."""
+        self._rate = rate or None
+        self._adaptive = adaptive
+        self._limit = self._rate
+        self._tokens = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self._rate is not None or self._adaptive
+
+    @property
+    def limit(self) -> Optional[float]:
+        """Return the effective limit in bytes per second, None if unlimited."""
+        return self._limit
+
+    @property
+    def pressure(self) -> Optional[float]:
+        return self._pressure
+
+    def _sample_due(self) -> bool:
+        return (
+            self._adaptive and time.monotonic() - self._sampled >= PSI_SAMPLE_INTERVAL
+        )
+
+    def _adjust(self, pressure: Optional[float]):
+        """Adjust the limit based on the current I/O pressure."""
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if self._limit is None and elapsed > 0 and self._window_bytes:
+            # only measure unthrottled throughput, used as the recovery ceiling
+            self._observed = self._window_bytes / elapsed
+        self._window_start = now
+        self._window_bytes = 0
+        self._sampled = now
+        self._pressure = pressure
+
+        if pressure is None:
+            return
+
+        if pressure >= PSI_HIGH:
+            current = self._limit or self._observed
+            if current is None:
+                return
+            self._limit = max(MIN_RATE, current / 2)
+            _LOGGER.debug(
+                "I/O pressure at %.1f%%, limiting transfers to %.1f MB/s",
+                pressure,
+                self._limit / 1e6,
+            )
+        elif pressure <= PSI_LOW and self._limit != self._rate:
+            limit = self._limit + max(MIN_RATE, self._limit / 4)
+            ceiling = self._rate or self._observed
+            if ceiling is None or limit >= ceiling:
+                # fully recovered, return to the configured rate
+                limit = self._rate
+            self._limit = limit
+
+    def _reserve(self, size: int) -> float:
+        """Take tokens for size bytes and return how long the caller must wait."""
+        now = time.monotonic()
+        self._window_bytes += size
+        if self._limit is None:
+            self._updated = now
+            return 0.0
+        self._tokens = min(
+            self._limit * BURST,
+            self._tokens + (now - self._updated) * self._limit,
+        )
+        self._updated = now
+        self._tokens -= size
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / self._limit
+
+    async def consume(self, size: int):
+        """Wait until size bytes may be transferred.
+
+        This method is a coroutine.
+        """
+        if self._sample_due():
+            loop = asyncio.get_running_loop()
+            self._adjust(await loop.run_in_executor(None, read_io_pressure))
+        delay = self._reserve(size)
+        if delay > 0:
+            await asyncio.sleep(delay)
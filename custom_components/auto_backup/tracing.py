@@ -0,0 +1,232 @@
+"""Trace spans of Auto Backup operations, written to a file as OpenTelemetry JSON.
+
+Each line of the file is an OTLP/JSON `ExportTraceServiceRequest` holding a
+batch of finished spans, the format read by the `otlpjsonfile` receiver of the
+OpenTelemetry Collector.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+TRACE_FILE = "auto_backup_traces.jsonl"
+MAX_FILE_SIZE = 10 * 1024 * 1024  # bytes, before the file is rotated
+BACKUP_COUNT = 3  # rotated files kept
+FLUSH_DELAY = 5  # seconds finished spans are batched for
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# the innermost span of the running task, copied into tasks it creates
+_current_span: ContextVar[Optional["Span"]] = ContextVar(
+    "auto_backup_span", default=None
+)
+
+
+def _otlp_value(value: Any) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # 64-bit integers are strings in OTLP/JSON
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict]:
+    return [
+        {"key": key, "value": _otlp_value(value)}
+        for key, value in attributes.items()
+        if value is not None
+    ]
+
+
+class Span:
+    """A timed operation, nested in the span that was current when it started."""
+
+    def __init__(
+        self,
+        name: str,
+        parent: Optional["Span"],
+        kind: int,
+        attributes: Dict[str, Any],
+    ):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.kind = kind
+        self.attributes = attributes
+        self.start = time.time_ns()
+        self.end: Optional[int] = None
+        self.status = STATUS_OK
+        self.message: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def as_otlp(self) -> Dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.message:
+            span["status"]["message"] = self.message
+        return span
+
+
+class _NoSpan:
+    """Stands in for a span while tracing is disabled."""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+class Tracer:
+    """Record spans of operations and write them to a rotating file.
+
+    Finished spans are batched and written in the executor, so tracing does not
+    block the event loop. While disabled, spans are not created at all.
+    """
+
+    def __init__(
+        self,
+        hass: Optional[HomeAssistant],
+        path: Optional[str] = None,
+        enabled: bool = False,
+        max_size: int = MAX_FILE_SIZE,
+        backup_count: int = BACKUP_COUNT,
+    ):
+        self._hass = hass
+        self.path = path
+        self.enabled = enabled and path is not None
+        self._max_size = max_size
+        self._backup_count = backup_count
+        self._pending: List[Dict] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # flushes may overlap in the executor
+        self._lock = threading.Lock()
+        self.spans_written = 0
+
+    @contextmanager
+    def span(
+        self, name: str, kind: int = SPAN_KIND_INTERNAL, **attributes
+    ) -> Iterator[Span]:
+        """Record a span for the duration of the block, marking it failed on errors."""
+        if not self.enabled:
+            yield NO_SPAN
+            return
+
+        span = Span(name, _current_span.get(), kind, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except asyncio.CancelledError:
+            span.status = STATUS_ERROR
+            span.message = "cancelled"
+            raise
+        except Exception as err:
+            span.status = STATUS_ERROR
+            span.message = str(err) or type(err).__name__
+            raise
+        finally:
+            span.end = time.time_ns()
+            _current_span.reset(token)
+            self._finished(span)
+
+    def _finished(self, span: Span):
+        self._pending.append(span.as_otlp())
+        if self._flush_handle is None:
+            self._flush_handle = self._hass.loop.call_later(
+                FLUSH_DELAY, self._schedule_flush
+            )
+
+    @callback
+    def _schedule_flush(self):
+        self._flush_handle = None
+        self._hass.async_create_background_task(
+            self.async_flush(), f"{DOMAIN} trace flush"
+        )
+
+    async def async_flush(self):
+        """Write the spans finished since the last flush."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        spans, self._pending = self._pending, []
+        line = json.dumps(self._export_request(spans), separators=(",", ":"))
+        try:
+            await self._hass.async_add_executor_job(self._write, line)
+        except OSError as err:
+            _LOGGER.warning(
+                "Unable to write %s spans to %s: %s", len(spans), self.path, err
+            )
+        else:
+            self.spans_written += len(spans)
+
+    @staticmethod
+    def _export_request(spans: List[Dict]) -> Dict:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": _otlp_attributes({"service.name": DOMAIN})
+                    },
+                    "scopeSpans": [{"scope": {"name": __package__}, "spans": spans}],
+                }
+            ]
+        }
+
+    def _write(self, line: str):
+        with self._lock:
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                size = 0
+            if size and size + len(line) > self._max_size:
+                self._rotate()
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+
+    def _rotate(self):
+        """Rename the file to .1, .1 to .2 and so on, dropping the oldest."""
+        for number in range(self._backup_count - 1, 0, -1):
+            source = f"{self.path}.{number}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{number + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+
+# used by handlers until AutoBackup sets its tracer
+NO_TRACER = Tracer(None)
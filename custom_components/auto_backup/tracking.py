@@ -0,0 +1,267 @@
+"""Backups tracked by Auto Backup and the storage they are persisted in."""
+
+import base64
+import heapq
+import json
+import logging
+import os
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from homeassistant.helpers.storage import Store
+
+_LOGGER = logging.getLogger(__name__)
+
+SORT_EXPIRES = "expires"
+SORT_CREATED = "created"
+SORT_SIZE = "size"
+SORT_SLUG = "slug"
+
+# (missing, value, slug), backups without a created date or size sort last
+SortKey = Tuple[bool, Any, str]
+
+
+@dataclass
+class TrackedBackup:
+    """A backup that expires, with what is known about it."""
+
+    expires: datetime
+    created: Optional[datetime] = None
+    size: Optional[int] = None
+    # what the backup includes, see `backup_spec`
+    spec: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "expires": self.expires,
+            "created": self.created,
+            "size": self.size,
+            "spec": self.spec,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TrackedBackup":
+        created = data.get("created")
+        return cls(
+            expires=datetime.fromisoformat(data["expires"]),
+            created=datetime.fromisoformat(created) if created else None,
+            size=data.get("size"),
+            spec=data.get("spec"),
+        )
+
+
+class TrackedBackups:
+    """Tracked backups by slug, with running totals of their sizes.
+
+    Expiry dates are kept in a heap, so finding the purgeable backups and the
+    next expiry only looks at backups that expired since the last call.
+    Totals are updated as backups are added and removed, never by scanning.
+    """
+
+    def __init__(self):
+        self._backups: Dict[str, TrackedBackup] = {}
+        # (expires, slug), entries of removed or replaced backups are skipped
+        self._heap: List[Tuple[datetime, str]] = []
+        self._expired: Set[str] = set()
+        self.total_size = 0
+        self._purgeable_size = 0
+        # sort keys of all backups by field, built on first use after a change
+        self._indexes: Dict[str, List[SortKey]] = {}
+
+    def __len__(self) -> int:
+        return len(self._backups)
+
+    def __contains__(self, slug: str) -> bool:
+        return slug in self._backups
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._backups)
+
+    def __getitem__(self, slug: str) -> TrackedBackup:
+        return self._backups[slug]
+
+    def items(self):
+        return self._backups.items()
+
+    def values(self):
+        return self._backups.values()
+
+    def __setitem__(self, slug: str, backup: TrackedBackup):
+        if slug in self._backups:
+            del self[slug]
+        self._backups[slug] = backup
+        self._indexes.clear()
+        self.total_size += backup.size or 0
+        heapq.heappush(self._heap, (backup.expires, slug))
+
+    def __delitem__(self, slug: str):
+        backup = self._backups.pop(slug)
+        self._indexes.clear()
+        self.total_size -= backup.size or 0
+        if slug in self._expired:
+            self._expired.discard(slug)
+            self._purgeable_size -= backup.size or 0
+
+    def set_size(self, slug: str, size: Optional[int]):
+        """Record the size of a backup once it is known."""
+        backup = self._backups[slug]
+        difference = (size or 0) - (backup.size or 0)
+        backup.size = size
+        self._indexes.pop(SORT_SIZE, None)
+        self.total_size += difference
+        if slug in self._expired:
+            self._purgeable_size += difference
+
+    def _is_current(self, expires: datetime, slug: str) -> bool:
+        backup = self._backups.get(slug)
+        return backup is not None and backup.expires == expires
+
+    def _expire(self, now: datetime):
+        while self._heap and self._heap[0][0] < now:
+            expires, slug = heapq.heappop(self._heap)
+            if self._is_current(expires, slug) and slug not in self._expired:
+                self._expired.add(slug)
+                self._purgeable_size += self._backups[slug].size or 0
+
+    def purgeable(self, now: datetime) -> List[str]:
+        """Return the slugs of backups that expired before now."""
+        self._expire(now)
+        return sorted(self._expired, key=lambda slug: self._backups[slug].expires)
+
+    def purgeable_count(self, now: datetime) -> int:
+        self._expire(now)
+        return len(self._expired)
+
+    def purgeable_size(self, now: datetime) -> int:
+        self._expire(now)
+        return self._purgeable_size
+
+    def is_expired(self, slug: str, now: datetime) -> bool:
+        self._expire(now)
+        return slug in self._expired
+
+    @staticmethod
+    def sort_key(sort: str, slug: str, backup: TrackedBackup) -> SortKey:
+        value = slug if sort == SORT_SLUG else getattr(backup, sort)
+        return value is None, 0 if value is None else value, slug
+
+    def _index(self, sort: str) -> List[SortKey]:
+        index = self._indexes.get(sort)
+        if index is None:
+            index = sorted(
+                self.sort_key(sort, slug, backup)
+                for slug, backup in self._backups.items()
+            )
+            self._indexes[sort] = index
+        return index
+
+    def page(
+        self,
+        sort: str = SORT_EXPIRES,
+        descending: bool = False,
+        limit: int = 50,
+        after: Optional[SortKey] = None,
+        match: Optional[Callable[[str, TrackedBackup], bool]] = None,
+    ) -> Tuple[List[Tuple[str, TrackedBackup]], Optional[SortKey]]:
+        """Return a page of backups ordered by a field, starting after a sort key.
+
+        Also returns the sort key of the last backup when there are more to
+        come. Pages are found by position in the index, so backups added or
+        removed between pages do not shift the pages that follow.
+        """
+        index = self._index(sort)
+        if descending:
+            start = len(index) if after is None else bisect_left(index, after)
+            positions = range(start - 1, -1, -1)
+        else:
+            start = 0 if after is None else bisect_right(index, after)
+            positions = range(start, len(index))
+
+        backups = []
+        for position in positions:
+            slug = index[position][-1]
+            backup = self._backups[slug]
+            if match is not None and not match(slug, backup):
+                continue
+            if len(backups) == limit:
+                # a further match, so there is a next page
+                last = backups[-1]
+                return backups, self.sort_key(sort, last[0], last[1])
+            backups.append((slug, backup))
+        return backups, None
+
+    def next_expiry(self, now: datetime) -> Optional[datetime]:
+        """Return the first expiry date after now."""
+        self._expire(now)
+        while self._heap and not self._is_current(*self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+
+class TrackedBackupStore(Store):
+    """Store of tracked backups, migrating the original expiry-only format."""
+
+    async def _async_migrate_func(
+        self, old_major_version: int, old_minor_version: int, old_data: Dict
+    ) -> Dict:
+        if old_major_version == 1:
+            # version 1 mapped each slug directly to its expiry date
+            return {
+                slug: {"expires": expires, "created": None}
+                for slug, expires in old_data.items()
+            }
+        raise NotImplementedError
+
+
+def encode_cursor(sort: str, key: SortKey) -> str:
+    """Encode a sort key as an opaque cursor for the next page."""
+    missing, value, slug = key
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    data = json.dumps([sort, missing, value, slug], separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(sort: str, cursor: str) -> SortKey:
+    """Decode a cursor, raises ValueError if it is invalid or for another sort."""
+    try:
+        cursor_sort, missing, value, slug = json.loads(
+            base64.urlsafe_b64decode(cursor.encode())
+        )
+    except (TypeError, ValueError) as err:
+        raise ValueError(f"Invalid cursor: {err}") from err
+    if cursor_sort != sort:
+        raise ValueError(f"Cursor is for sorting by {cursor_sort}, not {sort}")
+    # the key is compared with those in the index, values of another type fail
+    if not isinstance(missing, bool) or not isinstance(slug, str):
+        raise ValueError("Invalid cursor")
+    if missing:
+        value = 0
+    elif sort in (SORT_EXPIRES, SORT_CREATED):
+        if not isinstance(value, str):
+            raise ValueError("Invalid cursor")
+        value = datetime.fromisoformat(value)
+        if value.tzinfo is None:
+            raise ValueError("Invalid cursor")
+    elif sort == SORT_SIZE:
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise ValueError("Invalid cursor")
+    elif not isinstance(value, str):
+        raise ValueError("Invalid cursor")
+    return missing, value, slug
+
+
+def disk_usage(path: str) -> Optional[float]:
+    """Return the used space of the filesystem containing path, in percent."""
+    try:
+        stat = os.statvfs(path)
+    except OSError as err:
+        _LOGGER.debug("Unable to read disk usage of '%s': %s", path, err)
+        return None
+    # same as df, blocks reserved for root are not counted as available
+    used = stat.f_blocks - stat.f_bfree
+    if not used + stat.f_bavail:
+        return None
+    return 100 * used / (used + stat.f_bavail)
@@ -0,0 +1,149 @@
+"""Detection of event loop stalls while Auto Backup operations are running."""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+_LOGGER = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = 0.05  # seconds
+STALL_THRESHOLD = 0.1  # seconds of lag before the loop is considered stalled
+MAX_REPORTED = 20
+
+PACKAGE_DIRECTORY = os.path.dirname(__file__)
+
+
+def _blocking_location(frame) -> str:
+    """Return the innermost frame of Auto Backup, or the innermost frame."""
+    innermost = None
+    while frame is not None:
+        location = (
+            f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno}"
+            f" ({frame.f_code.co_name})"
+        )
+        if innermost is None:
+            innermost = location
+        if frame.f_code.co_filename.startswith(PACKAGE_DIRECTORY):
+            return location
+        frame = frame.f_back
+    return innermost or "unknown"
+
+
+class LoopWatchdog:
+    """Measure event loop lag while operations run and attribute stalls to them.
+
+    A heartbeat scheduled on the loop measures how late it runs. A background
+    thread watches the heartbeat and, while it is overdue, samples the stack of
+    the loop thread to find the code that is blocking it.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._operations: Counter = Counter()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop: Optional[threading.Event] = None
+        self._expected = 0.0
+        self._location: Optional[str] = None
+        # (operations, location) -> [count, total lag, max lag]
+        self._stalls: Dict[Tuple[str, str], List[float]] = {}
+
+    @contextmanager
+    def operation(self, name: str):
+        """Attribute stalls to an operation while it is running."""
+        if not self.enabled:
+            yield
+            return
+
+        self._operations[name] += 1
+        if self._thread is None:
+            self._start()
+        try:
+            yield
+        finally:
+            # a stall right before the operation ends would otherwise be
+            # attributed to nothing, or missed once the heartbeat stops
+            self._check()
+            self._operations[name] -= 1
+            if self._operations[name] <= 0:
+                del self._operations[name]
+            if not self._operations:
+                self.stop()
+
+    def _start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stop = threading.Event()
+        self._schedule_heartbeat()
+        self._thread = threading.Thread(
+            target=self._watch,
+            args=(self._stop,),
+            name="auto_backup_watchdog",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._stop:
+            self._stop.set()
+        self._thread = None
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+
+    def _schedule_heartbeat(self):
+        self._expected = time.monotonic() + HEARTBEAT_INTERVAL
+        self._handle = self._loop.call_later(HEARTBEAT_INTERVAL, self._heartbeat)
+
+    def _check(self):
+        lag = time.monotonic() - self._expected
+        if lag > STALL_THRESHOLD:
+            self._record(lag, self._location or "unknown")
+            self._expected = time.monotonic() + HEARTBEAT_INTERVAL
+        self._location = None
+
+    def _heartbeat(self):
+        self._check()
+        if self._thread is not None:
+            self._schedule_heartbeat()
+
+    def _watch(self, stop: threading.Event):
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            if self._location is None and (
+                time.monotonic() - self._expected > STALL_THRESHOLD
+            ):
+                frame = sys._current_frames().get(self._loop_thread)
+                self._location = _blocking_location(frame)
+
+    def _record(self, lag: float, location: str):
+        operations = ", ".join(sorted(self._operations)) or "none"
+        _LOGGER.debug(
+            "Event loop stalled for %.3fs during %s at %s", lag, operations, location
+        )
+        stats = self._stalls.setdefault((operations, location), [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += lag
+        stats[2] = max(stats[2], lag)
+
+    def report(self) -> List[Dict]:
+        """Return the worst stalls, ordered by the longest lag."""
+        return [
+            {
+                "operations": operations,
+                "location": location,
+                "count": count,
+                "total": round(total, 3),
+                "max": round(longest, 3),
+            }
+            for (operations, location), (count, total, longest) in sorted(
+                self._stalls.items(), key=lambda item: item[1][2], reverse=True
+            )[:MAX_REPORTED]
+        ]
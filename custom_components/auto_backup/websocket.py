@@ -0,0 +1,78 @@
+"""Websocket commands of Auto Backup."""
+
+from typing import Any, Dict
+
+import homeassistant.helpers.config_validation as cv
+import voluptuous as vol
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+
+from .const import (
+    DATA_AUTO_BACKUP,
+    ATTR_SORT,
+    ATTR_DESCENDING,
+    ATTR_LIMIT,
+    ATTR_CURSOR,
+    ATTR_EXPIRED,
+    ATTR_EXPIRES_BEFORE,
+    ATTR_EXPIRES_AFTER,
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+)
+from .tracking import SORT_CREATED, SORT_EXPIRES, SORT_SIZE, SORT_SLUG
+
+# shared by the websocket command and the list_backups service
+LIST_BACKUPS_FIELDS = {
+    vol.Optional(ATTR_SORT, default=SORT_EXPIRES): vol.In(
+        [SORT_EXPIRES, SORT_CREATED, SORT_SIZE, SORT_SLUG]
+    ),
+    vol.Optional(ATTR_DESCENDING, default=False): cv.boolean,
+    vol.Optional(ATTR_LIMIT, default=DEFAULT_PAGE_SIZE): vol.All(
+        vol.Coerce(int), vol.Range(min=1, max=MAX_PAGE_SIZE)
+    ),
+    vol.Optional(ATTR_CURSOR): cv.string,
+    vol.Optional(ATTR_EXPIRED): cv.boolean,
+    vol.Optional(ATTR_EXPIRES_BEFORE): cv.datetime,
+    vol.Optional(ATTR_EXPIRES_AFTER): cv.datetime,
+}
+
+
+def list_backups_args(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the arguments of AutoBackup.async_list_backups from validated data."""
+    return {
+        "sort": data[ATTR_SORT],
+        "descending": data[ATTR_DESCENDING],
+        "limit": data[ATTR_LIMIT],
+        "cursor": data.get(ATTR_CURSOR),
+        "expired": data.get(ATTR_EXPIRED),
+        "expires_before": data.get(ATTR_EXPIRES_BEFORE),
+        "expires_after": data.get(ATTR_EXPIRES_AFTER),
+    }
+
+
+@callback
+def async_register_commands(hass: HomeAssistant):
+    websocket_api.async_register_command(hass, websocket_list_backups)
+
+
+@websocket_api.websocket_command(
+    {vol.Required("type"): "auto_backup/backups", **LIST_BACKUPS_FIELDS}
+)
+@websocket_api.async_response
+async def websocket_list_backups(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: Dict
+):
+    """List a page of the backups tracked by Auto Backup."""
+    auto_backup = hass.data.get(DATA_AUTO_BACKUP)
+    if auto_backup is None:
+        connection.send_error(
+            msg["id"], websocket_api.ERR_NOT_FOUND, "Auto Backup is not set up"
+        )
+        return
+    try:
+        result = await auto_backup.async_list_backups(**list_backups_args(msg))
+    except HomeAssistantError as err:
+        connection.send_error(msg["id"], websocket_api.ERR_INVALID_FORMAT, str(err))
+        return
+    connection.send_result(msg["id"], result)